@@ -0,0 +1,86 @@
+"""
+Compare the asyncio HTTP/1.1 download handler with the Twisted one against the
+local mock server
+
+usage (from the root of the Scrapy repository, which provides the mock
+server):
+
+    PYTHONPATH=. python extras/http11-asyncio-bench.py [--requests N] [--concurrency N] [--https]
+
+Requests are sent with the given concurrency over keep-alive connections. The
+CPU time is the one used by this process, the mock server runs in a separate
+process.
+"""
+
+import argparse
+import time
+
+from scrapy.utils.reactor import install_reactor
+
+install_reactor("twisted.internet.asyncioreactor.AsyncioSelectorReactor")
+
+from twisted.internet import defer, reactor  # noqa: E402
+
+from scrapy import Request, Spider  # noqa: E402
+from scrapy.core.downloader.handlers.http11 import HTTP11DownloadHandler  # noqa: E402
+from scrapy.core.downloader.handlers.http11_asyncio import (  # noqa: E402
+    AsyncioHTTP11DownloadHandler,
+)
+from scrapy.utils.misc import build_from_crawler  # noqa: E402
+from scrapy.utils.test import get_crawler  # noqa: E402
+from tests.mockserver import MockServer  # noqa: E402
+
+
+@defer.inlineCallbacks
+def run(handler_cls, url, requests, concurrency):
+    crawler = get_crawler(settings_dict={"CONCURRENT_REQUESTS_PER_DOMAIN": concurrency})
+    handler = build_from_crawler(handler_cls, crawler)
+    spider = Spider("bench")
+    remaining = iter(range(requests))
+
+    @defer.inlineCallbacks
+    def worker():
+        for _ in remaining:
+            response = yield handler.download_request(
+                Request(url, dont_filter=True), spider
+            )
+            assert response.status == 200
+
+    # Open the connections before measuring
+    yield defer.gatherResults(
+        [handler.download_request(Request(url), spider) for _ in range(concurrency)]
+    )
+    start, start_cpu = time.perf_counter(), time.process_time()
+    yield defer.gatherResults([worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - start_cpu
+    yield handler.close()
+    return elapsed, cpu
+
+
+@defer.inlineCallbacks
+def main(args):
+    try:
+        with MockServer() as mockserver:
+            url = mockserver.url("/text", is_secure=args.https)
+            for handler_cls in (HTTP11DownloadHandler, AsyncioHTTP11DownloadHandler):
+                elapsed, cpu = yield run(
+                    handler_cls, url, args.requests, args.concurrency
+                )
+                print(
+                    f"{handler_cls.__name__:>30}: "
+                    f"{args.requests / elapsed:8.0f} requests/s, "
+                    f"{cpu / args.requests * 1e6:6.0f} µs CPU per request"
+                )
+    finally:
+        reactor.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--https", action="store_true")
+    args = parser.parse_args()
+    reactor.callWhenRunning(main, args)
+    reactor.run()
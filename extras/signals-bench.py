@@ -0,0 +1,76 @@
+"""
+Measure the per-request overhead of the signals sent by the downloader
+
+usage:
+
+    python signals-bench.py [--receivers N] [--chunks N] [--requests N]
+
+It compares scrapy.utils.signal.send_catch_log, which looks up and inspects
+receivers on every call, with SignalManager.send_catch_log, which caches them.
+"""
+
+import argparse
+from timeit import default_timer
+
+from scrapy import Request, Spider, signals
+from scrapy.http import Response
+from scrapy.signalmanager import SignalManager
+from scrapy.utils.signal import send_catch_log
+
+PER_REQUEST_SIGNALS = (
+    signals.request_reached_downloader,
+    signals.headers_received,
+    signals.response_downloaded,
+    signals.request_left_downloader,
+    signals.response_received,
+)
+
+
+class Receiver:
+    def request_handler(self, request, spider):
+        pass
+
+    def bytes_handler(self, data, request, spider):
+        pass
+
+
+def run(send, requests, chunks):
+    spider = Spider("bench")
+    request = Request("https://example.com")
+    response = Response(request.url)
+    start = default_timer()
+    for _ in range(requests):
+        for signal in PER_REQUEST_SIGNALS:
+            send(signal, request=request, response=response, spider=spider)
+        for _ in range(chunks):
+            send(signals.bytes_received, data=b"", request=request, spider=spider)
+    return (default_timer() - start) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--receivers", type=int, default=1)
+    parser.add_argument("--chunks", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+
+    manager = SignalManager()
+    receivers = [Receiver() for _ in range(args.receivers)]
+    for receiver in receivers:
+        for signal in PER_REQUEST_SIGNALS:
+            manager.connect(receiver.request_handler, signal)
+        manager.connect(receiver.bytes_handler, signals.bytes_received)
+
+    def uncached_send(signal, **kwargs):
+        return send_catch_log(signal, sender=manager.sender, **kwargs)
+
+    for name, send in (
+        ("uncached", uncached_send),
+        ("cached", manager.send_catch_log),
+    ):
+        per_request = run(send, args.requests, args.chunks)
+        print(f"{name:>8}: {per_request * 1e6:.2f} µs per request")
+
+
+if __name__ == "__main__":
+    main()
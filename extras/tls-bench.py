@@ -0,0 +1,78 @@
+"""
+Measure the gain of TLS session resumption against a local TLS server
+
+usage (from the root of the Scrapy repository, which provides the test
+server certificate):
+
+    PYTHONPATH=. python extras/tls-bench.py [--requests N]
+
+Every request is sent over a new connection, first with
+DOWNLOADER_CLIENT_TLS_SESSION_CACHE_SIZE set to 0 (a full handshake per
+connection) and then with its default value (sessions are resumed).
+"""
+
+import argparse
+from timeit import default_timer
+
+from twisted.internet import defer, reactor
+from twisted.web.resource import Resource
+from twisted.web.server import Site
+
+from scrapy import Request, Spider
+from scrapy.core.downloader.handlers.http11 import HTTP11DownloadHandler
+from scrapy.utils.misc import build_from_crawler
+from scrapy.utils.test import get_crawler
+from tests.mockserver import ssl_context_factory
+
+
+class Root(Resource):
+    isLeaf = True
+
+    def render_GET(self, request):
+        return b"ok"
+
+
+@defer.inlineCallbacks
+def run(url, requests, settings):
+    crawler = get_crawler(settings_dict=settings)
+    crawler.stats.open_spider(None)
+    handler = build_from_crawler(HTTP11DownloadHandler, crawler)
+    spider = Spider("bench")
+    start = default_timer()
+    for _ in range(requests):
+        yield handler.download_request(Request(url), spider)
+        yield handler._pool.closeCachedConnections()
+    elapsed = default_timer() - start
+    yield handler.close()
+    return elapsed / requests, crawler.stats
+
+
+@defer.inlineCallbacks
+def main(args):
+    port = reactor.listenSSL(
+        0, Site(Root()), ssl_context_factory(), interface="127.0.0.1"
+    )
+    url = f"https://127.0.0.1:{port.getHost().port}/"
+    try:
+        for name, size in (("full", 0), ("resumed", 1000)):
+            per_request, stats = yield run(
+                url,
+                args.requests,
+                {"DOWNLOADER_CLIENT_TLS_SESSION_CACHE_SIZE": size},
+            )
+            resumed = stats.get_value("downloader/tls_session_resumed_count", 0)
+            print(
+                f"{name:>8}: {per_request * 1e3:.2f} ms per connection "
+                f"({resumed}/{args.requests} sessions resumed)"
+            )
+    finally:
+        yield port.stopListening()
+        reactor.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+    reactor.callWhenRunning(main, args)
+    reactor.run()
@@ -0,0 +1,76 @@
+import argparse
+from typing import List
+
+from scrapy.commands import ScrapyCommand
+from scrapy.exceptions import UsageError
+from scrapy.utils.misc import load_object
+
+
+class Command(ScrapyCommand):
+    requires_project = True
+    default_settings = {"LOG_ENABLED": False}
+
+    actions = ("info", "prune", "compact")
+
+    def syntax(self) -> str:
+        return "[options] <info|prune|compact> [spider ...]"
+
+    def short_desc(self) -> str:
+        return "Inspect and maintain the HTTP cache"
+
+    def long_desc(self) -> str:
+        return (
+            "Report the number of entries and the size of the HTTP cache of "
+            "spiders (info), remove expired entries (prune), or reclaim the "
+            "space of removed entries (compact). All spiders are used if none "
+            "is given."
+        )
+
+    def add_options(self, parser: argparse.ArgumentParser) -> None:
+        super().add_options(parser)
+        parser.add_argument(
+            "--max-age",
+            dest="max_age",
+            type=float,
+            default=None,
+            help="prune entries older than MAX_AGE seconds "
+            "(default: HTTPCACHE_EXPIRATION_SECS)",
+        )
+
+    def run(self, args: List[str], opts: argparse.Namespace) -> None:
+        if not args or args[0] not in self.actions:
+            raise UsageError()
+        action, spider_names = args[0], args[1:]
+        assert self.crawler_process
+        assert self.settings is not None
+        if not spider_names:
+            spider_names = sorted(self.crawler_process.spider_loader.list())
+        max_age = opts.max_age
+        if max_age is None:
+            max_age = self.settings.getfloat("HTTPCACHE_EXPIRATION_SECS")
+        if action == "prune" and max_age <= 0:
+            raise UsageError(
+                "Cache entries never expire, use --max-age or set "
+                "HTTPCACHE_EXPIRATION_SECS",
+                print_help=False,
+            )
+
+        storage_cls = load_object(self.settings["HTTPCACHE_STORAGE"])
+        if not hasattr(storage_cls, action):
+            raise UsageError(
+                f"{storage_cls.__name__} does not support the {action} action",
+                print_help=False,
+            )
+        storage = storage_cls(self.settings)
+        for spider_name in spider_names:
+            if action == "info":
+                info = storage.info(spider_name)
+                print(
+                    f"{spider_name}: {info['entries']} entries, {info['bytes']} bytes"
+                )
+            elif action == "prune":
+                count = storage.prune(spider_name, max_age)
+                print(f"{spider_name}: {count} entries removed")
+            else:
+                storage.compact(spider_name)
+                print(f"{spider_name}: compacted")
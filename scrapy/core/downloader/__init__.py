@@ -1,3 +1,4 @@
+import logging
 import random
 import warnings
 from collections import deque
@@ -5,12 +6,18 @@ from datetime import datetime
 from time import time
 from typing import TYPE_CHECKING, Any, Deque, Dict, Optional, Set, Tuple, cast
 
-from twisted.internet import task
-from twisted.internet.defer import Deferred
+from twisted.internet import defer, task
+from twisted.internet.defer import CancelledError, Deferred
+from twisted.internet.error import TimeoutError
+from twisted.python.failure import Failure
 
 from scrapy import Request, Spider, signals
+from scrapy.core.downloader.bandwidth import TokenBucket
+from scrapy.core.downloader.breaker import CircuitBreaker
 from scrapy.core.downloader.handlers import DownloadHandlers
+from scrapy.core.downloader.hedging import RequestHedger
 from scrapy.core.downloader.middleware import DownloaderMiddlewareManager
+from scrapy.core.downloader.timings import timing_bucket, timings_enabled
 from scrapy.exceptions import ScrapyDeprecationWarning
 from scrapy.http import Response
 from scrapy.resolver import dnscache
@@ -21,6 +28,10 @@ from scrapy.utils.httpobj import urlparse_cached
 
 if TYPE_CHECKING:
     from scrapy.crawler import Crawler
+    from scrapy.statscollectors import StatsCollector
+
+
+logger = logging.getLogger(__name__)
 
 
 class Slot:
@@ -33,18 +44,47 @@ class Slot:
         randomize_delay: bool,
         *,
         throttle: Optional[bool] = None,
+        bandwidth: float = 0,
     ):
         self.concurrency: int = concurrency
         self.delay: float = delay
         self.randomize_delay: bool = randomize_delay
         self.throttle = throttle
+        self.bandwidth: float = bandwidth
+        self.bandwidth_bucket: Optional[TokenBucket] = (
+            TokenBucket(bandwidth) if bandwidth > 0 else None
+        )
 
         self.active: Set[Request] = set()
         self.queue: Deque[Tuple[Request, Deferred]] = deque()
+        # Time at which each request of the queue was enqueued
+        self.enqueued: Dict[Request, float] = {}
         self.transferring: Set[Request] = set()
         self.lastseen: float = 0
         self.latercall = None
 
+        # Bandwidth statistics
+        self.response_bytes: int = 0
+        self.transfer_time: float = 0.0
+        self.transfer_started: float = 0.0
+
+        # Recent download latencies, used to hedge slow requests and to
+        # adapt download timeouts
+        self.latencies: Deque[float] = deque(maxlen=100)
+
+        self.breaker: Optional[CircuitBreaker] = None
+
+    def latency_percentile(
+        self, percentile: float, min_samples: int = 20
+    ) -> Optional[float]:
+        """Return the given percentile of the recent download latencies, or
+        ``None`` if there are fewer than *min_samples* of them."""
+        samples = len(self.latencies)
+        if samples < min_samples:
+            return None
+        index = min(samples - 1, int(samples * percentile / 100))
+        return sorted(self.latencies)[index]
+
     def free_transfer_slots(self) -> int:
         return self.concurrency - len(self.transferring)
 
@@ -96,6 +136,7 @@ class Downloader:
     def __init__(self, crawler: "Crawler"):
         self.settings: BaseSettings = crawler.settings
         self.signals: SignalManager = crawler.signals
+        self.stats: Optional[StatsCollector] = crawler.stats
         self.slots: Dict[str, Slot] = {}
         self.active: Set[Request] = set()
         self.handlers: DownloadHandlers = DownloadHandlers(crawler)
@@ -113,6 +154,40 @@ class Downloader:
         self.per_slot_settings: Dict[str, Dict[str, Any]] = self.settings.getdict(
             "DOWNLOAD_SLOTS", {}
         )
+        self.bandwidth: float = self.settings.getfloat("DOWNLOAD_BANDWIDTH")
+        self.bandwidth_bucket: Optional[TokenBucket] = (
+            TokenBucket(self.bandwidth) if self.bandwidth > 0 else None
+        )
+        self.slot_bandwidth: float = self.settings.getfloat(
+            "DOWNLOAD_BANDWIDTH_PER_SLOT"
+        )
+        self.requests_per_second: float = self.settings.getfloat(
+            "DOWNLOAD_REQUESTS_PER_SECOND"
+        )
+        # A capacity of one request spreads requests evenly over time
+        self.rate_bucket: Optional[TokenBucket] = (
+            TokenBucket(self.requests_per_second, capacity=1)
+            if self.requests_per_second > 0
+            else None
+        )
+        self._rate_limited_since: Optional[float] = None
+        self.breaker_enabled: bool = self.settings.getbool("DOWNLOAD_BREAKER_ENABLED")
+        self.breaker_failures: int = self.settings.getint("DOWNLOAD_BREAKER_FAILURES")
+        self.breaker_cooldown: float = self.settings.getfloat(
+            "DOWNLOAD_BREAKER_COOLDOWN"
+        )
+        # Keys of the slots whose circuit breaker is not closed
+        self.broken_slots: Set[str] = set()
+        self.hedger: Optional[RequestHedger] = (
+            RequestHedger(self.settings, self.stats)
+            if self.settings.getbool("DOWNLOAD_HEDGE_ENABLED")
+            else None
+        )
+        self.timing_stats: bool = self.settings.getbool("DOWNLOAD_TIMINGS_STATS")
+        self.slow_request_threshold: float = self.settings.getfloat(
+            "DOWNLOAD_SLOW_REQUEST_THRESHOLD"
+        )
+        self.timings: bool = timings_enabled(self.settings)
 
     def fetch(self, request: Request, spider: Spider) -> Deferred:
         def _deactivate(response: Response) -> Response:
@@ -124,7 +199,44 @@ class Downloader:
         return dfd.addBoth(_deactivate)
 
     def needs_backout(self) -> bool:
-        return len(self.active) >= self.total_concurrency
+        return (
+            len(self.active) - self._parked_requests() >= self.total_concurrency
+            or self.rate_limit_delay() > 0
+        )
+
+    def _parked_requests(self) -> int:
+        """Return the number of requests waiting in the queue of slots whose
+        circuit breaker is open, which do not count against
+        :setting:`CONCURRENT_REQUESTS`."""
+        return sum(
+            len(self.slots[key].queue) for key in self.broken_slots if key in self.slots
+        )
+
+    def slot_blocked(self, key: str) -> bool:
+        """Return whether requests for the *key* slot are held back by its
+        circuit breaker."""
+        slot = self.slots.get(key)
+        return bool(slot and slot.breaker and slot.breaker.blocked())
+
+    def rate_limit_delay(self) -> float:
+        """Return the number of seconds to wait before sending a new request
+        to stay within :setting:`DOWNLOAD_REQUESTS_PER_SECOND`."""
+        if self.rate_bucket is None:
+            return 0.0
+        delay = self.rate_bucket.wait_time(1)
+        if delay and self._rate_limited_since is None:
+            self._rate_limited_since = time()
+        return delay
+
+    def _record_rate_limit_wait(self) -> None:
+        if self._rate_limited_since is None:
+            return
+        if self.stats:
+            self.stats.inc_value("downloader/rate_limit/wait_count")
+            self.stats.inc_value(
+                "downloader/rate_limit/wait_time", time() - self._rate_limited_since
+            )
+        self._rate_limited_since = None
 
     def _get_slot(self, request: Request, spider: Spider) -> Tuple[str, Slot]:
         key = self.get_slot_key(request)
@@ -140,7 +252,14 @@ class Downloader:
             )
             randomize_delay = slot_settings.get("randomize_delay", self.randomize_delay)
             throttle = slot_settings.get("throttle", None)
-            new_slot = Slot(conc, delay, randomize_delay, throttle=throttle)
+            bandwidth = slot_settings.get("bandwidth", self.slot_bandwidth)
+            new_slot = Slot(
+                conc, delay, randomize_delay, throttle=throttle, bandwidth=bandwidth
+            )
+            if self.breaker_enabled:
+                new_slot.breaker = CircuitBreaker(
+                    self.breaker_failures, self.breaker_cooldown
+                )
             self.slots[key] = new_slot
 
         return key, self.slots[key]
@@ -177,6 +296,8 @@ class Downloader:
         )
         deferred: Deferred = Deferred().addBoth(_deactivate)
         slot.queue.append((request, deferred))
+        if self.timings:
+            slot.enqueued[request] = time()
         self._process_queue(spider, slot)
         return deferred
 
@@ -199,8 +320,35 @@ class Downloader:
 
         # Process enqueued requests if there are free slots to transfer for this slot
         while slot.queue and slot.free_transfer_slots() > 0:
+            if slot.breaker is not None and not slot.breaker.allow_request():
+                # Wait for the end of the cooldown, or for the probe request
+                # to finish
+                retry_after = slot.breaker.retry_after()
+                if retry_after:
+                    slot.latercall = reactor.callLater(
+                        retry_after, self._process_queue, spider, slot
+                    )
+                break
+            if self.rate_bucket is not None:
+                # Only requests that are actually sent count towards
+                # DOWNLOAD_REQUESTS_PER_SECOND, not those that downloader
+                # middlewares answer, e.g. from the HTTP cache
+                rate_limit_delay = self.rate_limit_delay()
+                if rate_limit_delay:
+                    slot.latercall = reactor.callLater(
+                        rate_limit_delay, self._process_queue, spider, slot
+                    )
+                    break
+                self.rate_bucket.consume(1)
+                self._record_rate_limit_wait()
             slot.lastseen = now
             request, deferred = slot.queue.popleft()
+            if self.timings:
+                # Timings of previous downloads of the request, e.g. before a
+                # retry, are discarded
+                request.meta["download_timings"] = {
+                    "queue": now - slot.enqueued.pop(request, now)
+                }
             dfd = self._download(slot, request, spider)
             dfd.chainDeferred(deferred)
             # prevent burst if inter-request delays were configured
@@ -212,7 +360,16 @@ class Downloader:
         # The order is very important for the following deferreds. Do not change!
 
         # 1. Create the download deferred
-        dfd = mustbe_deferred(self.handlers.download_request, request, spider)
+        if self.hedger is not None:
+            dfd = self.hedger.download(
+                slot,
+                request,
+                lambda attempt_request: mustbe_deferred(
+                    self.handlers.download_request, attempt_request, spider
+                ),
+            )
+        else:
+            dfd = mustbe_deferred(self.handlers.download_request, request, spider)
 
         # 2. Notify response_downloaded listeners about the recent download
         # before querying queue for next request
@@ -231,10 +388,24 @@ class Downloader:
         # state to free up the transferring slot so it can be used by the
         # following requests (perhaps those which came from the downloader
         # middleware itself)
+        if not slot.transferring:
+            slot.transfer_started = time()
         slot.transferring.add(request)
+        started = time()
 
         def finish_transferring(_: Any) -> Any:
             slot.transferring.remove(request)
+            if not isinstance(_, Failure):
+                slot.latencies.append(time() - started)
+                self._record_timings(request)
+            elif _.check(defer.TimeoutError, TimeoutError):
+                # Count the timeout as a latency, so that adaptive timeouts
+                # (DOWNLOAD_TIMEOUT_ADAPTIVE) grow when a slot slows down
+                slot.latencies.append(time() - started)
+            if slot.breaker is not None:
+                self._update_breaker(request, slot, _, time() - started)
+            if not slot.transferring:
+                self._update_throughput(request.meta.get(self.DOWNLOAD_SLOT, ""), slot)
             self._process_queue(spider, slot)
             self.signals.send_catch_log(
                 signal=signals.request_left_downloader, request=request, spider=spider
@@ -243,6 +414,104 @@ class Downloader:
 
         return dfd.addBoth(finish_transferring)
 
+    def _record_timings(self, request: Request) -> None:
+        timings = request.meta.get("download_timings")
+        if not timings:
+            return
+        key = request.meta.get(self.DOWNLOAD_SLOT, "")
+        if self.timing_stats and self.stats:
+            for phase, duration in timings.items():
+                self.stats.inc_value(
+                    f"downloader/timings/{key}/{phase}/{timing_bucket(duration)}"
+                )
+        total = sum(timings.values())
+        if self.slow_request_threshold and total >= self.slow_request_threshold:
+            if self.stats:
+                self.stats.inc_value("downloader/slow_request_count")
+            logger.info(
+                "Slow download of %(request)s (%(total).3fs): %(timings)s",
+                {
+                    "request": request,
+                    "total": total,
+                    "timings": ", ".join(
+                        f"{phase} {duration:.3f}s"
+                        for phase, duration in timings.items()
+                    ),
+                },
+            )
+
+    def _update_breaker(
+        self, request: Request, slot: Slot, result: Any, download_time: float
+    ) -> None:
+        assert slot.breaker is not None
+        key = request.meta.get(self.DOWNLOAD_SLOT, "")
+        if not isinstance(result, Failure):
+            if slot.breaker.record_success():
+                self.broken_slots.discard(key)
+                logger.info("Resuming downloads from slot %(slot)s", {"slot": key})
+            return
+        if result.check(CancelledError) and (
+            slot.breaker.state != CircuitBreaker.HALF_OPEN
+        ):
+            return
+        if self.stats:
+            self.stats.inc_value(
+                "downloader/circuit_breaker/failed_download_time", download_time
+            )
+        was_probe = slot.breaker.state == CircuitBreaker.HALF_OPEN
+        if not slot.breaker.record_failure():
+            return
+        self.broken_slots.add(key)
+        if self.stats:
+            self.stats.inc_value("downloader/circuit_breaker/open_count")
+        logger.info(
+            "Pausing downloads from slot %(slot)s for %(cooldown)ss after "
+            "%(reason)s",
+            {
+                "slot": key,
+                "cooldown": slot.breaker.cooldown,
+                "reason": (
+                    "a failed probe request"
+                    if was_probe
+                    else f"{slot.breaker.failures} consecutive failures"
+                ),
+            },
+        )
+
+    def transfer_delay(self, request: Request, size: int) -> float:
+        """Account for *size* bytes received for *request* and return the
+        number of seconds to stop reading its response for, in order to
+        respect the crawl-wide and per-slot bandwidth limits."""
+        delay = 0.0
+        if self.bandwidth_bucket is not None:
+            delay = self.bandwidth_bucket.consume(size)
+        key = request.meta.get(self.DOWNLOAD_SLOT)
+        slot = self.slots.get(key) if key is not None else None
+        if slot is None:
+            return delay
+        slot.response_bytes += size
+        if slot.bandwidth_bucket is not None:
+            delay = max(delay, slot.bandwidth_bucket.consume(size))
+        if delay and self.stats:
+            self.stats.inc_value("downloader/bandwidth/delay_count")
+            self.stats.inc_value("downloader/bandwidth/delay_time", delay)
+        return delay
+
+    def _update_throughput(self, key: str, slot: Slot) -> None:
+        slot.transfer_time += time() - slot.transfer_started
+        if not self.stats or not (
+            slot.bandwidth_bucket is not None or self.bandwidth_bucket is not None
+        ):
+            return
+        self.stats.set_value(
+            f"downloader/bandwidth/{key}/response_bytes", slot.response_bytes
+        )
+        if slot.transfer_time:
+            self.stats.set_value(
+                f"downloader/bandwidth/{key}/throughput",
+                round(slot.response_bytes / slot.transfer_time),
+            )
+
     def close(self) -> None:
         self._slot_gc_loop.stop()
         for slot in self.slots.values():
@@ -251,5 +520,10 @@ class Downloader:
     def _slot_gc(self, age: float = 60) -> None:
         mintime = time() - age
         for key, slot in list(self.slots.items()):
+            if slot.breaker is not None and slot.breaker.state != slot.breaker.CLOSED:
+                # Forgetting the slot would also forget that its server is
+                # failing
+                continue
             if not slot.active and slot.lastseen + slot.delay < mintime:
                 self.slots.pop(key).close()
+                self.broken_slots.discard(key)
@@ -0,0 +1,69 @@
+"""Bandwidth and request rate limiting of downloads
+
+See the DOWNLOAD_BANDWIDTH and DOWNLOAD_REQUESTS_PER_SECOND settings in
+docs/topics/settings.rst
+"""
+
+from __future__ import annotations
+
+from time import monotonic
+from typing import TYPE_CHECKING, Callable, Optional
+
+from scrapy import Request
+
+if TYPE_CHECKING:
+    from scrapy.crawler import Crawler
+
+
+class TokenBucket:
+    """Token bucket that refills at *rate* tokens (bytes) per second, up to
+    *capacity* tokens, which defaults to one second worth of tokens.
+
+    Consuming more tokens than available is allowed, :meth:`consume` then
+    returns the number of seconds to wait for the bucket to be paid off.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: Optional[float] = None,
+        clock: Callable[[], float] = monotonic,
+    ):
+        if rate <= 0:
+            raise ValueError(f"The rate of a token bucket must be positive: {rate!r}")
+        self.rate: float = rate
+        self.capacity: float = capacity if capacity is not None else rate
+        self._clock: Callable[[], float] = clock
+        self._tokens: float = self.capacity
+        self._updated: float = clock()
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def consume(self, amount: float) -> float:
+        self._refill()
+        self._tokens -= amount
+        if self._tokens >= 0:
+            return 0.0
+        return -self._tokens / self.rate
+
+    def wait_time(self, amount: float) -> float:
+        """Return the number of seconds until *amount* tokens are available,
+        without consuming them."""
+        self._refill()
+        if self._tokens >= amount:
+            return 0.0
+        return (amount - self._tokens) / self.rate
+
+
+def transfer_delay(crawler: Optional[Crawler], request: Request, size: int) -> float:
+    """Account for *size* bytes of the response to *request* and return the
+    number of seconds for which the download handler must stop reading the
+    response to stay within the bandwidth limits."""
+    if crawler is None or crawler.engine is None:
+        return 0.0
+    return crawler.engine.downloader.transfer_delay(request, size)
@@ -0,0 +1,76 @@
+"""Circuit breaking of failing downloader slots
+
+See the DOWNLOAD_BREAKER_ENABLED setting in docs/topics/settings.rst
+"""
+
+from time import monotonic
+from typing import Callable
+
+
+class CircuitBreaker:
+    """Stop sending requests to a downloader slot after *max_failures*
+    consecutive download failures for *cooldown* seconds, then let a single
+    probe request through to decide whether to resume sending requests."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(
+        self,
+        max_failures: int,
+        cooldown: float,
+        clock: Callable[[], float] = monotonic,
+    ):
+        self.max_failures: int = max_failures
+        self.cooldown: float = cooldown
+        self._clock: Callable[[], float] = clock
+        self.state: str = self.CLOSED
+        self.failures: int = 0
+        self.opened_at: float = 0.0
+
+    def retry_after(self) -> float:
+        """Return the number of seconds left before a probe request can be
+        sent, if the circuit is open."""
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.cooldown - self._clock())
+
+    def blocked(self) -> bool:
+        """Return whether requests must be held back, without changing the
+        state of the circuit."""
+        if self.state == self.OPEN:
+            return self.retry_after() > 0
+        return self.state == self.HALF_OPEN
+
+    def allow_request(self) -> bool:
+        """Return whether a request can be sent. The first request allowed
+        after the cooldown is the probe."""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and self.retry_after() == 0:
+            self.state = self.HALF_OPEN
+            return True
+        return False
+
+    def record_success(self) -> bool:
+        """Record a successful download, and return whether it closed the
+        circuit."""
+        self.failures = 0
+        if self.state == self.CLOSED:
+            return False
+        self.state = self.CLOSED
+        return True
+
+    def record_failure(self) -> bool:
+        """Record a failed download, and return whether it opened the
+        circuit."""
+        if self.state == self.OPEN:
+            # A request sent before the circuit opened
+            return False
+        self.failures += 1
+        if self.state == self.CLOSED and self.failures < self.max_failures:
+            return False
+        self.state = self.OPEN
+        self.opened_at = self._clock()
+        return True
@@ -5,12 +5,7 @@ from typing import TYPE_CHECKING, Any, List, Optional
 
 from OpenSSL import SSL
 from twisted.internet._sslverify import _setAcceptableProtocols
-from twisted.internet.ssl import (
-    AcceptableCiphers,
-    CertificateOptions,
-    optionsForClientTLS,
-    platformTrust,
-)
+from twisted.internet.ssl import AcceptableCiphers, CertificateOptions, platformTrust
 from twisted.web.client import BrowserLikePolicyForHTTPS
 from twisted.web.iweb import IPolicyForHTTPS
 from zope.interface.declarations import implementer
@@ -19,6 +14,8 @@ from zope.interface.verify import verifyObject
 from scrapy.core.downloader.tls import (
     DEFAULT_CIPHERS,
     ScrapyClientTLSOptions,
+    SharedContextClientTLSOptions,
+    TLSSessionCache,
     openssl_methods,
 )
 from scrapy.crawler import Crawler
@@ -31,6 +28,8 @@ if TYPE_CHECKING:
     # typing.Self requires Python 3.11
     from typing_extensions import Self
 
+    from scrapy.statscollectors import StatsCollector
+
 
 @implementer(IPolicyForHTTPS)
 class ScrapyClientContextFactory(BrowserLikePolicyForHTTPS):
@@ -42,13 +41,25 @@ class ScrapyClientContextFactory(BrowserLikePolicyForHTTPS):
 
     'A TLS/SSL connection established with [this method] may
      understand the TLSv1, TLSv1.1 and TLSv1.2 protocols.'
+
+    A single OpenSSL context is shared by all connections, and the TLS
+    session of each host is reused by later connections to that host, up to
+    ``tls_session_cache_size`` hosts.
     """
 
+    # class attributes so that they are defined for subclasses not calling
+    # super().__init__
+    tls_session_cache_size: int = 0
+    _context: Optional[SSL.Context] = None
+    _session_cache: Optional[TLSSessionCache] = None
+    _stats: Optional[StatsCollector] = None
+
     def __init__(
         self,
         method: int = SSL.SSLv23_METHOD,
         tls_verbose_logging: bool = False,
         tls_ciphers: Optional[str] = None,
+        tls_session_cache_size: int = 0,
         *args: Any,
         **kwargs: Any,
     ):
@@ -60,6 +71,7 @@ class ScrapyClientContextFactory(BrowserLikePolicyForHTTPS):
             self.tls_ciphers = AcceptableCiphers.fromOpenSSLCipherString(tls_ciphers)
         else:
             self.tls_ciphers = DEFAULT_CIPHERS
+        self.tls_session_cache_size: int = tls_session_cache_size
 
     @classmethod
     def from_settings(
@@ -73,14 +85,30 @@ class ScrapyClientContextFactory(BrowserLikePolicyForHTTPS):
             "DOWNLOADER_CLIENT_TLS_VERBOSE_LOGGING"
         )
         tls_ciphers: Optional[str] = settings["DOWNLOADER_CLIENT_TLS_CIPHERS"]
+        tls_session_cache_size: int = settings.getint(
+            "DOWNLOADER_CLIENT_TLS_SESSION_CACHE_SIZE"
+        )
         return cls(  # type: ignore[misc]
             method=method,
             tls_verbose_logging=tls_verbose_logging,
             tls_ciphers=tls_ciphers,
+            tls_session_cache_size=tls_session_cache_size,
             *args,
             **kwargs,
         )
 
+    @classmethod
+    def from_crawler(
+        cls,
+        crawler: Crawler,
+        method: int = SSL.SSLv23_METHOD,
+        *args: Any,
+        **kwargs: Any,
+    ) -> Self:
+        context_factory = cls.from_settings(crawler.settings, method, *args, **kwargs)
+        context_factory._stats = crawler.stats
+        return context_factory
+
     def getCertificateOptions(self) -> CertificateOptions:
         # setting verify=True will require you to provide CAs
         # to verify against; in other words: it's not that simple
@@ -107,11 +135,32 @@ class ScrapyClientContextFactory(BrowserLikePolicyForHTTPS):
         ctx.set_options(0x4)  # OP_LEGACY_SERVER_CONNECT
         return ctx
 
+    def _new_context(self) -> SSL.Context:
+        return self.getContext()
+
+    def _get_context(self) -> SSL.Context:
+        # getContext() builds a new OpenSSL context on every call. Share a
+        # single one among all connections instead, which is cheaper and
+        # required for TLS session resumption.
+        if self._context is None:
+            self._context = self._new_context()
+            self._context.set_session_cache_mode(SSL.SESS_CACHE_CLIENT)
+        return self._context
+
+    def _get_session_cache(self) -> TLSSessionCache:
+        if self._session_cache is None:
+            self._session_cache = TLSSessionCache(
+                self.tls_session_cache_size, stats=self._stats
+            )
+        return self._session_cache
+
     def creatorForNetloc(self, hostname: bytes, port: int) -> "ClientTLSOptions":
         return ScrapyClientTLSOptions(
             hostname.decode("ascii"),
-            self.getContext(),
+            self._get_context(),
             verbose_logging=self.tls_verbose_logging,
+            session_cache=self._get_session_cache(),
+            session_key=(hostname, port),
         )
 
 
@@ -128,21 +177,29 @@ class BrowserLikeContextFactory(ScrapyClientContextFactory):
 
     :meth:`creatorForNetloc` is the same as
     :class:`~twisted.web.client.BrowserLikePolicyForHTTPS` except this context
-    factory allows setting the TLS/SSL method to use.
+    factory allows setting the TLS/SSL method to use, and it reuses its
+    OpenSSL context and TLS sessions across connections.
 
     The default OpenSSL method is ``TLS_METHOD`` (also called
     ``SSLv23_METHOD``) which allows TLS protocol negotiation.
     """
 
-    def creatorForNetloc(self, hostname: bytes, port: int) -> "ClientTLSOptions":
+    def _new_context(self) -> SSL.Context:
         # trustRoot set to platformTrust() will use the platform's root CAs.
         #
         # This means that a website like https://www.cacert.org will be rejected
         # by default, since CAcert.org CA certificate is seldom shipped.
-        return optionsForClientTLS(
-            hostname=hostname.decode("ascii"),
+        return CertificateOptions(
             trustRoot=platformTrust(),
-            extraCertificateOptions={"method": self._ssl_method},
+            method=self._ssl_method,
+        ).getContext()
+
+    def creatorForNetloc(self, hostname: bytes, port: int) -> "ClientTLSOptions":
+        return SharedContextClientTLSOptions(
+            hostname.decode("ascii"),
+            self._get_context(),
+            session_cache=self._get_session_cache(),
+            session_key=(hostname, port),
         )
 
 
@@ -188,7 +245,8 @@ def load_context_factory_from_settings(
             f"{settings['DOWNLOADER_CLIENTCONTEXTFACTORY']} does not accept "
             "a `method` argument (type OpenSSL.SSL method, e.g. "
             "OpenSSL.SSL.SSLv23_METHOD) and/or a `tls_verbose_logging` "
-            "argument and/or a `tls_ciphers` argument. Please, upgrade your "
+            "argument and/or a `tls_ciphers` argument and/or a "
+            "`tls_session_cache_size` argument. Please, upgrade your "
             "context factory class to handle them or ignore them."
         )
         warnings.warn(msg)
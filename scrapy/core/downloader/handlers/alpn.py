@@ -0,0 +1,104 @@
+"""Download handler that picks HTTP/2 or HTTP/1.1 for each host through ALPN"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Tuple, Union
+
+from twisted.internet.defer import Deferred, DeferredList
+from twisted.python.failure import Failure
+from twisted.web.client import ResponseFailed
+
+from scrapy.core.downloader.handlers.http2 import H2DownloadHandler
+from scrapy.core.downloader.handlers.http11 import HTTP11DownloadHandler
+from scrapy.core.http2.protocol import PROTOCOL_NAME, InvalidNegotiatedProtocol
+from scrapy.crawler import Crawler
+from scrapy.http import Request, Response
+from scrapy.settings import Settings
+from scrapy.spiders import Spider
+from scrapy.utils.datatypes import LocalCache
+from scrapy.utils.httpobj import urlparse_cached
+
+if TYPE_CHECKING:
+    # typing.Self requires Python 3.11
+    from typing_extensions import Self
+
+
+HTTP11_PROTOCOL_NAME = b"http/1.1"
+
+
+def _is_http11_negotiated(failure: Failure) -> bool:
+    """Return whether a failure of the HTTP/2 handler means that the server
+    chose HTTP/1.1, or did not support ALPN, during the TLS handshake."""
+    if failure.check(InvalidNegotiatedProtocol):
+        return True
+    if not failure.check(ResponseFailed):
+        return False
+    for reason in failure.value.reasons:
+        if isinstance(reason, Failure):
+            reason = reason.value
+        if isinstance(reason, InvalidNegotiatedProtocol):
+            return True
+    return False
+
+
+class ALPNDownloadHandler:
+    """Download handler for the ``https`` scheme that offers both HTTP/2 and
+    HTTP/1.1 during the TLS handshake and remembers the protocol chosen by
+    each host, so that its next requests are sent to the matching connection
+    pool right away."""
+
+    def __init__(self, settings: Settings, crawler: Crawler):
+        self._http11_handler = HTTP11DownloadHandler(settings, crawler)
+        self._h2_handler = H2DownloadHandler(
+            settings,
+            crawler,
+            acceptable_protocols=[PROTOCOL_NAME, HTTP11_PROTOCOL_NAME],
+        )
+        # (host, port) -> negotiated protocol
+        self._protocols: LocalCache[Tuple[str, int], bytes] = LocalCache(10000)
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> Self:
+        return cls(crawler.settings, crawler)
+
+    def download_request(self, request: Request, spider: Spider) -> Deferred:
+        parsed = urlparse_cached(request)
+        if parsed.scheme != "https" or request.meta.get("proxy"):
+            # Protocol negotiation only happens over TLS connections to the
+            # server itself
+            return self._http11_handler.download_request(request, spider)
+        key = (parsed.hostname or "", parsed.port or 443)
+        protocol = self._protocols.get(key)
+        if protocol == HTTP11_PROTOCOL_NAME:
+            return self._http11_handler.download_request(request, spider)
+        d = self._h2_handler.download_request(request, spider)
+        if protocol is None:
+            d.addCallbacks(
+                self._cb_h2_negotiated,
+                self._eb_h2_failed,
+                callbackArgs=(key,),
+                errbackArgs=(key, request, spider),
+            )
+        return d
+
+    def _cb_h2_negotiated(self, response: Response, key: Tuple[str, int]) -> Response:
+        self._protocols[key] = PROTOCOL_NAME
+        return response
+
+    def _eb_h2_failed(
+        self,
+        failure: Failure,
+        key: Tuple[str, int],
+        request: Request,
+        spider: Spider,
+    ) -> Union[Deferred, Failure]:
+        if not _is_http11_negotiated(failure):
+            return failure
+        self._protocols[key] = HTTP11_PROTOCOL_NAME
+        return self._http11_handler.download_request(request, spider)
+
+    def close(self) -> Deferred:
+        return DeferredList(
+            [self._http11_handler.close(), self._h2_handler.close()],
+            consumeErrors=True,
+        )
@@ -12,10 +12,10 @@ from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Union, cast
 from urllib.parse import urldefrag, urlunparse
 
 from twisted.internet import ssl
-from twisted.internet.base import ReactorBase
+from twisted.internet.base import DelayedCall, ReactorBase
 from twisted.internet.defer import CancelledError, Deferred, succeed
 from twisted.internet.endpoints import TCP4ClientEndpoint
-from twisted.internet.error import TimeoutError
+from twisted.internet.error import ConnectingCancelledError, TimeoutError
 from twisted.internet.interfaces import IConsumer
 from twisted.internet.protocol import Factory, Protocol, connectionDone
 from twisted.python.failure import Failure
@@ -28,13 +28,22 @@ from twisted.web.iweb import UNKNOWN_LENGTH, IBodyProducer, IPolicyForHTTPS
 from zope.interface import implementer
 
 from scrapy import Request, Spider, signals
+from scrapy.core.downloader.bandwidth import transfer_delay
 from scrapy.core.downloader.contextfactory import load_context_factory_from_settings
+from scrapy.core.downloader.timings import (
+    DownloadTimer,
+    TimingEndpointFactory,
+    timings_enabled,
+)
 from scrapy.core.downloader.webclient import _parse
 from scrapy.crawler import Crawler
+from scrapy.downloadermiddlewares.downloadtimeout import _get_download_timeout
+from scrapy.downloadermiddlewares.httpcompression import _split_encodings
 from scrapy.exceptions import StopDownload
 from scrapy.http import Headers, Response
 from scrapy.responsetypes import responsetypes
 from scrapy.settings import BaseSettings
+from scrapy.utils._compression import _DecompressionMaxSizeExceeded, _StreamDecompressor
 from scrapy.utils.python import to_bytes, to_unicode
 
 if TYPE_CHECKING:
@@ -65,6 +74,11 @@ class HTTP11DownloadHandler:
         self._default_maxsize: int = settings.getint("DOWNLOAD_MAXSIZE")
         self._default_warnsize: int = settings.getint("DOWNLOAD_WARNSIZE")
         self._fail_on_dataloss: bool = settings.getbool("DOWNLOAD_FAIL_ON_DATALOSS")
+        self._decompress: bool = settings.getbool(
+            "COMPRESSION_ENABLED"
+        ) and settings.getbool("COMPRESSION_STREAMING")
+        self._connection_timeout: float = settings.getfloat("DOWNLOAD_CONNECT_TIMEOUT")
+        self._timings: bool = timings_enabled(settings)
         self._disconnect_timeout: int = 1
 
     @classmethod
@@ -79,7 +93,10 @@ class HTTP11DownloadHandler:
             maxsize=getattr(spider, "download_maxsize", self._default_maxsize),
             warnsize=getattr(spider, "download_warnsize", self._default_warnsize),
             fail_on_dataloss=self._fail_on_dataloss,
+            decompress=self._decompress,
             crawler=self._crawler,
+            connection_timeout=self._connection_timeout,
+            timings=self._timings,
         )
         return agent.download_request(request)
 
@@ -342,17 +359,28 @@ class ScrapyAgent:
         maxsize: int = 0,
         warnsize: int = 0,
         fail_on_dataloss: bool = True,
+        decompress: bool = False,
         crawler: Crawler,
+        connection_timeout: float = 0,
+        timings: bool = False,
     ):
         self._contextFactory: IPolicyForHTTPS = contextFactory
+        # Default download timeout
         self._connectTimeout: float = connectTimeout
+        # Timeout to establish connections, 0 to use the download timeout
+        self._connection_timeout: float = connection_timeout
         self._bindAddress: Optional[bytes] = bindAddress
         self._pool: Optional[HTTPConnectionPool] = pool
         self._maxsize: int = maxsize
         self._warnsize: int = warnsize
         self._fail_on_dataloss: bool = fail_on_dataloss
+        self._decompress: bool = decompress
         self._txresponse: Optional[TxResponse] = None
+        self._headers: Optional[Headers] = None
         self._crawler: Crawler = crawler
+        # Whether to record the download_timings of requests
+        self._timings: bool = timings
+        self._timer: Optional[DownloadTimer] = None
 
     def _get_agent(self, request: Request, timeout: float) -> Agent:
         from twisted.internet import reactor
@@ -386,19 +414,36 @@ class ScrapyAgent:
                 pool=self._pool,
             )
 
-        return self._Agent(
-            reactor=reactor,
-            contextFactory=self._contextFactory,
-            connectTimeout=timeout,
-            bindAddress=bindaddress,
+        if self._timer is None:
+            return self._Agent(
+                reactor=reactor,
+                contextFactory=self._contextFactory,
+                connectTimeout=timeout,
+                bindAddress=bindaddress,
+                pool=self._pool,
+            )
+        # Time the DNS resolution, TCP connection and TLS handshake of new
+        # connections
+        return self._Agent.usingEndpointFactory(
+            reactor,
+            TimingEndpointFactory(
+                reactor, self._contextFactory, timeout, bindaddress, self._timer
+            ),
             pool=self._pool,
         )
 
     def download_request(self, request: Request) -> Deferred:
         from twisted.internet import reactor
 
-        timeout = request.meta.get("download_timeout") or self._connectTimeout
-        agent = self._get_agent(request, timeout)
+        timeout = _get_download_timeout(request, self._connectTimeout)
+        connect_timeout = min(
+            timeout,
+            request.meta.get("download_connect_timeout")
+            or self._connection_timeout
+            or timeout,
+        )
+        self._timer = DownloadTimer() if self._timings else None
+        agent = self._get_agent(request, connect_timeout)
 
         # request details
         url = urldefrag(request.url)[0]
@@ -421,24 +466,46 @@ class ScrapyAgent:
         d.addCallback(self._cb_bodydone, request, url)
         # check download timeout
         self._timeout_cl = reactor.callLater(timeout, d.cancel)
-        d.addBoth(self._cb_timeout, request, url, timeout)
+        d.addBoth(self._cb_timeout, request, url, timeout, connect_timeout)
         return d
 
     def _cb_timeout(
-        self, result: Any, request: Request, url: str, timeout: float
+        self,
+        result: Any,
+        request: Request,
+        url: str,
+        timeout: float,
+        connect_timeout: float,
     ) -> Any:
         if self._timeout_cl.active():
             self._timeout_cl.cancel()
+            if isinstance(result, Failure) and result.check(TimeoutError):
+                # The connection attempt timed out
+                self._record_timeout("connect")
+                raise TimeoutError(
+                    f"Connecting to {url} took longer than {connect_timeout} seconds."
+                )
             return result
         # needed for HTTPS requests, otherwise _ResponseReader doesn't
         # receive connectionLost()
         if self._txresponse:
             self._txresponse._transport.stopProducing()
+            self._record_timeout("body")
+        elif isinstance(result, Failure) and result.check(ConnectingCancelledError):
+            self._record_timeout("connect")
+        else:
+            self._record_timeout("response")
 
         raise TimeoutError(f"Getting {url} took longer than {timeout} seconds.")
 
+    def _record_timeout(self, phase: str) -> None:
+        if self._crawler.stats:
+            self._crawler.stats.inc_value(f"downloader/timeout/{phase}")
+
     def _cb_latency(self, result: Any, request: Request, start_time: float) -> Any:
         request.meta["download_latency"] = time() - start_time
+        if self._timer is not None:
+            self._timer.mark("ttfb")
         return result
 
     @staticmethod
@@ -449,12 +516,18 @@ class ScrapyAgent:
         headers.update(response.headers.getAllRawHeaders())
         return headers
 
+    def _get_headers(self, txresponse: TxResponse) -> Headers:
+        # Build the headers only once per response.
+        if self._headers is None:
+            self._headers = self._headers_from_twisted_response(txresponse)
+        return self._headers
+
     def _cb_bodyready(
         self, txresponse: TxResponse, request: Request
     ) -> Union[Dict[str, Any], Deferred]:
         headers_received_result = self._crawler.signals.send_catch_log(
             signal=signals.headers_received,
-            headers=self._headers_from_twisted_response(txresponse),
+            headers=self._get_headers(txresponse).copy(),
             body_length=txresponse.length,
             request=request,
             spider=self._crawler.spider,
@@ -516,6 +589,15 @@ class ScrapyAgent:
                 {"size": expected_size, "warnsize": warnsize, "request": request},
             )
 
+        decompressor: Optional[_StreamDecompressor] = None
+        content_encoding: Optional[List[bytes]] = None
+        if self._decompress and request.method != "HEAD":
+            raw_content_encoding = txresponse.headers.getRawHeaders(b"Content-Encoding")
+            if raw_content_encoding:
+                to_decode, content_encoding = _split_encodings(raw_content_encoding)
+                if to_decode:
+                    decompressor = _StreamDecompressor(to_decode, max_size=maxsize)
+
         def _cancel(_: Any) -> None:
             # Abort connection immediately.
             txresponse._transport._producer.abortConnection()
@@ -530,6 +612,8 @@ class ScrapyAgent:
                 warnsize=warnsize,
                 fail_on_dataloss=fail_on_dataloss,
                 crawler=self._crawler,
+                decompressor=decompressor,
+                content_encoding=content_encoding,
             )
         )
 
@@ -541,7 +625,26 @@ class ScrapyAgent:
     def _cb_bodydone(
         self, result: Dict[str, Any], request: Request, url: str
     ) -> Union[Response, Failure]:
-        headers = self._headers_from_twisted_response(result["txresponse"])
+        if self._timer is not None:
+            self._timer.mark("transfer")
+            request.meta.setdefault("download_timings", {}).update(self._timer.timings)
+        headers = self._get_headers(result["txresponse"])
+        content_encoding = result.get("content_encoding")
+        if content_encoding is not None:
+            # The body was decoded by _ResponseReader.
+            if content_encoding:
+                headers[b"Content-Encoding"] = content_encoding
+            else:
+                del headers[b"Content-Encoding"]
+            if self._crawler.stats:
+                self._crawler.stats.inc_value(
+                    "httpcompression/response_bytes",
+                    len(result["body"]),
+                    spider=self._crawler.spider,
+                )
+                self._crawler.stats.inc_value(
+                    "httpcompression/response_count", spider=self._crawler.spider
+                )
         respcls = responsetypes.from_args(headers=headers, url=url, body=result["body"])
         try:
             version = result["txresponse"].version
@@ -591,6 +694,8 @@ class _ResponseReader(Protocol):
         warnsize: int,
         fail_on_dataloss: bool,
         crawler: Crawler,
+        decompressor: Optional[_StreamDecompressor] = None,
+        content_encoding: Optional[List[bytes]] = None,
     ):
         self._finished: Deferred = finished
         self._txresponse: TxResponse = txresponse
@@ -607,6 +712,9 @@ class _ResponseReader(Protocol):
             None
         )
         self._crawler: Crawler = crawler
+        self._decompressor: Optional[_StreamDecompressor] = decompressor
+        self._content_encoding: Optional[List[bytes]] = content_encoding
+        self._resume_call: Optional[DelayedCall] = None
 
     def _finish_response(
         self, flags: Optional[List[str]] = None, failure: Optional[Failure] = None
@@ -619,9 +727,58 @@ class _ResponseReader(Protocol):
                 "certificate": self._certificate,
                 "ip_address": self._ip_address,
                 "failure": failure,
+                "content_encoding": (
+                    None if self._decompressor is None else self._content_encoding
+                ),
             }
         )
 
+    def _decompress(self, data: bytes, flush: bool = False) -> bool:
+        """Write *data* into the body buffer, decoding it if needed.
+
+        Returns ``False`` if the download had to be aborted."""
+        if self._decompressor is None:
+            self._bodybuf.write(data)
+            return True
+        try:
+            if data:
+                self._bodybuf.write(self._decompressor.decompress(data))
+            if flush:
+                self._bodybuf.write(self._decompressor.flush())
+        except _DecompressionMaxSizeExceeded:
+            logger.warning(
+                "Decompressed more bytes (%(bytes)s) than download "
+                "max size (%(maxsize)s) in request %(request)s.",
+                {
+                    "bytes": self._decompressor.decompressed_size,
+                    "maxsize": self._maxsize,
+                    "request": self._request,
+                },
+            )
+            self._bodybuf.truncate(0)
+            self._finished.cancel()
+            return False
+        except Exception:
+            failure = Failure()
+            logger.debug(
+                "Could not decode the body of the response to %(request)s: "
+                "%(error)s",
+                {"request": self._request, "error": failure.value},
+            )
+            if not flush:
+                assert self.transport
+                self.transport.stopProducing()
+                self.transport.loseConnection()
+            self._finished.errback(failure)
+            return False
+        return True
+
+    @property
+    def _body_size(self) -> int:
+        if self._decompressor is None:
+            return self._bytes_received
+        return self._decompressor.decompressed_size
+
     def connectionMade(self) -> None:
         assert self.transport
         if self._certificate is None:
@@ -641,8 +798,9 @@ class _ResponseReader(Protocol):
             return
 
         assert self.transport
-        self._bodybuf.write(bodyBytes)
         self._bytes_received += len(bodyBytes)
+        if not self._decompress(bodyBytes):
+            return
 
         bytes_received_result = self._crawler.signals.send_catch_log(
             signal=signals.bytes_received,
@@ -677,7 +835,7 @@ class _ResponseReader(Protocol):
 
         if (
             self._warnsize
-            and self._bytes_received > self._warnsize
+            and self._body_size > self._warnsize
             and not self._reached_warnsize
         ):
             self._reached_warnsize = True
@@ -687,23 +845,51 @@ class _ResponseReader(Protocol):
                 {"warnsize": self._warnsize, "request": self._request},
             )
 
+        if not self._finished.called:
+            delay = transfer_delay(self._crawler, self._request, len(bodyBytes))
+            if delay:
+                self._pause(delay)
+
+    def _pause(self, delay: float) -> None:
+        """Stop reading the response for *delay* seconds to stay within the
+        bandwidth limits."""
+        from twisted.internet import reactor
+
+        if self._resume_call is not None and self._resume_call.active():
+            self._resume_call.reset(delay)
+            return
+        assert self.transport
+        self.transport.pauseProducing()
+        self._resume_call = reactor.callLater(delay, self._resume)
+
+    def _resume(self) -> None:
+        self._resume_call = None
+        if not self._finished.called:
+            assert self.transport
+            self.transport.resumeProducing()
+
     def connectionLost(self, reason: Failure = connectionDone) -> None:
+        if self._resume_call is not None and self._resume_call.active():
+            self._resume_call.cancel()
         if self._finished.called:
             return
 
         if reason.check(ResponseDone):
-            self._finish_response()
+            if self._decompress(b"", flush=True):
+                self._finish_response()
             return
 
         if reason.check(PotentialDataLoss):
-            self._finish_response(flags=["partial"])
+            if self._decompress(b"", flush=True):
+                self._finish_response(flags=["partial"])
             return
 
         if reason.check(ResponseFailed) and any(
             r.check(_DataLoss) for r in reason.value.reasons
         ):
             if not self._fail_on_dataloss:
-                self._finish_response(flags=["dataloss"])
+                if self._decompress(b"", flush=True):
+                    self._finish_response(flags=["dataloss"])
                 return
 
             if not self._fail_on_dataloss_warned:
@@ -0,0 +1,753 @@
+"""Download handler for http and https schemes built on asyncio streams
+
+It requires the asyncio reactor, see :setting:`TWISTED_REACTOR`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import ipaddress
+import logging
+import ssl
+from collections import deque
+from io import BytesIO
+from time import time
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterator,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+from urllib.parse import urldefrag
+
+from OpenSSL.crypto import FILETYPE_ASN1
+from twisted.internet.defer import CancelledError, Deferred
+from twisted.internet.error import ConnectionDone, DNSLookupError, TimeoutError
+from twisted.internet.interfaces import IAddress, IHostResolution, IResolutionReceiver
+from twisted.internet.ssl import Certificate
+from twisted.python.failure import Failure
+from twisted.web.client import ResponseFailed
+from twisted.web.http import _DataLoss
+from twisted.web.iweb import UNKNOWN_LENGTH
+from zope.interface import implementer
+
+from scrapy import Request, Spider, signals
+from scrapy.core.downloader.bandwidth import transfer_delay
+from scrapy.core.downloader.handlers.http11 import TunnelError, tunnel_request_data
+from scrapy.core.downloader.timings import DownloadTimer, timings_enabled
+from scrapy.core.downloader.tls import METHOD_TLSv10, METHOD_TLSv11, METHOD_TLSv12
+from scrapy.core.downloader.webclient import _parse
+from scrapy.crawler import Crawler
+from scrapy.downloadermiddlewares.downloadtimeout import _get_download_timeout
+from scrapy.exceptions import NotConfigured, StopDownload
+from scrapy.http import Headers, Response
+from scrapy.responsetypes import responsetypes
+from scrapy.settings import BaseSettings
+from scrapy.utils.defer import deferred_from_coro, deferred_to_future
+from scrapy.utils.python import to_bytes
+from scrapy.utils.reactor import is_asyncio_reactor_installed
+
+if TYPE_CHECKING:
+    # typing.Self requires Python 3.11
+    from typing_extensions import Self
+
+
+logger = logging.getLogger(__name__)
+
+
+_tls_versions: Dict[str, ssl.TLSVersion] = {
+    METHOD_TLSv10: ssl.TLSVersion.TLSv1,
+    METHOD_TLSv11: ssl.TLSVersion.TLSv1_1,
+    METHOD_TLSv12: ssl.TLSVersion.TLSv1_2,
+}
+
+# Headers that describe the connection rather than the response, Twisted does
+# not include them in the headers of its responses either
+_CONNECTION_HEADERS = {
+    b"connection",
+    b"keep-alive",
+    b"te",
+    b"trailers",
+    b"transfer-encoding",
+    b"upgrade",
+    b"proxy-connection",
+}
+
+# Methods of the requests that are sent again over a new connection if a
+# connection from the pool turns out to be closed by the server
+_RETRYABLE_METHODS = {b"GET", b"HEAD", b"OPTIONS", b"DELETE", b"TRACE"}
+
+_READ_SIZE = 65536
+
+
+async def _readline(reader: asyncio.StreamReader) -> bytes:
+    """Read a line, failing if it is longer than the stream buffer."""
+    try:
+        return await reader.readline()
+    except ValueError:  # asyncio.LimitOverrunError, wrapped by readline()
+        raise ResponseFailed(
+            [Failure(ValueError(f"Line longer than {_READ_SIZE} bytes received."))]
+        )
+
+
+@implementer(IResolutionReceiver)
+class _ResolutionReceiver:
+    """Collects the addresses resolved by the name resolver of the reactor."""
+
+    def __init__(self, hostname: str) -> None:
+        self.hostname: str = hostname
+        self.addresses: List[str] = []
+        self.deferred: Deferred = Deferred()
+
+    def resolutionBegan(self, resolution: IHostResolution) -> None:
+        pass
+
+    def addressResolved(self, address: IAddress) -> None:
+        self.addresses.append(address.host)  # type: ignore[attr-defined]
+
+    def resolutionComplete(self) -> None:
+        if self.addresses:
+            self.deferred.callback(self.addresses)
+        else:
+            self.deferred.errback(DNSLookupError(self.hostname))
+
+
+async def _resolve(hostname: str, port: int) -> List[str]:
+    """Return the addresses of *hostname*, resolved like the other download
+    handlers do, i.e. with the resolver of :setting:`DNS_RESOLVER`, which
+    takes :setting:`DNSCACHE_ENABLED` and :setting:`DNS_TIMEOUT` into
+    account."""
+    try:
+        ipaddress.ip_address(hostname)
+    except ValueError:
+        pass
+    else:
+        return [hostname]
+    from twisted.internet import reactor
+
+    receiver = _ResolutionReceiver(hostname)
+    reactor.nameResolver.resolveHostName(receiver, hostname, port)
+    return await deferred_to_future(receiver.deferred)
+
+
+async def _open_connection(
+    host: str, port: int, **kwargs: Any
+) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    """Open a connection to the first address of *host* that accepts it."""
+    addresses = await _resolve(host, port)
+    for address in addresses[:-1]:
+        try:
+            return await asyncio.open_connection(address, port, **kwargs)
+        except OSError:
+            pass
+    return await asyncio.open_connection(addresses[-1], port, **kwargs)
+
+
+def _get_ssl_context(settings: BaseSettings) -> ssl.SSLContext:
+    """Return a TLS client context that, like the default context factory,
+    does not verify server certificates."""
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    context.options |= getattr(ssl, "OP_LEGACY_SERVER_CONNECT", 0x4)
+    context.set_ciphers(settings.get("DOWNLOADER_CLIENT_TLS_CIPHERS") or "DEFAULT")
+    version = _tls_versions.get(settings.get("DOWNLOADER_CLIENT_TLS_METHOD"))
+    if version is not None:
+        context.minimum_version = version
+        context.maximum_version = version
+    return context
+
+
+class _Connection:
+    def __init__(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self.reader: asyncio.StreamReader = reader
+        self.writer: asyncio.StreamWriter = writer
+        self.expire_call: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def reusable(self) -> bool:
+        return not self.writer.is_closing() and not self.reader.at_eof()
+
+    @property
+    def ip_address(self) -> Union[ipaddress.IPv4Address, ipaddress.IPv6Address, None]:
+        peername = self.writer.get_extra_info("peername")
+        if not peername:
+            return None
+        return ipaddress.ip_address(peername[0])
+
+    @property
+    def certificate(self) -> Optional[Certificate]:
+        ssl_object = self.writer.get_extra_info("ssl_object")
+        if ssl_object is None:
+            return None
+        der = ssl_object.getpeercert(binary_form=True)
+        if not der:
+            return None
+        return Certificate.load(der, FILETYPE_ASN1)
+
+    def close(self) -> None:
+        if self.expire_call is not None:
+            self.expire_call.cancel()
+        self.writer.close()
+
+
+class _ConnectionPool:
+    """Keeps idle keep-alive connections, grouped by a key that identifies
+    their destination."""
+
+    def __init__(self, max_idle_per_key: int, idle_timeout: float = 240) -> None:
+        self.max_idle_per_key: int = max_idle_per_key
+        self.idle_timeout: float = idle_timeout
+        self._idle: Dict[Tuple, Deque[_Connection]] = {}
+
+    def get(self, key: Tuple) -> Optional[_Connection]:
+        idle = self._idle.get(key)
+        while idle:
+            conn = idle.pop()
+            if not idle:
+                del self._idle[key]
+            if conn.expire_call is not None:
+                conn.expire_call.cancel()
+                conn.expire_call = None
+            if conn.reusable:
+                return conn
+            conn.close()
+        return None
+
+    def put(self, key: Tuple, conn: _Connection) -> None:
+        idle = self._idle.setdefault(key, deque())
+        if len(idle) >= self.max_idle_per_key:
+            conn.close()
+            return
+        idle.append(conn)
+        conn.expire_call = asyncio.get_running_loop().call_later(
+            self.idle_timeout, self._expire, key, conn
+        )
+
+    def _expire(self, key: Tuple, conn: _Connection) -> None:
+        conn.expire_call = None
+        idle = self._idle.get(key)
+        if idle and conn in idle:
+            idle.remove(conn)
+            if not idle:
+                del self._idle[key]
+        conn.close()
+
+    async def close(self) -> None:
+        connections = [conn for idle in self._idle.values() for conn in idle]
+        self._idle.clear()
+        for conn in connections:
+            conn.close()
+        for conn in connections:
+            try:
+                await conn.writer.wait_closed()
+            except (OSError, ssl.SSLError):
+                pass
+
+
+class _ResponseHead:
+    def __init__(self, version: bytes, status: int, headers: Headers) -> None:
+        self.version: bytes = version
+        self.status: int = status
+        self.headers: Headers = headers
+        # Body framing headers, removed from the response headers like
+        # Twisted does
+        self.connection_headers: Headers = Headers()
+
+
+class _DownloadState:
+    """Phase of a download, reported in stats if it times out"""
+
+    def __init__(self) -> None:
+        self.phase: str = "connect"
+
+
+class AsyncioHTTP11DownloadHandler:
+    lazy = False
+
+    def __init__(self, settings: BaseSettings, crawler: Crawler):
+        if not is_asyncio_reactor_installed():
+            raise NotConfigured(
+                f"{type(self).__name__} requires the asyncio Twisted reactor, "
+                f"see the TWISTED_REACTOR setting."
+            )
+        self._crawler: Crawler = crawler
+        self._pool: _ConnectionPool = _ConnectionPool(
+            settings.getint("CONCURRENT_REQUESTS_PER_DOMAIN")
+        )
+        self._ssl_context: ssl.SSLContext = _get_ssl_context(settings)
+        self._default_timeout: float = settings.getfloat("DOWNLOAD_TIMEOUT")
+        self._connection_timeout: float = settings.getfloat("DOWNLOAD_CONNECT_TIMEOUT")
+        self._default_maxsize: int = settings.getint("DOWNLOAD_MAXSIZE")
+        self._default_warnsize: int = settings.getint("DOWNLOAD_WARNSIZE")
+        self._fail_on_dataloss: bool = settings.getbool("DOWNLOAD_FAIL_ON_DATALOSS")
+        self._timings: bool = timings_enabled(settings)
+        self._fail_on_dataloss_warned: bool = False
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> Self:
+        return cls(crawler.settings, crawler)
+
+    def download_request(self, request: Request, spider: Spider) -> Deferred:
+        """Return a deferred for the HTTP download"""
+        return deferred_from_coro(self._download_request(request, spider))
+
+    def close(self) -> Deferred:
+        return deferred_from_coro(self._pool.close())
+
+    async def _download_request(self, request: Request, spider: Spider) -> Response:
+        timeout = _get_download_timeout(request, self._default_timeout)
+        connect_timeout = min(
+            timeout,
+            request.meta.get("download_connect_timeout")
+            or self._connection_timeout
+            or timeout,
+        )
+        url = urldefrag(request.url)[0]
+        state = _DownloadState()
+        try:
+            return await asyncio.wait_for(
+                self._download(request, url, spider, connect_timeout, state), timeout
+            )
+        except asyncio.TimeoutError:
+            self._record_timeout(state.phase)
+            raise TimeoutError(f"Getting {url} took longer than {timeout} seconds.")
+
+    def _record_timeout(self, phase: str) -> None:
+        if self._crawler.stats:
+            self._crawler.stats.inc_value(f"downloader/timeout/{phase}")
+
+    async def _download(
+        self,
+        request: Request,
+        url: str,
+        spider: Spider,
+        connect_timeout: float,
+        state: _DownloadState,
+    ) -> Response:
+        scheme, _, host, port, path = _parse(url)
+        headers = Headers(request.headers)
+        proxy = request.meta.get("proxy")
+        tunnel_auth: Optional[bytes] = None
+        if proxy:
+            _, _, proxy_host, proxy_port, _ = _parse(proxy)
+            if scheme == b"https":
+                tunnel_auth = headers.pop(b"Proxy-Authorization", [None])[-1]
+                # Tunnels to the same host through different proxies, or with
+                # different credentials, must not share connections
+                key: Tuple = (scheme, host, port, proxy_host, proxy_port, tunnel_auth)
+            else:
+                key = ("http-proxy", proxy_host, proxy_port)
+                path = to_bytes(url, encoding="ascii")
+        else:
+            key = (scheme, host, port)
+
+        if b"Host" not in headers:
+            host_value = b"[" + host + b"]" if b":" in host else host
+            if port != (443 if scheme == b"https" else 80):
+                host_value += b":%d" % port
+            headers[b"Host"] = host_value
+        method = to_bytes(request.method)
+        data = self._request_data(method, path, headers, request.body)
+
+        start_time = time()
+        timer = DownloadTimer() if self._timings else None
+        while True:
+            conn = self._pool.get(key)
+            reused = conn is not None
+            if conn is None:
+                state.phase = "connect"
+                try:
+                    conn = await asyncio.wait_for(
+                        self._connect(request, scheme, host, port, proxy, tunnel_auth),
+                        connect_timeout,
+                    )
+                except asyncio.TimeoutError:
+                    self._record_timeout("connect")
+                    raise TimeoutError(
+                        f"Connecting to {url} took longer than {connect_timeout} "
+                        f"seconds."
+                    )
+                if timer is not None and not proxy:
+                    # DNS resolution, TCP connection and TLS handshake are
+                    # not timed separately
+                    timer.mark("connect")
+            state.phase = "response"
+            try:
+                conn.writer.write(data)
+                head = await self._read_head(conn.reader)
+            except (ConnectionDone, ConnectionError):
+                conn.close()
+                if reused and method in _RETRYABLE_METHODS and not request.body:
+                    continue
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            break
+        request.meta["download_latency"] = time() - start_time
+        if timer is not None:
+            timer.mark("ttfb")
+        state.phase = "body"
+
+        try:
+            response, keep_alive = await self._read_response(
+                conn, head, request, url, method, spider
+            )
+        except BaseException:
+            conn.close()
+            raise
+        if keep_alive and conn.reusable:
+            self._pool.put(key, conn)
+        else:
+            conn.close()
+        if timer is not None:
+            timer.mark("transfer")
+            request.meta.setdefault("download_timings", {}).update(timer.timings)
+        return response
+
+    async def _connect(
+        self,
+        request: Request,
+        scheme: bytes,
+        host: bytes,
+        port: int,
+        proxy: Optional[str],
+        tunnel_auth: Optional[bytes],
+    ) -> _Connection:
+        bindaddress = request.meta.get("bindaddress")
+        local_addr = tuple(bindaddress) if bindaddress else None
+        server_hostname = host.decode("ascii")
+        if not proxy:
+            reader, writer = await _open_connection(
+                server_hostname,
+                port,
+                ssl=self._ssl_context if scheme == b"https" else None,
+                server_hostname=server_hostname if scheme == b"https" else None,
+                local_addr=local_addr,
+                limit=_READ_SIZE,
+            )
+            return _Connection(reader, writer)
+
+        _, _, proxy_host, proxy_port, _ = _parse(proxy)
+        reader, writer = await _open_connection(
+            proxy_host.decode("ascii"),
+            proxy_port,
+            local_addr=local_addr,
+            limit=_READ_SIZE,
+        )
+        if scheme != b"https":
+            return _Connection(reader, writer)
+
+        conn = _Connection(reader, writer)
+        try:
+            writer.write(tunnel_request_data(server_hostname, port, tunnel_auth))
+            head = await self._read_head(reader)
+            if head.status != 200:
+                raise TunnelError(
+                    "Could not open CONNECT tunnel with proxy "
+                    f"{proxy_host.decode()}:{proxy_port} "
+                    f"[{{'status': {head.status}}}]"
+                )
+            return await self._start_tls(conn, server_hostname)
+        except BaseException:
+            conn.close()
+            raise
+
+    async def _start_tls(self, conn: _Connection, server_hostname: str) -> _Connection:
+        """Upgrade the connection to a proxy tunnel into a TLS connection to
+        the destination server."""
+        writer = conn.writer
+        if hasattr(writer, "start_tls"):  # Python 3.11+
+            await writer.start_tls(self._ssl_context, server_hostname=server_hostname)
+            return conn
+        sock = writer.get_extra_info("socket").dup()
+        writer.close()
+        reader, writer = await asyncio.open_connection(
+            sock=sock,
+            ssl=self._ssl_context,
+            server_hostname=server_hostname,
+            limit=_READ_SIZE,
+        )
+        return _Connection(reader, writer)
+
+    @staticmethod
+    def _request_data(
+        method: bytes, path: bytes, headers: Headers, body: bytes
+    ) -> bytes:
+        lines = [method + b" " + path + b" HTTP/1.1\r\n"]
+        if body or method in (b"POST", b"PUT"):
+            lines.append(b"Content-Length: %d\r\n" % len(body))
+        for name, values in headers.items():
+            lines.extend(name + b": " + value + b"\r\n" for value in values)
+        lines.append(b"\r\n")
+        lines.append(body)
+        return b"".join(lines)
+
+    @staticmethod
+    async def _read_head(reader: asyncio.StreamReader) -> _ResponseHead:
+        while True:
+            status_line = await _readline(reader)
+            if not status_line:
+                raise ConnectionDone("Connection closed before receiving a response.")
+            try:
+                version, status, *_ = status_line.split(None, 2)
+                head = _ResponseHead(version, int(status), Headers())
+            except ValueError:
+                raise ResponseFailed(
+                    [Failure(ValueError(f"Invalid status line: {status_line!r}"))]
+                )
+            while True:
+                line = await _readline(reader)
+                if not line.endswith(b"\n"):
+                    raise ConnectionDone("Connection closed while receiving headers.")
+                line = line.rstrip(b"\r\n")
+                if not line:
+                    break
+                name, _, value = line.partition(b":")
+                name, value = name.strip(), value.strip()
+                if name.lower() in _CONNECTION_HEADERS:
+                    head.connection_headers.appendlist(name, value)
+                else:
+                    head.headers.appendlist(name, value)
+            # Skip informational responses, e.g. 100 Continue
+            if not 100 <= head.status < 200 or head.status == 101:
+                return head
+
+    async def _read_response(
+        self,
+        conn: _Connection,
+        head: _ResponseHead,
+        request: Request,
+        url: str,
+        method: bytes,
+        spider: Spider,
+    ) -> Tuple[Response, bool]:
+        content_length: Optional[int] = None
+        transfer_encoding = head.connection_headers.get(b"Transfer-Encoding") or b""
+        chunked = transfer_encoding.lower().rsplit(b",", 1)[-1].strip() == b"chunked"
+        if method == b"HEAD" or head.status in (204, 304):
+            content_length = 0
+        elif not chunked and b"Content-Length" in head.headers:
+            try:
+                content_length = int(head.headers[b"Content-Length"])
+            except ValueError:
+                pass
+        keep_alive = (
+            head.version == b"HTTP/1.1"
+            and b"close"
+            not in (head.connection_headers.get(b"Connection") or b"").lower()
+            and (chunked or content_length is not None)
+        )
+        expected_size = content_length if content_length is not None else -1
+
+        result: Dict[str, Any] = {
+            "head": head,
+            "conn": conn,
+            "url": url,
+            "body": b"",
+            "flags": None,
+        }
+        headers_received_result = self._crawler.signals.send_catch_log(
+            signal=signals.headers_received,
+            headers=head.headers.copy(),
+            body_length=(
+                content_length if content_length is not None else UNKNOWN_LENGTH
+            ),
+            request=request,
+            spider=self._crawler.spider,
+        )
+        for handler, outcome in headers_received_result:
+            if isinstance(outcome, Failure) and isinstance(outcome.value, StopDownload):
+                logger.debug(
+                    "Download stopped for %(request)s from signal handler %(handler)s",
+                    {"request": request, "handler": handler.__qualname__},
+                )
+                result["flags"] = ["download_stopped"]
+                return self._stopped_response(result, outcome), False
+
+        maxsize = request.meta.get(
+            "download_maxsize",
+            getattr(spider, "download_maxsize", self._default_maxsize),
+        )
+        warnsize = request.meta.get(
+            "download_warnsize",
+            getattr(spider, "download_warnsize", self._default_warnsize),
+        )
+        fail_on_dataloss = request.meta.get(
+            "download_fail_on_dataloss", self._fail_on_dataloss
+        )
+
+        if maxsize and expected_size > maxsize:
+            warning_msg = (
+                "Cancelling download of %(url)s: expected response "
+                "size (%(size)s) larger than download max size (%(maxsize)s)."
+            )
+            warning_args = {"url": url, "size": expected_size, "maxsize": maxsize}
+            logger.warning(warning_msg, warning_args)
+            raise CancelledError(warning_msg % warning_args)
+
+        if warnsize and expected_size > warnsize:
+            logger.warning(
+                "Expected response size (%(size)s) larger than "
+                "download warn size (%(warnsize)s) in request %(request)s.",
+                {"size": expected_size, "warnsize": warnsize, "request": request},
+            )
+
+        if chunked:
+            chunks = self._read_chunked(conn.reader)
+        else:
+            chunks = self._read_length(conn.reader, content_length)
+        body = BytesIO()
+        bytes_received = 0
+        reached_warnsize = False
+        try:
+            async for data in chunks:
+                bytes_received += len(data)
+                body.write(data)
+                bytes_received_result = self._crawler.signals.send_catch_log(
+                    signal=signals.bytes_received,
+                    data=data,
+                    request=request,
+                    spider=self._crawler.spider,
+                )
+                for handler, outcome in bytes_received_result:
+                    if isinstance(outcome, Failure) and isinstance(
+                        outcome.value, StopDownload
+                    ):
+                        logger.debug(
+                            "Download stopped for %(request)s from signal handler "
+                            "%(handler)s",
+                            {"request": request, "handler": handler.__qualname__},
+                        )
+                        result["body"] = body.getvalue()
+                        result["flags"] = ["download_stopped"]
+                        return self._stopped_response(result, outcome), False
+
+                if maxsize and bytes_received > maxsize:
+                    logger.warning(
+                        "Received (%(bytes)s) bytes larger than download "
+                        "max size (%(maxsize)s) in request %(request)s.",
+                        {
+                            "bytes": bytes_received,
+                            "maxsize": maxsize,
+                            "request": request,
+                        },
+                    )
+                    raise CancelledError(
+                        f"Received {bytes_received} bytes larger than download "
+                        f"max size ({maxsize}) in request {request}."
+                    )
+
+                if warnsize and bytes_received > warnsize and not reached_warnsize:
+                    reached_warnsize = True
+                    logger.warning(
+                        "Received more bytes than download "
+                        "warn size (%(warnsize)s) in request %(request)s.",
+                        {"warnsize": warnsize, "request": request},
+                    )
+
+                delay = transfer_delay(self._crawler, request, len(data))
+                if delay:
+                    # Stop reading the response to stay within the bandwidth
+                    # limits
+                    await asyncio.sleep(delay)
+        except _DataLoss:
+            if fail_on_dataloss:
+                if not self._fail_on_dataloss_warned:
+                    logger.warning(
+                        "Got data loss in %s. If you want to process broken "
+                        "responses set the setting DOWNLOAD_FAIL_ON_DATALOSS = False"
+                        " -- This message won't be shown in further requests",
+                        url,
+                    )
+                    self._fail_on_dataloss_warned = True
+                raise ResponseFailed([Failure()])
+            result["flags"] = ["dataloss"]
+            keep_alive = False
+        else:
+            if content_length is None and not chunked:
+                # The end of the body is only known from the connection being
+                # closed, which may also be caused by a network error
+                result["flags"] = ["partial"]
+
+        result["body"] = body.getvalue()
+        return self._build_response(result), keep_alive
+
+    @staticmethod
+    async def _read_length(
+        reader: asyncio.StreamReader, length: Optional[int]
+    ) -> AsyncIterator[bytes]:
+        """Yield the body of a response delimited by its Content-Length, or by
+        the end of the connection if *length* is ``None``."""
+        remaining = length
+        while remaining is None or remaining > 0:
+            size = _READ_SIZE if remaining is None else min(remaining, _READ_SIZE)
+            data = await reader.read(size)
+            if not data:
+                if remaining is not None:
+                    raise _DataLoss()
+                return
+            if remaining is not None:
+                remaining -= len(data)
+            yield data
+
+    @staticmethod
+    async def _read_chunked(reader: asyncio.StreamReader) -> AsyncIterator[bytes]:
+        """Yield the body of a response with chunked transfer encoding."""
+        while True:
+            line = await _readline(reader)
+            if not line.endswith(b"\n"):
+                raise _DataLoss()
+            try:
+                remaining = int(line.split(b";", 1)[0].strip(), 16)
+            except ValueError:
+                raise _DataLoss()
+            if remaining == 0:
+                # Skip trailers
+                while True:
+                    line = await _readline(reader)
+                    if not line.endswith(b"\n"):
+                        raise _DataLoss()
+                    if not line.strip():
+                        return
+            while remaining:
+                data = await reader.read(min(remaining, _READ_SIZE))
+                if not data:
+                    raise _DataLoss()
+                remaining -= len(data)
+                yield data
+            if (await _readline(reader)).strip():
+                raise _DataLoss()
+
+    def _stopped_response(self, result: Dict[str, Any], outcome: Failure) -> Response:
+        response = self._build_response(result)
+        if outcome.value.fail:
+            outcome.value.response = response
+            outcome.raiseException()
+        return response
+
+    @staticmethod
+    def _build_response(result: Dict[str, Any]) -> Response:
+        head: _ResponseHead = result["head"]
+        conn: _Connection = result["conn"]
+        respcls = responsetypes.from_args(
+            headers=head.headers, url=result["url"], body=result["body"]
+        )
+        return respcls(
+            url=result["url"],
+            status=head.status,
+            headers=head.headers,
+            body=result["body"],
+            flags=result["flags"],
+            certificate=conn.certificate,
+            ip_address=conn.ip_address,
+            protocol=head.version.decode("ascii", errors="replace"),
+        )
@@ -1,19 +1,22 @@
 from __future__ import annotations
 
 from time import time
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, List, Optional, Union
 from urllib.parse import urldefrag
 
 from twisted.internet.base import DelayedCall
 from twisted.internet.defer import Deferred
-from twisted.internet.error import TimeoutError
+from twisted.internet.error import ConnectingCancelledError, TimeoutError
+from twisted.python.failure import Failure
 from twisted.web.client import URI
 from twisted.web.iweb import IPolicyForHTTPS
 
 from scrapy.core.downloader.contextfactory import load_context_factory_from_settings
+from scrapy.core.downloader.timings import DownloadTimer, timings_enabled
 from scrapy.core.downloader.webclient import _parse
 from scrapy.core.http2.agent import H2Agent, H2ConnectionPool, ScrapyProxyH2Agent
 from scrapy.crawler import Crawler
+from scrapy.downloadermiddlewares.downloadtimeout import _get_download_timeout
 from scrapy.http import Request, Response
 from scrapy.settings import Settings
 from scrapy.spiders import Spider
@@ -25,13 +28,20 @@ if TYPE_CHECKING:
 
 
 class H2DownloadHandler:
-    def __init__(self, settings: Settings, crawler: Crawler):
+    def __init__(
+        self,
+        settings: Settings,
+        crawler: Crawler,
+        acceptable_protocols: Optional[List[bytes]] = None,
+    ):
         self._crawler = crawler
 
         from twisted.internet import reactor
 
-        self._pool = H2ConnectionPool(reactor, settings)
+        self._pool = H2ConnectionPool(reactor, settings, acceptable_protocols)
         self._context_factory = load_context_factory_from_settings(settings, crawler)
+        self._connection_timeout: float = settings.getfloat("DOWNLOAD_CONNECT_TIMEOUT")
+        self._timings: bool = timings_enabled(settings)
 
     @classmethod
     def from_crawler(cls, crawler: Crawler) -> Self:
@@ -42,11 +52,13 @@ class H2DownloadHandler:
             context_factory=self._context_factory,
             pool=self._pool,
             crawler=self._crawler,
+            connection_timeout=self._connection_timeout,
+            timings=self._timings,
         )
         return agent.download_request(request, spider)
 
-    def close(self) -> None:
-        self._pool.close_connections()
+    def close(self) -> Deferred:
+        return self._pool.close_connections()
 
 
 class ScrapyH2Agent:
@@ -60,14 +72,26 @@ class ScrapyH2Agent:
         connect_timeout: int = 10,
         bind_address: Optional[bytes] = None,
         crawler: Optional[Crawler] = None,
+        connection_timeout: float = 0,
+        timings: bool = False,
     ) -> None:
         self._context_factory = context_factory
+        # Default download timeout
         self._connect_timeout = connect_timeout
+        # Timeout to establish connections, 0 to use the download timeout
+        self._connection_timeout = connection_timeout
         self._bind_address = bind_address
         self._pool = pool
         self._crawler = crawler
+        # Whether to record the download_timings of requests
+        self._timings = timings
 
-    def _get_agent(self, request: Request, timeout: Optional[float]) -> H2Agent:
+    def _get_agent(
+        self,
+        request: Request,
+        timeout: Optional[float],
+        timer: Optional[DownloadTimer] = None,
+    ) -> H2Agent:
         from twisted.internet import reactor
 
         bind_address = request.meta.get("bindaddress") or self._bind_address
@@ -96,36 +120,68 @@ class ScrapyH2Agent:
             connect_timeout=timeout,
             bind_address=bind_address,
             pool=self._pool,
+            timer=timer,
         )
 
     def download_request(self, request: Request, spider: Spider) -> Deferred:
         from twisted.internet import reactor
 
-        timeout = request.meta.get("download_timeout") or self._connect_timeout
-        agent = self._get_agent(request, timeout)
+        timeout = _get_download_timeout(request, self._connect_timeout)
+        connect_timeout = min(
+            timeout,
+            request.meta.get("download_connect_timeout")
+            or self._connection_timeout
+            or timeout,
+        )
+        timer = DownloadTimer() if self._timings else None
+        agent = self._get_agent(request, connect_timeout, timer)
 
         start_time = time()
-        d = agent.request(request, spider)
-        d.addCallback(self._cb_latency, request, start_time)
+        d = agent.request(request, spider, timer)
+        d.addCallback(self._cb_latency, request, start_time, timer)
 
         timeout_cl = reactor.callLater(timeout, d.cancel)
-        d.addBoth(self._cb_timeout, request, timeout, timeout_cl)
+        d.addBoth(self._cb_timeout, request, timeout, connect_timeout, timeout_cl)
         return d
 
     @staticmethod
     def _cb_latency(
-        response: Response, request: Request, start_time: float
+        response: Response,
+        request: Request,
+        start_time: float,
+        timer: Optional[DownloadTimer],
     ) -> Response:
         request.meta["download_latency"] = time() - start_time
+        if timer is not None:
+            timer.mark("transfer")
+            request.meta.setdefault("download_timings", {}).update(timer.timings)
         return response
 
-    @staticmethod
     def _cb_timeout(
-        response: Response, request: Request, timeout: float, timeout_cl: DelayedCall
-    ) -> Response:
+        self,
+        response: Union[Response, Failure],
+        request: Request,
+        timeout: float,
+        connect_timeout: float,
+        timeout_cl: DelayedCall,
+    ) -> Union[Response, Failure]:
+        url = urldefrag(request.url)[0]
         if timeout_cl.active():
             timeout_cl.cancel()
+            if isinstance(response, Failure) and response.check(TimeoutError):
+                # The connection attempt timed out
+                self._record_timeout("connect")
+                raise TimeoutError(
+                    f"Connecting to {url} took longer than {connect_timeout} seconds."
+                )
             return response
 
-        url = urldefrag(request.url)[0]
+        if isinstance(response, Failure) and response.check(ConnectingCancelledError):
+            self._record_timeout("connect")
+        else:
+            self._record_timeout("response")
         raise TimeoutError(f"Getting {url} took longer than {timeout} seconds.")
+
+    def _record_timeout(self, phase: str) -> None:
+        if self._crawler and self._crawler.stats:
+            self._crawler.stats.inc_value(f"downloader/timeout/{phase}")
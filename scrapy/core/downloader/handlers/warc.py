@@ -0,0 +1,132 @@
+"""Download handler that replays responses from WARC archives
+
+See the WARC_REPLAY_PATHS setting in docs/topics/settings.rst
+"""
+
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Dict, Tuple
+
+from w3lib.http import headers_raw_to_dict
+
+from scrapy import Request, Spider
+from scrapy.crawler import Crawler
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.http import Headers, Response
+from scrapy.responsetypes import responsetypes
+from scrapy.statscollectors import StatsCollector
+from scrapy.utils.decorators import defers
+from scrapy.utils.request import RequestFingerprinter
+from scrapy.utils.warc import (
+    CDX_HEADER,
+    iter_records,
+    parse_cdx_line,
+    parse_response_block,
+    read_record,
+    record_url,
+)
+
+if TYPE_CHECKING:
+    # typing.Self requires Python 3.11
+    from typing_extensions import Self
+
+
+logger = logging.getLogger(__name__)
+
+
+class WarcDownloadHandler:
+    """Return the responses of WARC archives instead of downloading them.
+
+    Responses are looked up by request fingerprint in the archives written by
+    :class:`~scrapy.extensions.httpcache.WarcCacheStorage`, and by URL for
+    ``GET`` and ``HEAD`` requests in any archive.
+    """
+
+    lazy = False
+
+    def __init__(self, crawler: Crawler):
+        paths = crawler.settings.getlist("WARC_REPLAY_PATHS")
+        if not paths:
+            raise NotConfigured("WARC_REPLAY_PATHS is not set")
+        assert crawler.request_fingerprinter
+        self._fingerprinter: RequestFingerprinter = crawler.request_fingerprinter
+        assert crawler.stats
+        self.stats: StatsCollector = crawler.stats
+        # Location of response records: path, offset and compressed length
+        self._by_fingerprint: Dict[str, Tuple[Path, int, int]] = {}
+        self._by_url: Dict[str, Tuple[Path, int, int]] = {}
+        self._files: Dict[Path, IO[bytes]] = {}
+        for path in paths:
+            self._load(Path(path))
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> Self:
+        return cls(crawler)
+
+    def _load(self, path: Path) -> None:
+        if path.is_dir():
+            index_path = path / "index.cdx"
+            if index_path.exists() and self._load_index(index_path):
+                return
+            for warc_path in sorted(path.glob("*.warc.gz")):
+                self._load(warc_path)
+            return
+        for offset, length, record in iter_records(path):
+            if record.headers.get(b"warc-type") == b"response":
+                self._by_url[record_url(record)] = (path, offset, length)
+
+    def _load_index(self, index_path: Path) -> bool:
+        """Load a CDX index written by
+        :class:`~scrapy.extensions.httpcache.WarcCacheStorage`, or return
+        ``False`` if *index_path* has a different format, e.g. other CDX
+        fields or CDXJ."""
+        with index_path.open(encoding="utf-8") as f:
+            if f.readline() != CDX_HEADER:
+                logger.warning(
+                    "Ignoring %(index)s, which is not a CDX index written by "
+                    "WarcCacheStorage, responses are looked up by URL instead",
+                    {"index": index_path},
+                )
+                return False
+            for line in f:
+                if not line.endswith("\n"):
+                    break  # truncated by an interrupted write
+                entry = parse_cdx_line(line)
+                if entry is None:
+                    continue
+                location = (
+                    index_path.parent / entry.filename,
+                    entry.offset,
+                    entry.length,
+                )
+                self._by_fingerprint[entry.key] = location
+                self._by_url[entry.url] = location
+        return True
+
+    @defers
+    def download_request(self, request: Request, spider: Spider) -> Response:
+        location = self._by_fingerprint.get(
+            self._fingerprinter.fingerprint(request).hex()
+        )
+        if location is None and request.method in ("GET", "HEAD"):
+            location = self._by_url.get(request.url)
+        if location is None:
+            self.stats.inc_value("downloader/warc_replay/miss", spider=spider)
+            raise IgnoreRequest(f"Not found in the WARC archives: {request}")
+        self.stats.inc_value("downloader/warc_replay/hit", spider=spider)
+        path, offset, length = location
+        f = self._files.get(path)
+        if f is None:
+            f = self._files[path] = path.open("rb")
+        record = read_record(f, offset, length)
+        status, rawheaders, body = parse_response_block(record.block)
+        headers = Headers(headers_raw_to_dict(rawheaders))
+        respcls = responsetypes.from_args(headers=headers, url=request.url, body=body)
+        return respcls(url=request.url, status=status, headers=headers, body=body)
+
+    def close(self) -> None:
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
@@ -0,0 +1,134 @@
+"""Hedging of slow requests
+
+See the DOWNLOAD_HEDGE_ENABLED setting in docs/topics/settings.rst
+"""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Callable, List, Optional
+
+from twisted.internet.base import DelayedCall
+from twisted.internet.defer import Deferred
+from twisted.python.failure import Failure
+
+from scrapy import Request
+from scrapy.settings import BaseSettings
+
+if TYPE_CHECKING:
+    from scrapy.core.downloader import Slot
+    from scrapy.statscollectors import StatsCollector
+
+
+class RequestHedger:
+    """Send a duplicate of idempotent requests that take longer than a
+    percentile of the latencies recently observed in their downloader slot,
+    and use the first response received."""
+
+    #: Methods of the requests that can be hedged
+    methods = frozenset({"GET", "HEAD"})
+
+    #: Number of latencies needed in a slot before hedging its requests
+    min_samples = 20
+
+    def __init__(self, settings: BaseSettings, stats: Optional[StatsCollector]):
+        self.percentile: float = settings.getfloat("DOWNLOAD_HEDGE_PERCENTILE")
+        self.budget: float = settings.getfloat("DOWNLOAD_HEDGE_BUDGET")
+        self.stats: Optional[StatsCollector] = stats
+        self.download_count: int = 0
+        self.hedge_count: int = 0
+
+    def threshold(self, slot: Slot, request: Request) -> Optional[float]:
+        """Return the number of seconds after which a duplicate of *request*
+        must be sent, or ``None`` if it must not be hedged."""
+        if request.method not in self.methods or request.meta.get("dont_hedge"):
+            return None
+        return slot.latency_percentile(self.percentile, self.min_samples)
+
+    def _inc_stats(self, name: str) -> None:
+        if self.stats:
+            self.stats.inc_value(f"downloader/hedge/{name}")
+
+    def download(
+        self,
+        slot: Slot,
+        request: Request,
+        download: Callable[[Request], Deferred],
+    ) -> Deferred:
+        """Return a deferred that fires with the outcome of the first
+        *download* call that succeeds, or of the last one to fail.
+
+        The duplicate request is a copy of *request* with the ``hedge`` meta
+        key set to ``True``, which counts towards the concurrency of *slot*
+        while it is downloaded. If it wins, its meta is copied back into
+        *request*. The other attempt, if any, is cancelled.
+        """
+        from twisted.internet import reactor
+
+        attempts: List[Deferred] = []
+        hedge_call: Optional[DelayedCall] = None
+
+        def cancel(_: Deferred) -> None:
+            if hedge_call is not None and hedge_call.active():
+                hedge_call.cancel()
+            for attempt in list(attempts):
+                attempt.cancel()
+
+        result: Deferred = Deferred(cancel)
+
+        def finished(outcome: Any, attempt: Deferred, attempt_request: Request):
+            if attempt not in attempts:
+                # The other attempt won
+                return None
+            attempts.remove(attempt)
+            if isinstance(outcome, Failure) and attempts:
+                # Wait for the other attempt
+                return None
+            if hedge_call is not None and hedge_call.active():
+                hedge_call.cancel()
+            if attempt_request is not request:
+                meta = dict(attempt_request.meta)
+                del meta["hedge"]
+                request.meta.update(meta)
+                if not isinstance(outcome, Failure):
+                    self._inc_stats("win_count")
+            losers = list(attempts)
+            attempts.clear()
+            for loser in losers:
+                loser.cancel()
+            result.callback(outcome)
+            return None
+
+        def release(outcome: Any, hedge_request: Request) -> Any:
+            slot.active.discard(hedge_request)
+            slot.transferring.discard(hedge_request)
+            return outcome
+
+        def start(attempt_request: Request) -> None:
+            attempt = download(attempt_request)
+            if attempt_request is not request:
+                attempt.addBoth(release, attempt_request)
+            attempts.append(attempt)
+            attempt.addBoth(finished, attempt, attempt_request)
+
+        def hedge() -> None:
+            if result.called or not attempts:
+                return
+            if slot.free_transfer_slots() <= 0:
+                return
+            if self.hedge_count >= self.budget * self.download_count:
+                self._inc_stats("budget_exceeded")
+                return
+            self.hedge_count += 1
+            self._inc_stats("request_count")
+            hedge_request = request.copy()
+            hedge_request.meta["hedge"] = True
+            slot.active.add(hedge_request)
+            slot.transferring.add(hedge_request)
+            start(hedge_request)
+
+        self.download_count += 1
+        threshold = self.threshold(slot, request)
+        start(request)
+        if threshold is not None and not result.called:
+            hedge_call = reactor.callLater(threshold, hedge)
+        return result
@@ -0,0 +1,235 @@
+"""Breakdown of download latencies into phases
+
+See the ``download_timings`` request meta key in
+docs/topics/request-response.rst
+"""
+
+from __future__ import annotations
+
+from time import monotonic
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Sequence, Tuple
+
+from twisted.internet.base import ReactorBase
+from twisted.internet.defer import Deferred
+from twisted.internet.endpoints import HostnameEndpoint, wrapClientTLS
+from twisted.internet.interfaces import (
+    IHandshakeListener,
+    IHostnameResolver,
+    IHostResolution,
+    IResolutionReceiver,
+    IStreamClientEndpoint,
+)
+from twisted.internet.protocol import Factory, Protocol
+from twisted.python.compat import nativeString
+from twisted.web.client import URI
+from twisted.web.error import SchemeNotSupported
+from twisted.web.iweb import IAgentEndpointFactory, IPolicyForHTTPS
+from zope.interface import alsoProvides, directlyProvides, implementer, provider
+from zope.interface.declarations import providedBy
+
+if TYPE_CHECKING:
+    from scrapy.settings import BaseSettings
+
+#: Upper bounds, in seconds, and labels of the buckets of the timing
+#: histograms
+TIMING_BUCKETS: Sequence[Tuple[float, str]] = (
+    (0.01, "0-10ms"),
+    (0.05, "10-50ms"),
+    (0.1, "50-100ms"),
+    (0.5, "100-500ms"),
+    (1, "500ms-1s"),
+    (5, "1-5s"),
+    (10, "5-10s"),
+    (30, "10-30s"),
+    (60, "30-60s"),
+)
+
+
+def timing_bucket(duration: float) -> str:
+    """Return the label of the histogram bucket of *duration*."""
+    for bound, label in TIMING_BUCKETS:
+        if duration < bound:
+            return label
+    return "60s+"
+
+
+def timings_enabled(settings: BaseSettings) -> bool:
+    """Return whether downloads must record their ``download_timings``, i.e.
+    whether :setting:`DOWNLOAD_TIMINGS_STATS` or
+    :setting:`DOWNLOAD_SLOW_REQUEST_THRESHOLD` use them."""
+    return settings.getbool("DOWNLOAD_TIMINGS_STATS") or (
+        settings.getfloat("DOWNLOAD_SLOW_REQUEST_THRESHOLD") > 0
+    )
+
+
+class DownloadTimer:
+    """Record the duration of the consecutive phases of a download.
+
+    Each call to :meth:`mark` ends a phase, which started when the previous
+    phase ended, or when the timer was created.
+    """
+
+    def __init__(self, clock: Callable[[], float] = monotonic):
+        self._clock: Callable[[], float] = clock
+        self._last: float = clock()
+        self.timings: Dict[str, float] = {}
+
+    def mark(self, phase: str) -> None:
+        now = self._clock()
+        # A phase can happen more than once, e.g. when connecting to several
+        # addresses of a host
+        self.timings[phase] = self.timings.get(phase, 0.0) + now - self._last
+        self._last = now
+
+
+@provider(IResolutionReceiver)
+class _TimingResolutionReceiver:
+    def __init__(self, receiver: IResolutionReceiver, timer: DownloadTimer):
+        self._receiver: IResolutionReceiver = receiver
+        self._timer: DownloadTimer = timer
+
+    def resolutionBegan(self, resolution: IHostResolution) -> None:
+        self._receiver.resolutionBegan(resolution)
+
+    def addressResolved(self, address: Any) -> None:
+        self._receiver.addressResolved(address)
+
+    def resolutionComplete(self) -> None:
+        self._timer.mark("dns")
+        self._receiver.resolutionComplete()
+
+
+@implementer(IHostnameResolver)
+class _TimingNameResolver:
+    def __init__(self, resolver: IHostnameResolver, timer: DownloadTimer):
+        self._resolver: IHostnameResolver = resolver
+        self._timer: DownloadTimer = timer
+
+    def resolveHostName(
+        self, resolutionReceiver: IResolutionReceiver, *args: Any, **kwargs: Any
+    ) -> IHostResolution:
+        return self._resolver.resolveHostName(
+            _TimingResolutionReceiver(resolutionReceiver, self._timer),
+            *args,
+            **kwargs,
+        )
+
+
+class _TimingReactor:
+    """Wrap a reactor so that the name resolver that it exposes to
+    :class:`~twisted.internet.endpoints.HostnameEndpoint` times name
+    resolutions."""
+
+    def __init__(self, reactor: ReactorBase, timer: DownloadTimer):
+        self._reactor: ReactorBase = reactor
+        self.nameResolver: IHostnameResolver = _TimingNameResolver(
+            reactor.nameResolver, timer
+        )
+        # e.g. IReactorTCP and IReactorPluggableNameResolver
+        directlyProvides(self, providedBy(reactor))
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._reactor, name)
+
+
+@implementer(IStreamClientEndpoint)
+class _ConnectTimingEndpoint:
+    def __init__(self, endpoint: IStreamClientEndpoint, timer: DownloadTimer):
+        self._endpoint: IStreamClientEndpoint = endpoint
+        self._timer: DownloadTimer = timer
+
+    def _connected(self, protocol: Protocol) -> Protocol:
+        self._timer.mark("connect")
+        return protocol
+
+    def connect(self, protocolFactory: Factory) -> Deferred:
+        return self._endpoint.connect(protocolFactory).addCallback(self._connected)
+
+
+class _HandshakeTimingFactory:
+    """Wrap a protocol factory so that the TLS handshake of the connections
+    it builds is timed."""
+
+    def __init__(self, factory: Factory, timer: DownloadTimer):
+        self._factory: Factory = factory
+        self._timer: DownloadTimer = timer
+        # e.g. IProtocolNegotiationFactory, used for ALPN
+        directlyProvides(self, providedBy(factory))
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._factory, name)
+
+    def buildProtocol(self, addr: Any) -> Optional[Protocol]:
+        protocol = self._factory.buildProtocol(addr)
+        if protocol is None:
+            return None
+        timer = self._timer
+        handshake_completed = getattr(protocol, "handshakeCompleted", None)
+
+        def handshakeCompleted() -> None:
+            timer.mark("tls")
+            if handshake_completed is not None:
+                handshake_completed()
+
+        protocol.handshakeCompleted = handshakeCompleted  # type: ignore[method-assign]
+        alsoProvides(protocol, IHandshakeListener)
+        return protocol
+
+
+@implementer(IStreamClientEndpoint)
+class _HandshakeTimingEndpoint:
+    def __init__(self, endpoint: IStreamClientEndpoint, timer: DownloadTimer):
+        self._endpoint: IStreamClientEndpoint = endpoint
+        self._timer: DownloadTimer = timer
+
+    def connect(self, protocolFactory: Factory) -> Deferred:
+        return self._endpoint.connect(
+            _HandshakeTimingFactory(protocolFactory, self._timer)
+        )
+
+
+@implementer(IAgentEndpointFactory)
+class TimingEndpointFactory:
+    """Agent endpoint factory that connects like the default one of Twisted,
+    TCP for http and TCP+TLS for https, and records the DNS resolution, TCP
+    connection and TLS handshake phases of new connections in *timer*."""
+
+    def __init__(
+        self,
+        reactor: ReactorBase,
+        context_factory: IPolicyForHTTPS,
+        connect_timeout: Optional[float],
+        bind_address: Optional[bytes],
+        timer: DownloadTimer,
+    ):
+        self._reactor: ReactorBase = reactor
+        self._context_factory: IPolicyForHTTPS = context_factory
+        self._connect_timeout: Optional[float] = connect_timeout
+        self._bind_address: Optional[bytes] = bind_address
+        self._timer: DownloadTimer = timer
+
+    def endpointForURI(self, uri: URI) -> IStreamClientEndpoint:
+        kwargs: Dict[str, Any] = {"bindAddress": self._bind_address}
+        if self._connect_timeout is not None:
+            kwargs["timeout"] = self._connect_timeout
+        try:
+            host = nativeString(uri.host)
+        except UnicodeDecodeError:
+            raise ValueError(
+                f"The host of the provided URI ({uri.host!r}) contains non-ASCII "
+                f"octets, it should be ASCII decodable."
+            )
+        hostname_endpoint = HostnameEndpoint(
+            _TimingReactor(self._reactor, self._timer), host, uri.port, **kwargs
+        )
+        endpoint = _ConnectTimingEndpoint(hostname_endpoint, self._timer)
+        if uri.scheme == b"http":
+            return endpoint
+        if uri.scheme == b"https":
+            connection_creator = self._context_factory.creatorForNetloc(
+                uri.host, uri.port
+            )
+            return _HandshakeTimingEndpoint(
+                wrapClientTLS(connection_creator, endpoint), self._timer
+            )
+        raise SchemeNotSupported(f"Unsupported scheme: {uri.scheme!r}")
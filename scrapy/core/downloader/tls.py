@@ -1,16 +1,24 @@
 import logging
-from typing import Any, Dict
+from typing import TYPE_CHECKING, Any, Dict, Hashable, Optional
+from weakref import WeakKeyDictionary, WeakSet
 
 from OpenSSL import SSL
 from service_identity.exceptions import CertificateError
 from twisted.internet._sslverify import (
     ClientTLSOptions,
     VerificationError,
+    _tolerateErrors,
     verifyHostname,
 )
 from twisted.internet.ssl import AcceptableCiphers
 
-from scrapy.utils.ssl import get_temp_key_info, x509name_to_string
+from scrapy.utils.datatypes import LocalCache
+from scrapy.utils.ssl import get_temp_key_info, is_session_reused, x509name_to_string
+
+if TYPE_CHECKING:
+    from twisted.protocols.tls import TLSMemoryBIOProtocol
+
+    from scrapy.statscollectors import StatsCollector
 
 logger = logging.getLogger(__name__)
 
@@ -29,7 +37,116 @@ openssl_methods: Dict[str, int] = {
 }
 
 
-class ScrapyClientTLSOptions(ClientTLSOptions):
+class TLSSessionCache:
+    """
+    Client-side TLS sessions of recent connections, by (hostname, port), so
+    that new connections to the same host can resume them instead of doing a
+    full handshake.
+
+    It also counts completed handshakes and how many of them resumed a
+    session in the ``downloader/tls_handshake_count`` and
+    ``downloader/tls_session_resumed_count`` stats.
+
+    ``limit`` is the maximum number of hosts to keep a session for; ``0``
+    disables session resumption.
+    """
+
+    def __init__(self, limit: int, stats: Optional["StatsCollector"] = None):
+        self.limit: int = limit
+        self._sessions: LocalCache[Hashable, SSL.Session] = LocalCache(limit)
+        self._stats: Optional["StatsCollector"] = stats
+        self._handshakes: WeakSet[SSL.Connection] = WeakSet()
+
+    def get(self, key: Hashable) -> Optional[SSL.Session]:
+        if not self.limit:
+            return None
+        return self._sessions.get(key)
+
+    def handshake_done(self, key: Hashable, connection: SSL.Connection) -> None:
+        self._handshakes.add(connection)
+        self._store(key, connection)
+        if self._stats is not None:
+            self._stats.inc_value("downloader/tls_handshake_count")
+            if is_session_reused(connection._ssl):  # type: ignore[attr-defined]
+                self._stats.inc_value("downloader/tls_session_resumed_count")
+
+    def post_handshake(self, key: Hashable, connection: SSL.Connection) -> None:
+        # With TLS 1.3 session tickets are sent after the handshake, and the
+        # session stored when the handshake was done cannot be resumed.
+        if connection in self._handshakes:
+            self._store(key, connection)
+
+    def _store(self, key: Hashable, connection: SSL.Connection) -> None:
+        if not self.limit:
+            return
+        session = connection.get_session()
+        if session is not None:
+            self._sessions.pop(key, None)
+            self._sessions[key] = session
+
+
+# Connection creators of the connections of shared contexts, see
+# SharedContextClientTLSOptions.
+_connection_creators: (
+    "WeakKeyDictionary[SSL.Connection, SharedContextClientTLSOptions]"
+) = WeakKeyDictionary()
+
+
+def _dispatch_info_callback(connection: SSL.Connection, where: int, ret: Any) -> None:
+    creator = _connection_creators.get(connection)
+    if creator is not None:
+        creator._infoCallback(connection, where, ret)
+
+
+class SharedContextClientTLSOptions(ClientTLSOptions):
+    """
+    Same as Twisted's private _sslverify.ClientTLSOptions, except that the
+    given context may be shared with other instances, and TLS sessions may be
+    resumed through a :class:`TLSSessionCache`.
+
+    ClientTLSOptions sets an info callback bound to its hostname on the
+    context, which only works with a context per connection. Here the context
+    gets a callback that forwards to the instance that created each
+    connection instead.
+    """
+
+    def __init__(
+        self,
+        hostname: str,
+        ctx: SSL.Context,
+        *,
+        session_cache: Optional[TLSSessionCache] = None,
+        session_key: Optional[Hashable] = None,
+    ):
+        super().__init__(hostname, ctx)
+        ctx.set_info_callback(_tolerateErrors(_dispatch_info_callback))
+        self._session_cache: Optional[TLSSessionCache] = session_cache
+        self._session_key: Hashable = (
+            session_key if session_key is not None else self._hostnameBytes
+        )
+
+    def clientConnectionForTLS(
+        self, tlsProtocol: "TLSMemoryBIOProtocol"
+    ) -> SSL.Connection:
+        connection: SSL.Connection = super().clientConnectionForTLS(tlsProtocol)
+        _connection_creators[connection] = self
+        if self._session_cache is not None:
+            session = self._session_cache.get(self._session_key)
+            if session is not None:
+                connection.set_session(session)
+        return connection
+
+    def _infoCallback(self, connection: SSL.Connection, where: int, ret: Any) -> None:
+        self._identityVerifyingInfoCallback(connection, where, ret)
+        if self._session_cache is None:
+            return
+        if where & SSL.SSL_CB_HANDSHAKE_DONE:
+            self._session_cache.handshake_done(self._session_key, connection)
+        elif where & SSL.SSL_CB_LOOP:
+            self._session_cache.post_handshake(self._session_key, connection)
+
+
+class ScrapyClientTLSOptions(SharedContextClientTLSOptions):
     """
     SSL Client connection creator ignoring certificate verification errors
     (for genuinely invalid certificates or bugs in verification code).
@@ -37,11 +154,19 @@ class ScrapyClientTLSOptions(ClientTLSOptions):
     Same as Twisted's private _sslverify.ClientTLSOptions,
     except that VerificationError, CertificateError and ValueError
     exceptions are caught, so that the connection is not closed, only
-    logging warnings. Also, HTTPS connection parameters logging is added.
+    logging warnings. Also, HTTPS connection parameters logging is added,
+    and the context may be shared, see
+    :class:`SharedContextClientTLSOptions`.
     """
 
-    def __init__(self, hostname: str, ctx: SSL.Context, verbose_logging: bool = False):
-        super().__init__(hostname, ctx)
+    def __init__(
+        self,
+        hostname: str,
+        ctx: SSL.Context,
+        verbose_logging: bool = False,
+        **kwargs: Any,
+    ):
+        super().__init__(hostname, ctx, **kwargs)
         self.verbose_logging: bool = verbose_logging
 
     def _identityVerifyingInfoCallback(
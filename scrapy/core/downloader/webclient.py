@@ -8,6 +8,7 @@ from twisted.internet.protocol import ClientFactory
 from twisted.web.http import HTTPClient
 
 from scrapy import Request
+from scrapy.downloadermiddlewares.downloadtimeout import _get_download_timeout
 from scrapy.http import Headers
 from scrapy.responsetypes import responsetypes
 from scrapy.utils.httpobj import urlparse_cached
@@ -143,7 +144,7 @@ class ScrapyHTTPClientFactory(ClientFactory):
         self.body: Optional[bytes] = request.body or None
         self.headers: Headers = Headers(request.headers)
         self.response_headers: Optional[Headers] = None
-        self.timeout: float = request.meta.get("download_timeout") or timeout
+        self.timeout: float = _get_download_timeout(request, timeout)
         self.start_time: float = time()
         self.deferred: defer.Deferred = defer.Deferred().addCallback(
             self._build_response, request
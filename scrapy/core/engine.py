@@ -178,6 +178,12 @@ class ExecutionEngine:
         ):
             pass
 
+        rate_limit_delay = self.downloader.rate_limit_delay()
+        if rate_limit_delay:
+            # Requests are held in the scheduler until the rate limiter allows
+            # a new one
+            self.slot.nextcall.schedule(rate_limit_delay)
+
         if self.slot.start_requests is not None and not self._needs_backout():
             try:
                 request = next(self.slot.start_requests)
@@ -1,9 +1,9 @@
 from collections import deque
-from typing import Deque, Dict, List, Optional, Tuple
+from typing import Deque, Dict, List, Optional, Tuple, Union
 
 from twisted.internet import defer
 from twisted.internet.base import ReactorBase
-from twisted.internet.defer import Deferred
+from twisted.internet.defer import Deferred, DeferredList
 from twisted.internet.endpoints import HostnameEndpoint
 from twisted.python.failure import Failure
 from twisted.web.client import (
@@ -15,27 +15,52 @@ from twisted.web.client import (
 from twisted.web.error import SchemeNotSupported
 
 from scrapy.core.downloader.contextfactory import AcceptableProtocolsContextFactory
-from scrapy.core.http2.protocol import H2ClientFactory, H2ClientProtocol
+from scrapy.core.downloader.timings import DownloadTimer, TimingEndpointFactory
+from scrapy.core.http2.protocol import PROTOCOL_NAME, H2ClientFactory, H2ClientProtocol
+from scrapy.http import Response
 from scrapy.http.request import Request
 from scrapy.settings import Settings
 from scrapy.spiders import Spider
 
 
 class H2ConnectionPool:
-    def __init__(self, reactor: ReactorBase, settings: Settings) -> None:
+    def __init__(
+        self,
+        reactor: ReactorBase,
+        settings: Settings,
+        acceptable_protocols: Optional[List[bytes]] = None,
+    ) -> None:
         self._reactor = reactor
         self.settings = settings
 
+        # Protocols offered during ALPN negotiation. Connections over which
+        # any other protocol than HTTP/2 is negotiated are closed with an
+        # InvalidNegotiatedProtocol error.
+        self.acceptable_protocols: List[bytes] = acceptable_protocols or [PROTOCOL_NAME]
+
+        # Maximum number of connections to open with the same key, when the
+        # existing ones run out of streams
+        self.max_connections: int = max(
+            1, settings.getint("H2_MAX_CONNECTIONS_PER_HOST")
+        )
+
         # Store a dictionary which is used to get the respective
-        # H2ClientProtocolInstance using the  key as Tuple(scheme, hostname, port)
-        self._connections: Dict[Tuple, H2ClientProtocol] = {}
+        # H2ClientProtocol instances using the key as Tuple(scheme, hostname, port)
+        self._connections: Dict[Tuple, List[H2ClientProtocol]] = {}
 
-        # Save all requests that arrive before the connection is established
+        # Save all requests that arrive while a new connection is being
+        # established
         self._pending_requests: Dict[Tuple, Deque[Deferred]] = {}
 
     def get_connection(
         self, key: Tuple, uri: URI, endpoint: HostnameEndpoint
     ) -> Deferred:
+        # Prefer the established connection with the most free streams
+        connections = self._connections.get(key, [])
+        conn = max(connections, key=lambda c: c.available_streams, default=None)
+        if conn is not None and conn.available_streams > 0:
+            return defer.succeed(conn)
+
         if key in self._pending_requests:
             # Received a request while connecting to remote
             # Create a deferred which will fire with the H2ClientProtocol
@@ -44,14 +69,13 @@ class H2ConnectionPool:
             self._pending_requests[key].append(d)
             return d
 
-        # Check if we already have a connection to the remote
-        conn = self._connections.get(key, None)
-        if conn:
-            # Return this connection instance wrapped inside a deferred
-            return defer.succeed(conn)
+        if conn is None or len(connections) < self.max_connections:
+            # Either there is no connection for the given URI yet, or all
+            # the streams of the existing ones are in use
+            return self._new_connection(key, uri, endpoint)
 
-        # No connection is established for the given URI
-        return self._new_connection(key, uri, endpoint)
+        # All connections are busy, the request waits for a free stream
+        return defer.succeed(conn)
 
     def _new_connection(
         self, key: Tuple, uri: URI, endpoint: HostnameEndpoint
@@ -61,16 +85,23 @@ class H2ConnectionPool:
         conn_lost_deferred: Deferred = Deferred()
         conn_lost_deferred.addCallback(self._remove_connection, key)
 
-        factory = H2ClientFactory(uri, self.settings, conn_lost_deferred)
+        factory = H2ClientFactory(
+            uri, self.settings, conn_lost_deferred, self.acceptable_protocols
+        )
         conn_d = endpoint.connect(factory)
-        conn_d.addCallback(self.put_connection, key)
+        conn_d.addCallbacks(
+            self.put_connection,
+            self._connection_failed,
+            callbackArgs=(key,),
+            errbackArgs=(key,),
+        )
 
         d: Deferred = Deferred()
         self._pending_requests[key].append(d)
         return d
 
     def put_connection(self, conn: H2ClientProtocol, key: Tuple) -> H2ClientProtocol:
-        self._connections[key] = conn
+        self._connections.setdefault(key, []).append(conn)
 
         # Now as we have established a proper HTTP/2 connection
         # we fire all the deferred's with the connection instance
@@ -81,8 +112,23 @@ class H2ConnectionPool:
 
         return conn
 
+    def _connection_failed(self, failure: Failure, key: Tuple) -> None:
+        pending_requests = self._pending_requests.pop(key, None)
+        while pending_requests:
+            d = pending_requests.popleft()
+            d.errback(failure)
+
     def _remove_connection(self, errors: List[BaseException], key: Tuple) -> None:
-        self._connections.pop(key)
+        connections = self._connections.get(key, [])
+        open_connections = [conn for conn in connections if not conn.connection_lost]
+        if len(open_connections) < len(connections):
+            # An established connection was lost, its streams have been
+            # closed by the connection itself
+            if open_connections:
+                self._connections[key] = open_connections
+            else:
+                del self._connections[key]
+            return
 
         # Call the errback of all the pending requests for this connection
         pending_requests = self._pending_requests.pop(key, None)
@@ -90,15 +136,34 @@ class H2ConnectionPool:
             d = pending_requests.popleft()
             d.errback(ResponseFailed(errors))
 
-    def close_connections(self) -> None:
+    def max_concurrent_streams(self, key: Tuple) -> Optional[int]:
+        """Return the number of streams that the pool can keep open at the
+        same time for the given key, based on the stream limit negotiated by
+        its connections, or ``None`` if there is no connection for the key.
+        """
+        connections = self._connections.get(key)
+        if not connections:
+            return None
+        per_connection = max(
+            conn.allowed_max_concurrent_streams for conn in connections
+        )
+        return per_connection * self.max_connections
+
+    def close_connections(self) -> Deferred:
         """Close all the HTTP/2 connections and remove them from pool
 
         Returns:
             Deferred that fires when all connections have been closed
         """
-        for conn in self._connections.values():
-            assert conn.transport is not None  # typing
-            conn.transport.abortConnection()
+        closed = []
+        for connections in self._connections.values():
+            for conn in connections:
+                d: Deferred = Deferred()
+                conn._conn_lost_deferred.addBoth(lambda _, d=d: d.callback(None))
+                closed.append(d)
+                assert conn.transport is not None  # typing
+                conn.transport.abortConnection()
+        return DeferredList(closed)
 
 
 class H2Agent:
@@ -109,15 +174,28 @@ class H2Agent:
         context_factory: BrowserLikePolicyForHTTPS = BrowserLikePolicyForHTTPS(),
         connect_timeout: Optional[float] = None,
         bind_address: Optional[bytes] = None,
+        timer: Optional[DownloadTimer] = None,
     ) -> None:
         self._reactor = reactor
         self._pool = pool
         self._context_factory = AcceptableProtocolsContextFactory(
-            context_factory, acceptable_protocols=[b"h2"]
-        )
-        self.endpoint_factory = _StandardEndpointFactory(
-            self._reactor, self._context_factory, connect_timeout, bind_address
+            context_factory, acceptable_protocols=pool.acceptable_protocols
         )
+        self.endpoint_factory: Union[_StandardEndpointFactory, TimingEndpointFactory]
+        if timer is not None:
+            # Time the DNS resolution, TCP connection and TLS handshake of
+            # new connections
+            self.endpoint_factory = TimingEndpointFactory(
+                self._reactor,
+                self._context_factory,
+                connect_timeout,
+                bind_address,
+                timer,
+            )
+        else:
+            self.endpoint_factory = _StandardEndpointFactory(
+                self._reactor, self._context_factory, connect_timeout, bind_address
+            )
 
     def get_endpoint(self, uri: URI):
         return self.endpoint_factory.endpointForURI(uri)
@@ -129,7 +207,11 @@ class H2Agent:
         """
         return uri.scheme, uri.host, uri.port
 
-    def request(self, request: Request, spider: Spider) -> Deferred:
+    def request(
+        self, request: Request, spider: Spider, timer: Optional[DownloadTimer] = None
+    ) -> Deferred:
+        """Send *request*, marking the time to first byte in *timer*, if
+        any."""
         uri = URI.fromBytes(bytes(request.url, encoding="utf-8"))
         try:
             endpoint = self.get_endpoint(uri)
@@ -138,9 +220,18 @@ class H2Agent:
 
         key = self.get_key(uri)
         d = self._pool.get_connection(key, uri, endpoint)
-        d.addCallback(lambda conn: conn.request(request, spider))
+        d.addCallback(lambda conn: conn.request(request, spider, timer))
+        d.addCallback(self._cb_max_concurrent_streams, request, key)
         return d
 
+    def _cb_max_concurrent_streams(
+        self, response: Response, request: Request, key: Tuple
+    ) -> Response:
+        max_concurrent_streams = self._pool.max_concurrent_streams(key)
+        if max_concurrent_streams is not None:
+            request.meta["h2_max_concurrent_streams"] = max_concurrent_streams
+        return response
+
 
 class ScrapyProxyH2Agent(H2Agent):
     def __init__(
@@ -20,6 +20,7 @@ from h2.events import (
     WindowUpdated,
 )
 from h2.exceptions import FrameTooLargeError, H2Error
+from h2.settings import SettingCodes
 from twisted.internet.defer import Deferred
 from twisted.internet.error import TimeoutError
 from twisted.internet.interfaces import IHandshakeListener, IProtocolNegotiationFactory
@@ -30,6 +31,7 @@ from twisted.python.failure import Failure
 from twisted.web.client import URI
 from zope.interface import implementer
 
+from scrapy.core.downloader.timings import DownloadTimer
 from scrapy.core.http2.stream import Stream, StreamCloseReason
 from scrapy.http import Request
 from scrapy.settings import Settings
@@ -42,7 +44,7 @@ PROTOCOL_NAME = b"h2"
 
 
 class InvalidNegotiatedProtocol(H2Error):
-    def __init__(self, negotiated_protocol: bytes) -> None:
+    def __init__(self, negotiated_protocol: Optional[bytes]) -> None:
         self.negotiated_protocol = negotiated_protocol
 
     def __str__(self) -> str:
@@ -77,7 +79,11 @@ class H2ClientProtocol(Protocol, TimeoutMixin):
     IDLE_TIMEOUT = 240
 
     def __init__(
-        self, uri: URI, settings: Settings, conn_lost_deferred: Deferred
+        self,
+        uri: URI,
+        settings: Settings,
+        conn_lost_deferred: Deferred,
+        acceptable_protocols: Optional[List[bytes]] = None,
     ) -> None:
         """
         Arguments:
@@ -87,12 +93,24 @@ class H2ClientProtocol(Protocol, TimeoutMixin):
             settings -- Scrapy project settings
             conn_lost_deferred -- Deferred fires with the reason: Failure to notify
                 that connection was lost
+            acceptable_protocols -- Protocols offered during ALPN negotiation,
+                by default only HTTP/2
         """
         self._conn_lost_deferred = conn_lost_deferred
+        self._acceptable_protocols: List[bytes] = acceptable_protocols or [
+            PROTOCOL_NAME
+        ]
 
         config = H2Configuration(client_side=True, header_encoding="utf-8")
         self.conn = H2Connection(config=config)
 
+        # Flow control window sizes, the HTTP/2 default is 65535 bytes
+        self._initial_window_size: int = settings.getint("H2_INITIAL_WINDOW_SIZE")
+        self._connection_window_size: int = settings.getint("H2_CONNECTION_WINDOW_SIZE")
+
+        # Flag set once the transport connection has been lost
+        self.connection_lost: bool = False
+
         # ID of the next request stream
         # Following the convention - 'Streams initiated by a client MUST
         # use odd-numbered stream identifiers' (RFC 7540 - Section 5.1.1)
@@ -155,6 +173,19 @@ class H2ClientProtocol(Protocol, TimeoutMixin):
             self.conn.remote_settings.max_concurrent_streams,
         )
 
+    @property
+    def available_streams(self) -> int:
+        """Number of requests that can still be sent right away over this
+        connection, without waiting for other streams to be closed.
+        """
+        if self.connection_lost:
+            return 0
+        return (
+            self.allowed_max_concurrent_streams
+            - self.metadata["active_streams"]
+            - len(self._pending_request_stream_pool)
+        )
+
     def _send_pending_requests(self) -> None:
         """Initiate all pending requests from the deque following FIFO
         We make sure that at any time {allowed_max_concurrent_streams}
@@ -177,7 +208,9 @@ class H2ClientProtocol(Protocol, TimeoutMixin):
         self._send_pending_requests()
         return stream
 
-    def _new_stream(self, request: Request, spider: Spider) -> Stream:
+    def _new_stream(
+        self, request: Request, spider: Spider, timer: Optional[DownloadTimer] = None
+    ) -> Stream:
         """Instantiates a new Stream object"""
         stream = Stream(
             stream_id=next(self._stream_id_generator),
@@ -189,6 +222,8 @@ class H2ClientProtocol(Protocol, TimeoutMixin):
             download_warnsize=getattr(
                 spider, "download_warnsize", self.metadata["default_download_warnsize"]
             ),
+            crawler=getattr(spider, "crawler", None),
+            timer=timer,
         )
         self.streams[stream.stream_id] = stream
         return stream
@@ -204,13 +239,15 @@ class H2ClientProtocol(Protocol, TimeoutMixin):
         data = self.conn.data_to_send()
         self.transport.write(data)
 
-    def request(self, request: Request, spider: Spider) -> Deferred:
+    def request(
+        self, request: Request, spider: Spider, timer: Optional[DownloadTimer] = None
+    ) -> Deferred:
         if not isinstance(request, Request):
             raise TypeError(
                 f"Expected scrapy.http.Request, received {request.__class__.__qualname__}"
             )
 
-        stream = self._new_stream(request, spider)
+        stream = self._new_stream(request, spider, timer)
         d = stream.get_response()
 
         # Add the stream to the request pool
@@ -234,6 +271,13 @@ class H2ClientProtocol(Protocol, TimeoutMixin):
 
         # Initiate H2 Connection
         self.conn.initiate_connection()
+        if self._initial_window_size != self.conn.local_settings.initial_window_size:
+            self.conn.update_settings(
+                {SettingCodes.INITIAL_WINDOW_SIZE: self._initial_window_size}
+            )
+        increment = self._connection_window_size - self.conn.inbound_flow_control_window
+        if increment > 0:
+            self.conn.increment_flow_control_window(increment)
         self._write_to_transport()
 
     def _lose_connection_with_error(self, errors: List[BaseException]) -> None:
@@ -248,13 +292,17 @@ class H2ClientProtocol(Protocol, TimeoutMixin):
         Close the connection if it's not made via the expected protocol
         """
         assert self.transport is not None  # typing
-        if (
-            self.transport.negotiatedProtocol is not None
-            and self.transport.negotiatedProtocol != PROTOCOL_NAME
-        ):
+        negotiated_protocol = self.transport.negotiatedProtocol
+        if negotiated_protocol == PROTOCOL_NAME:
+            return
+        # A server that does not support ALPN is only assumed to speak HTTP/2
+        # if no other protocol was offered to it
+        if negotiated_protocol is not None or self._acceptable_protocols != [
+            PROTOCOL_NAME
+        ]:
             # we have not initiated the connection yet, no need to send a GOAWAY frame to the remote peer
             self._lose_connection_with_error(
-                [InvalidNegotiatedProtocol(self.transport.negotiatedProtocol)]
+                [InvalidNegotiatedProtocol(negotiated_protocol)]
             )
 
     def _check_received_data(self, data: bytes) -> None:
@@ -319,6 +367,7 @@ class H2ClientProtocol(Protocol, TimeoutMixin):
         """
         # Cancel the timeout if not done yet
         self.setTimeout(None)
+        self.connection_lost = True
 
         # Notify the connection pool instance such that no new requests are
         # sent over current connection
@@ -425,14 +474,24 @@ class H2ClientProtocol(Protocol, TimeoutMixin):
 @implementer(IProtocolNegotiationFactory)
 class H2ClientFactory(Factory):
     def __init__(
-        self, uri: URI, settings: Settings, conn_lost_deferred: Deferred
+        self,
+        uri: URI,
+        settings: Settings,
+        conn_lost_deferred: Deferred,
+        acceptable_protocols: Optional[List[bytes]] = None,
     ) -> None:
         self.uri = uri
         self.settings = settings
         self.conn_lost_deferred = conn_lost_deferred
+        self.acceptable_protocols: List[bytes] = acceptable_protocols or [PROTOCOL_NAME]
 
     def buildProtocol(self, addr) -> H2ClientProtocol:
-        return H2ClientProtocol(self.uri, self.settings, self.conn_lost_deferred)
+        return H2ClientProtocol(
+            self.uri,
+            self.settings,
+            self.conn_lost_deferred,
+            self.acceptable_protocols,
+        )
 
     def acceptableProtocols(self) -> List[bytes]:
-        return [PROTOCOL_NAME]
+        return self.acceptable_protocols
@@ -6,11 +6,14 @@ from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 from h2.errors import ErrorCodes
 from h2.exceptions import H2Error, ProtocolError, StreamClosedError
 from hpack import HeaderTuple
+from twisted.internet.base import DelayedCall
 from twisted.internet.defer import CancelledError, Deferred
 from twisted.internet.error import ConnectionClosed
 from twisted.python.failure import Failure
 from twisted.web.client import ResponseFailed
 
+from scrapy.core.downloader.bandwidth import transfer_delay
+from scrapy.core.downloader.timings import DownloadTimer
 from scrapy.http import Request
 from scrapy.http.headers import Headers
 from scrapy.responsetypes import responsetypes
@@ -18,6 +21,7 @@ from scrapy.utils.httpobj import urlparse_cached
 
 if TYPE_CHECKING:
     from scrapy.core.http2.protocol import H2ClientProtocol
+    from scrapy.crawler import Crawler
 
 
 logger = logging.getLogger(__name__)
@@ -90,16 +94,25 @@ class Stream:
         protocol: "H2ClientProtocol",
         download_maxsize: int = 0,
         download_warnsize: int = 0,
+        crawler: Optional["Crawler"] = None,
+        timer: Optional[DownloadTimer] = None,
     ) -> None:
         """
         Arguments:
             stream_id -- Unique identifier for the stream within a single HTTP/2 connection
             request -- The HTTP request associated to the stream
             protocol -- Parent H2ClientProtocol instance
+            crawler -- Crawler whose bandwidth limits apply to the response
+            timer -- Timer of the download phases, marked when headers arrive
         """
         self.stream_id: int = stream_id
         self._request: Request = request
         self._protocol: "H2ClientProtocol" = protocol
+        self._crawler: Optional["Crawler"] = crawler
+        self._timer: Optional[DownloadTimer] = timer
+        # Acknowledgements of received data delayed by bandwidth limits
+        self._ack_calls: List[DelayedCall] = []
+        self._unacknowledged_size: int = 0
 
         self._download_maxsize = self._request.meta.get(
             "download_maxsize", download_maxsize
@@ -341,12 +354,48 @@ class Stream:
             )
             logger.warning(warning_msg)
 
-        # Acknowledge the data received
+        # Acknowledge the data received. To stay within the bandwidth limits,
+        # the acknowledgement is delayed, which stops the server from sending
+        # more data once the flow control window of the stream is exhausted.
+        delay = (
+            transfer_delay(self._crawler, self._request, flow_controlled_length)
+            if flow_controlled_length
+            else 0
+        )
+        if delay:
+            from twisted.internet import reactor
+
+            self._ack_calls = [call for call in self._ack_calls if call.active()]
+            self._unacknowledged_size += flow_controlled_length
+            self._ack_calls.append(
+                reactor.callLater(
+                    delay, self._acknowledge_received_data, flow_controlled_length
+                )
+            )
+            return
         self._protocol.conn.acknowledge_received_data(
-            self._response["flow_controlled_size"], self.stream_id
+            flow_controlled_length, self.stream_id
         )
 
+    def _acknowledge_received_data(self, flow_controlled_length: int) -> None:
+        self._unacknowledged_size -= flow_controlled_length
+        if (
+            self.metadata["stream_closed_local"]
+            or self.metadata["stream_closed_server"]
+        ):
+            return
+        try:
+            self._protocol.conn.acknowledge_received_data(
+                flow_controlled_length, self.stream_id
+            )
+        except StreamClosedError:
+            return
+        self._protocol._write_to_transport()
+
     def receive_headers(self, headers: List[HeaderTuple]) -> None:
+        if self._timer is not None:
+            self._timer.mark("ttfb")
+
         for name, value in headers:
             self._response["headers"].appendlist(name, value)
 
@@ -400,6 +449,22 @@ class Stream:
 
         self.metadata["stream_closed_server"] = True
 
+        for call in self._ack_calls:
+            if call.active():
+                call.cancel()
+        self._ack_calls = []
+        if self._unacknowledged_size:
+            # The data received on this stream also counts towards the flow
+            # control window of the connection, which other streams share, so
+            # it must be acknowledged even if the stream is closed.
+            self._protocol.conn.acknowledge_received_data(
+                self._unacknowledged_size, self.stream_id
+            )
+            self._unacknowledged_size = 0
+            if not from_protocol:
+                # Otherwise the protocol writes once it has handled its events
+                self._protocol._write_to_transport()
+
         # We do not check for Content-Length or Transfer-Encoding in response headers
         # and add `partial` flag as in HTTP/1.1 as 'A request or response that includes
         # a payload body can include a content-length header field' (RFC 7540 - Section 8.1.2.6)
@@ -6,7 +6,7 @@ See documentation in docs/topics/downloader-middleware.rst
 
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Union
+from typing import TYPE_CHECKING, Optional, Union, cast
 
 from scrapy import Request, Spider, signals
 from scrapy.crawler import Crawler
@@ -17,13 +17,37 @@ if TYPE_CHECKING:
     from typing_extensions import Self
 
 
+def _get_download_timeout(request: Request, default: float) -> float:
+    """Return the download timeout of *request*, taking into account the
+    timeout set by :setting:`DOWNLOAD_TIMEOUT_ADAPTIVE`."""
+    timeout = request.meta.get("download_timeout") or default
+    adaptive_timeout = request.meta.get("_adaptive_download_timeout")
+    if adaptive_timeout and (not timeout or adaptive_timeout < timeout):
+        return cast(float, adaptive_timeout)
+    return timeout
+
+
 class DownloadTimeoutMiddleware:
-    def __init__(self, timeout: float = 180):
+    def __init__(self, timeout: float = 180, crawler: Optional[Crawler] = None):
         self._timeout: float = timeout
+        self._crawler: Optional[Crawler] = crawler
+        self._adaptive: bool = False
+        if crawler is not None:
+            settings = crawler.settings
+            self._adaptive = settings.getbool("DOWNLOAD_TIMEOUT_ADAPTIVE")
+            self._adaptive_factor: float = settings.getfloat(
+                "DOWNLOAD_TIMEOUT_ADAPTIVE_FACTOR"
+            )
+            self._adaptive_min: float = settings.getfloat(
+                "DOWNLOAD_TIMEOUT_ADAPTIVE_MIN"
+            )
+            self._adaptive_percentile: float = settings.getfloat(
+                "DOWNLOAD_TIMEOUT_ADAPTIVE_PERCENTILE"
+            )
 
     @classmethod
     def from_crawler(cls, crawler: Crawler) -> Self:
-        o = cls(crawler.settings.getfloat("DOWNLOAD_TIMEOUT"))
+        o = cls(crawler.settings.getfloat("DOWNLOAD_TIMEOUT"), crawler)
         crawler.signals.connect(o.spider_opened, signal=signals.spider_opened)
         return o
 
@@ -33,6 +57,31 @@ class DownloadTimeoutMiddleware:
     def process_request(
         self, request: Request, spider: Spider
     ) -> Union[Request, Response, None]:
-        if self._timeout:
-            request.meta.setdefault("download_timeout", self._timeout)
+        # Drop the adaptive timeout of a previous attempt, e.g. before a retry
+        request.meta.pop("_adaptive_download_timeout", None)
+        if self._timeout and "download_timeout" not in request.meta:
+            request.meta["download_timeout"] = self._timeout
+        if (
+            self._adaptive
+            and request.meta.get("download_timeout") == self._timeout
+            and not request.meta.get("retry_times")
+        ):
+            adaptive_timeout = self._adaptive_timeout(request)
+            if adaptive_timeout is not None and adaptive_timeout < self._timeout:
+                request.meta["_adaptive_download_timeout"] = adaptive_timeout
         return None
+
+    def _adaptive_timeout(self, request: Request) -> Optional[float]:
+        """Return a timeout based on the recent latencies of the downloader
+        slot of *request*, or ``None`` if there are not enough of them."""
+        assert self._crawler is not None
+        if self._crawler.engine is None:
+            return None
+        downloader = self._crawler.engine.downloader
+        slot = downloader.slots.get(downloader.get_slot_key(request))
+        if slot is None:
+            return None
+        latency = slot.latency_percentile(self._adaptive_percentile)
+        if latency is None:
+            return None
+        return max(self._adaptive_min, latency * self._adaptive_factor)
@@ -1,9 +1,29 @@
 from __future__ import annotations
 
+import logging
+import threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 from email.utils import formatdate
-from typing import TYPE_CHECKING, Optional, Union
+from inspect import iscoroutinefunction
+from time import time
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    Union,
+)
 
-from twisted.internet import defer
+from twisted.internet import defer, threads
+from twisted.internet.defer import Deferred
 from twisted.internet.error import (
     ConnectError,
     ConnectionDone,
@@ -13,16 +33,20 @@ from twisted.internet.error import (
     TCPTimedOutError,
     TimeoutError,
 )
+from twisted.python.threadpool import ThreadPool
 from twisted.web.client import ResponseFailed
 
 from scrapy import signals
 from scrapy.crawler import Crawler
 from scrapy.exceptions import IgnoreRequest, NotConfigured
-from scrapy.http.request import Request
+from scrapy.http.headers import Headers
+from scrapy.http.request import NO_CALLBACK, Request
 from scrapy.http.response import Response
+from scrapy.responsetypes import responsetypes
 from scrapy.settings import Settings
 from scrapy.spiders import Spider
 from scrapy.statscollectors import StatsCollector
+from scrapy.utils.defer import deferred_from_coro
 from scrapy.utils.misc import load_object
 
 if TYPE_CHECKING:
@@ -30,6 +54,240 @@ if TYPE_CHECKING:
     from typing_extensions import Self
 
 
+logger = logging.getLogger(__name__)
+
+
+class _StorageLock:
+    """Readers-writer lock of a cache storage used from several threads.
+
+    Reads only run concurrently if the storage allows it with a true
+    ``concurrent_reads`` attribute, writes always run alone.
+    """
+
+    def __init__(self, concurrent_reads: bool):
+        self.concurrent_reads: bool = concurrent_reads
+        self._condition: threading.Condition = threading.Condition()
+        self._readers: int = 0
+        self._writing: bool = False
+        self._waiting_writers: int = 0
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        if not self.concurrent_reads:
+            with self.write():
+                yield
+            return
+        with self._condition:
+            # Waiting writers go first, so that reads do not starve them
+            while self._writing or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        with self._condition:
+            self._waiting_writers += 1
+            while self._writing or self._readers:
+                self._condition.wait()
+            self._waiting_writers -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
+
+class _CacheWriteQueue:
+    """Store responses in a cache storage from a thread, in batches, so that
+    the serialization and I/O of the storage do not block the reactor.
+
+    Responses waiting to be stored can be looked up with :meth:`get`.
+    """
+
+    def __init__(
+        self, storage: Any, lock: _StorageLock, max_size: int, batch_size: int
+    ):
+        self.storage: Any = storage
+        self.max_size: int = max_size
+        self.batch_size: int = max(1, batch_size)
+        # Held while the storage is used, since storages are not thread-safe
+        self.lock: _StorageLock = lock
+        self._queue: Deque[Tuple[Spider, Request, Response, bytes]] = deque()
+        # Queued and being written responses, by request fingerprint
+        self._pending: Dict[bytes, Response] = {}
+        self._size: int = 0
+        self._writing: bool = False
+        self._space_waiters: List[Deferred] = []
+        self._flush_waiters: List[Deferred] = []
+
+    def open_spider(self, spider: Spider) -> None:
+        assert spider.crawler.request_fingerprinter
+        self._fingerprinter = spider.crawler.request_fingerprinter
+
+    def get(self, request: Request) -> Optional[Response]:
+        """Return a copy of the response waiting to be stored for
+        *request*, if any."""
+        if not self._pending:
+            return None
+        response = self._pending.get(self._fingerprinter.fingerprint(request))
+        if response is None:
+            return None
+        return response.replace(flags=[])
+
+    def put(
+        self, spider: Spider, request: Request, response: Response
+    ) -> Optional[Deferred]:
+        """Queue *response* to be stored, and return a deferred that fires
+        once there is room in the queue again if it is full, or ``None``."""
+        key = self._fingerprinter.fingerprint(request)
+        self._pending[key] = response
+        self._queue.append((spider, request, response, key))
+        self._size += 1
+        self._write()
+        if self._size <= self.max_size:
+            return None
+        d: Deferred = Deferred()
+        self._space_waiters.append(d)
+        return d
+
+    def flush(self) -> Deferred:
+        """Return a deferred that fires once all queued responses have been
+        stored."""
+        if not self._size:
+            return defer.succeed(None)
+        d: Deferred = Deferred()
+        self._flush_waiters.append(d)
+        return d
+
+    def _write(self) -> None:
+        if self._writing or not self._queue:
+            return
+        batch = [
+            self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))
+        ]
+        self._writing = True
+        d = threads.deferToThread(self._write_batch, batch)
+        d.addBoth(self._batch_written, batch)
+
+    def _write_batch(
+        self, batch: List[Tuple[Spider, Request, Response, bytes]]
+    ) -> None:
+        for spider, request, response, _ in batch:
+            try:
+                with self.lock.write():
+                    self.storage.store_response(spider, request, response)
+            except Exception:
+                logger.error(
+                    "Error storing %(response)s in the HTTP cache",
+                    {"response": response},
+                    exc_info=True,
+                    extra={"spider": spider},
+                )
+
+    def _batch_written(
+        self, _: Any, batch: List[Tuple[Spider, Request, Response, bytes]]
+    ) -> None:
+        self._writing = False
+        self._size -= len(batch)
+        for _, _, response, key in batch:
+            if self._pending.get(key) is response:
+                del self._pending[key]
+        if self._size <= self.max_size:
+            waiters, self._space_waiters = self._space_waiters, []
+            for d in waiters:
+                d.callback(None)
+        self._write()
+        if not self._size:
+            waiters, self._flush_waiters = self._flush_waiters, []
+            for d in waiters:
+                d.callback(None)
+
+
+class _MemoryCacheEntry(NamedTuple):
+    respcls: Type[Response]
+    url: str
+    status: int
+    headers: Headers
+    body: bytes
+    #: Approximate memory used by the entry, in bytes
+    size: int
+    #: Time the entry was added, as seconds since the epoch
+    timestamp: float
+
+
+class _MemoryCache:
+    """Least recently used responses of a cache storage, up to a total size
+    in bytes.
+
+    Responses are kept as the arguments to build them, so that hits do not
+    pay for the deserialization, decompression and response class detection
+    of the storage again.
+    """
+
+    def __init__(self, max_size: int, expiration_secs: int):
+        self.max_size: int = max_size
+        self.expiration_secs: int = expiration_secs
+        self.size: int = 0
+        self._entries: OrderedDict[bytes, _MemoryCacheEntry] = OrderedDict()
+
+    def get(self, key: bytes) -> Optional[Response]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if 0 < self.expiration_secs < time() - entry.timestamp:
+            self._remove(key)
+            return None  # expired
+        self._entries.move_to_end(key)
+        return entry.respcls(
+            url=entry.url,
+            status=entry.status,
+            headers=entry.headers.copy(),
+            body=entry.body,
+        )
+
+    def put(self, key: bytes, response: Response) -> int:
+        """Add *response*, and return the number of entries evicted to make
+        room for it."""
+        if key in self._entries:
+            self._remove(key)
+        size = len(key) + len(response.url) + len(response.body)
+        for name, values in response.headers.items():
+            size += len(name) + sum(len(value) for value in values)
+        if size > self.max_size:
+            return 0
+        evicted = 0
+        while self.size + size > self.max_size:
+            self._remove(next(iter(self._entries)))
+            evicted += 1
+        # Like the storages, which do not keep the response class
+        respcls = responsetypes.from_args(
+            headers=response.headers, url=response.url, body=response.body
+        )
+        self._entries[key] = _MemoryCacheEntry(
+            respcls,
+            response.url,
+            response.status,
+            response.headers.copy(),
+            response.body,
+            size,
+            time(),
+        )
+        self.size += size
+        return evicted
+
+    def _remove(self, key: bytes) -> None:
+        self.size -= self._entries.pop(key).size
+
+
 class HttpCacheMiddleware:
     DOWNLOAD_EXCEPTIONS = (
         defer.TimeoutError,
@@ -51,6 +309,34 @@ class HttpCacheMiddleware:
         self.storage = load_object(settings["HTTPCACHE_STORAGE"])(settings)
         self.ignore_missing = settings.getbool("HTTPCACHE_IGNORE_MISSING")
         self.stats = stats
+        self.lock: _StorageLock = _StorageLock(
+            getattr(self.storage, "concurrent_reads", False)
+        )
+        self.write_queue: Optional[_CacheWriteQueue] = None
+        if settings.getbool("HTTPCACHE_WRITE_BEHIND"):
+            self.write_queue = _CacheWriteQueue(
+                self.storage,
+                self.lock,
+                settings.getint("HTTPCACHE_WRITE_QUEUE_SIZE"),
+                settings.getint("HTTPCACHE_WRITE_BATCH_SIZE"),
+            )
+        self.revalidate_priority_adjust: int = settings.getint(
+            "HTTPCACHE_REVALIDATE_PRIORITY_ADJUST"
+        )
+        # Fingerprints of the requests being revalidated in the background
+        self._revalidating: Set[bytes] = set()
+        # Coroutines of asynchronous storages run in the reactor thread
+        self.read_threads: int = 0
+        if not iscoroutinefunction(self.storage.retrieve_response):
+            self.read_threads = settings.getint("HTTPCACHE_READ_THREADS")
+        self.read_pool: Optional[ThreadPool] = None
+        self._read_pool_trigger: Any = None
+        self.memory_cache: Optional[_MemoryCache] = None
+        memory_size = settings.getint("HTTPCACHE_MEMORY_SIZE")
+        if memory_size > 0:
+            self.memory_cache = _MemoryCache(
+                memory_size, settings.getint("HTTPCACHE_EXPIRATION_SECS")
+            )
 
     @classmethod
     def from_crawler(cls, crawler: Crawler) -> Self:
@@ -62,13 +348,55 @@ class HttpCacheMiddleware:
 
     def spider_opened(self, spider: Spider) -> None:
         self.storage.open_spider(spider)
+        if self.write_queue is not None:
+            self.write_queue.open_spider(spider)
+        if self.read_threads > 0:
+            from twisted.internet import reactor
+
+            self.read_pool = ThreadPool(
+                minthreads=0, maxthreads=self.read_threads, name="HttpCacheRead"
+            )
+            self.read_pool.start()
+            # Pool threads would keep the process alive if the spider is not
+            # closed, e.g. if the crawl fails to start
+            self._read_pool_trigger = reactor.addSystemEventTrigger(
+                "during", "shutdown", self._stop_read_pool
+            )
 
-    def spider_closed(self, spider: Spider) -> None:
+    def spider_closed(self, spider: Spider) -> Optional[Deferred]:
+        if self.memory_cache is not None:
+            hits = self.stats.get_value("httpcache/memory/hit", 0, spider=spider)
+            misses = self.stats.get_value("httpcache/memory/miss", 0, spider=spider)
+            if hits + misses:
+                self.stats.set_value(
+                    "httpcache/memory/hit_rate",
+                    round(hits / (hits + misses), 4),
+                    spider=spider,
+                )
+        if self.write_queue is not None:
+            d = self.write_queue.flush()
+            d.addCallback(lambda _: self._close_storage(spider))
+            return d
+        self._close_storage(spider)
+        return None
+
+    def _close_storage(self, spider: Spider) -> None:
+        if self._read_pool_trigger is not None:
+            from twisted.internet import reactor
+
+            reactor.removeSystemEventTrigger(self._read_pool_trigger)
+            self._read_pool_trigger = None
+        self._stop_read_pool()
         self.storage.close_spider(spider)
 
+    def _stop_read_pool(self) -> None:
+        if self.read_pool is not None:
+            self.read_pool.stop()
+            self.read_pool = None
+
     def process_request(
         self, request: Request, spider: Spider
-    ) -> Union[Request, Response, None]:
+    ) -> Union[Request, Response, Deferred, None]:
         if request.meta.get("dont_cache", False):
             return None
 
@@ -78,9 +406,14 @@ class HttpCacheMiddleware:
             return None
 
         # Look for cached response and check if expired
-        cachedresponse: Optional[Response] = self.storage.retrieve_response(
-            spider, request
-        )
+        result = self._retrieve_response(spider, request)
+        if isinstance(result, Deferred):
+            return result.addCallback(self._process_cached_response, request, spider)
+        return self._process_cached_response(result, request, spider)
+
+    def _process_cached_response(
+        self, cachedresponse: Optional[Response], request: Request, spider: Spider
+    ) -> Optional[Response]:
         if cachedresponse is None:
             self.stats.inc_value("httpcache/miss", spider=spider)
             if self.ignore_missing:
@@ -90,10 +423,28 @@ class HttpCacheMiddleware:
 
         # Return cached response only if not expired
         cachedresponse.flags.append("cached")
+        if request.meta.get("_cache_revalidation"):
+            if self.policy.is_cached_response_fresh(cachedresponse, request):
+                self._revalidating.discard(self._fingerprint(spider, request))
+                raise IgnoreRequest(f"Cached response already revalidated: {request}")
+            request.meta["cached_response"] = cachedresponse
+            return None
         if self.policy.is_cached_response_fresh(cachedresponse, request):
             self.stats.inc_value("httpcache/hit", spider=spider)
             return cachedresponse
 
+        # Return the stale response and revalidate it in the background
+        can_serve_stale = getattr(self.policy, "can_serve_stale", None)
+        if (
+            spider.crawler.engine is not None
+            and can_serve_stale is not None
+            and can_serve_stale(cachedresponse, request)
+        ):
+            self._schedule_revalidation(spider, request)
+            self.stats.inc_value("httpcache/stale_hit", spider=spider)
+            cachedresponse.flags.append("stale")
+            return cachedresponse
+
         # Keep a reference to cached response to avoid a second cache lookup on
         # process_response hook
         request.meta["cached_response"] = cachedresponse
@@ -102,7 +453,7 @@ class HttpCacheMiddleware:
 
     def process_response(
         self, request: Request, response: Response, spider: Spider
-    ) -> Union[Request, Response]:
+    ) -> Union[Request, Response, Deferred]:
         if request.meta.get("dont_cache", False):
             return response
 
@@ -116,25 +467,30 @@ class HttpCacheMiddleware:
         if "Date" not in response.headers:
             response.headers["Date"] = formatdate(usegmt=True)
 
-        # Do not validate first-hand responses
         cachedresponse: Optional[Response] = request.meta.pop("cached_response", None)
+        if request.meta.get("_cache_revalidation"):
+            self._revalidated(spider, response, request, cachedresponse)
+
+        # Do not validate first-hand responses
         if cachedresponse is None:
             self.stats.inc_value("httpcache/firsthand", spider=spider)
-            self._cache_response(spider, response, request, cachedresponse)
-            return response
+            return self._cache_response(spider, response, request, cachedresponse)
 
         if self.policy.is_cached_response_valid(cachedresponse, response, request):
             self.stats.inc_value("httpcache/revalidate", spider=spider)
             return cachedresponse
 
         self.stats.inc_value("httpcache/invalidate", spider=spider)
-        self._cache_response(spider, response, request, cachedresponse)
-        return response
+        return self._cache_response(spider, response, request, cachedresponse)
 
     def process_exception(
         self, request: Request, exception: Exception, spider: Spider
     ) -> Union[Request, Response, None]:
         cachedresponse: Optional[Response] = request.meta.pop("cached_response", None)
+        if request.meta.get("_cache_revalidation"):
+            # The stale response was already used
+            self._revalidating.discard(self._fingerprint(spider, request))
+            return None
         if cachedresponse is not None and isinstance(
             exception, self.DOWNLOAD_EXCEPTIONS
         ):
@@ -148,9 +504,135 @@ class HttpCacheMiddleware:
         response: Response,
         request: Request,
         cachedresponse: Optional[Response],
+    ) -> Union[Response, Deferred]:
+        """Store *response* if the policy allows it, and return it, or a
+        deferred that fires with it once there is room in the write queue."""
+        if not self.policy.should_cache_response(response, request):
+            self.stats.inc_value("httpcache/uncacheable", spider=spider)
+            return response
+        self.stats.inc_value("httpcache/store", spider=spider)
+        if self.memory_cache is not None:
+            self._remember(response, self._fingerprint(spider, request), spider)
+        if self.write_queue is None:
+            with self.lock.write():
+                self.storage.store_response(spider, request, response)
+            return response
+        d = self.write_queue.put(spider, request, response)
+        if d is None:
+            return response
+        self.stats.inc_value("httpcache/write_queue_full", spider=spider)
+        return d.addCallback(lambda _: response)
+
+    def _fingerprint(self, spider: Spider, request: Request) -> bytes:
+        assert spider.crawler.request_fingerprinter
+        return spider.crawler.request_fingerprinter.fingerprint(request)
+
+    def _schedule_revalidation(self, spider: Spider, request: Request) -> None:
+        """Schedule a conditional request to revalidate the stale cached
+        response of *request*, unless one is already scheduled."""
+        key = self._fingerprint(spider, request)
+        if key in self._revalidating:
+            return
+        self._revalidating.add(key)
+        assert spider.crawler.engine
+        spider.crawler.engine.crawl(
+            request.replace(
+                callback=NO_CALLBACK,
+                errback=None,
+                priority=request.priority + self.revalidate_priority_adjust,
+                dont_filter=True,
+                meta={**request.meta, "_cache_revalidation": True},
+            )
+        )
+
+    def _revalidated(
+        self,
+        spider: Spider,
+        response: Response,
+        request: Request,
+        cachedresponse: Optional[Response],
     ) -> None:
-        if self.policy.should_cache_response(response, request):
-            self.stats.inc_value("httpcache/store", spider=spider)
-            self.storage.store_response(spider, request, response)
+        """Update the cache with the *response* of a background revalidation
+        request, and drop it, since its stale cached response was already
+        used."""
+        self._revalidating.discard(self._fingerprint(spider, request))
+        if cachedresponse is not None and self.policy.is_cached_response_valid(
+            cachedresponse, response, request
+        ):
+            self.stats.inc_value("httpcache/stale_revalidate", spider=spider)
+            if response.status == 304:
+                # Refresh the cached response with the headers of the 304
+                # response, e.g. Date and Cache-Control
+                headers = cachedresponse.headers.copy()
+                headers.update(response.headers)
+                headers.pop(b"Content-Length", None)
+                self._cache_response(
+                    spider, cachedresponse.replace(headers=headers), request, None
+                )
         else:
-            self.stats.inc_value("httpcache/uncacheable", spider=spider)
+            self.stats.inc_value("httpcache/stale_invalidate", spider=spider)
+            self._cache_response(spider, response, request, cachedresponse)
+        raise IgnoreRequest(f"Revalidated cached response: {request}")
+
+    def _retrieve_response(
+        self, spider: Spider, request: Request
+    ) -> Union[Response, Deferred, None]:
+        """Return the cached response of *request*, ``None``, or a deferred
+        that fires with either of them.
+
+        Storages can return deferreds and coroutines, otherwise lookups run in
+        the read thread pool, if any."""
+        if self.memory_cache is None:
+            return self._retrieve_from_storage(spider, request)
+        key = self._fingerprint(spider, request)
+        cachedresponse = self.memory_cache.get(key)
+        if cachedresponse is not None:
+            self.stats.inc_value("httpcache/memory/hit", spider=spider)
+            if self.read_pool is not None:
+                return defer.succeed(cachedresponse)
+            return cachedresponse
+        self.stats.inc_value("httpcache/memory/miss", spider=spider)
+        result = self._retrieve_from_storage(spider, request)
+        if isinstance(result, Deferred):
+            return result.addCallback(self._remember, key, spider)
+        return self._remember(result, key, spider)
+
+    def _remember(
+        self, cachedresponse: Optional[Response], key: bytes, spider: Spider
+    ) -> Optional[Response]:
+        """Add *cachedresponse* to the memory cache, if not ``None``, and
+        return it."""
+        assert self.memory_cache is not None
+        if cachedresponse is not None:
+            evicted = self.memory_cache.put(key, cachedresponse)
+            if evicted:
+                self.stats.inc_value("httpcache/memory/evict", evicted, spider=spider)
+            self.stats.set_value(
+                "httpcache/memory/bytes", self.memory_cache.size, spider=spider
+            )
+        return cachedresponse
+
+    def _retrieve_from_storage(
+        self, spider: Spider, request: Request
+    ) -> Union[Response, Deferred, None]:
+        if self.write_queue is not None:
+            cachedresponse = self.write_queue.get(request)
+            if cachedresponse is not None:
+                if self.read_pool is not None:
+                    return defer.succeed(cachedresponse)
+                return cachedresponse
+        if self.read_pool is not None:
+            from twisted.internet import reactor
+
+            return threads.deferToThreadPool(
+                reactor,  # type: ignore[arg-type]
+                self.read_pool,
+                self._read_storage,
+                spider,
+                request,
+            )
+        return deferred_from_coro(self._read_storage(spider, request))
+
+    def _read_storage(self, spider: Spider, request: Request) -> Optional[Response]:
+        with self.lock.read():
+            return self.storage.retrieve_response(spider, request)
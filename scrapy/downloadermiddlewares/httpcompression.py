@@ -3,7 +3,7 @@ from __future__ import annotations
 import warnings
 from itertools import chain
 from logging import getLogger
-from typing import TYPE_CHECKING, List, Optional, Union
+from typing import TYPE_CHECKING, List, Optional, Tuple, Union
 
 from scrapy import Request, Spider, signals
 from scrapy.crawler import Crawler
@@ -46,6 +46,28 @@ else:
     ACCEPTED_ENCODINGS.append(b"zstd")
 
 
+def _split_encodings(
+    content_encoding: List[bytes],
+) -> Tuple[List[bytes], List[bytes]]:
+    """Split the values of the ``Content-Encoding`` header of a response into
+    the encodings that can be decoded, in decoding order, and the remaining
+    encodings, which must be kept."""
+    to_keep = [
+        encoding.strip().lower()
+        for encoding in chain.from_iterable(
+            encodings.split(b",") for encodings in content_encoding
+        )
+    ]
+    to_decode = []
+    while to_keep:
+        encoding = to_keep.pop()
+        if encoding not in ACCEPTED_ENCODINGS:
+            to_keep.append(encoding)
+            return to_decode, to_keep
+        to_decode.append(encoding)
+    return to_decode, to_keep
+
+
 class HttpCompressionMiddleware:
     """This middleware allows compressed (gzip, deflate) traffic to be
     sent/received from web sites"""
@@ -60,10 +82,12 @@ class HttpCompressionMiddleware:
             self.stats = stats
             self._max_size = 1073741824
             self._warn_size = 33554432
+            self._lazy = False
             return
         self.stats = crawler.stats
         self._max_size = crawler.settings.getint("DOWNLOAD_MAXSIZE")
         self._warn_size = crawler.settings.getint("DOWNLOAD_WARNSIZE")
+        self._lazy = crawler.settings.getbool("COMPRESSION_LAZY")
         crawler.signals.connect(self.open_spider, signals.spider_opened)
 
     @classmethod
@@ -83,6 +107,7 @@ class HttpCompressionMiddleware:
             mw.stats = crawler.stats
             mw._max_size = crawler.settings.getint("DOWNLOAD_MAXSIZE")
             mw._warn_size = crawler.settings.getint("DOWNLOAD_WARNSIZE")
+            mw._lazy = crawler.settings.getbool("COMPRESSION_LAZY")
             crawler.signals.connect(mw.open_spider, signals.spider_opened)
             return mw
 
@@ -108,6 +133,12 @@ class HttpCompressionMiddleware:
             if content_encoding:
                 max_size = request.meta.get("download_maxsize", self._max_size)
                 warn_size = request.meta.get("download_warnsize", self._warn_size)
+                if self._lazy:
+                    lazy_response = self._lazy_response(
+                        response, content_encoding, max_size, warn_size, spider
+                    )
+                    if lazy_response is not None:
+                        return lazy_response
                 try:
                     decoded_body, content_encoding = self._handle_encoding(
                         response.body, content_encoding, max_size
@@ -149,6 +180,37 @@ class HttpCompressionMiddleware:
 
         return response
 
+    def _lazy_response(
+        self,
+        response: Response,
+        content_encoding: List[bytes],
+        max_size: int,
+        warn_size: int,
+        spider: Spider,
+    ) -> Optional[Response]:
+        """Return a copy of *response* that decodes its body on first access,
+        or ``None`` if the response class cannot be determined without
+        decoding the body."""
+        to_decode, to_keep = self._split_encodings(content_encoding)
+        if not to_decode:
+            return None
+        headers = response.headers.copy()
+        if to_keep:
+            headers["Content-Encoding"] = to_keep
+        else:
+            del headers["Content-Encoding"]
+        respcls = responsetypes.from_args(headers=headers, url=response.url)
+        if respcls is Response:
+            return None
+        kwargs = {"cls": respcls, "headers": headers}
+        if issubclass(respcls, TextResponse):
+            kwargs["encoding"] = None
+        response = response.replace(**kwargs)
+        response._body_decoder = _LazyBodyDecoder(
+            self, response, to_decode, max_size, warn_size, spider
+        )
+        return response
+
     def _handle_encoding(self, body, content_encoding, max_size):
         to_decode, to_keep = self._split_encodings(content_encoding)
         for encoding in to_decode:
@@ -156,20 +218,7 @@ class HttpCompressionMiddleware:
         return body, to_keep
 
     def _split_encodings(self, content_encoding):
-        to_keep = [
-            encoding.strip().lower()
-            for encoding in chain.from_iterable(
-                encodings.split(b",") for encodings in content_encoding
-            )
-        ]
-        to_decode = []
-        while to_keep:
-            encoding = to_keep.pop()
-            if encoding not in ACCEPTED_ENCODINGS:
-                to_keep.append(encoding)
-                return to_decode, to_keep
-            to_decode.append(encoding)
-        return to_decode, to_keep
+        return _split_encodings(content_encoding)
 
     def _decode(self, body: bytes, encoding: bytes, max_size: int) -> bytes:
         if encoding in {b"gzip", b"x-gzip"}:
@@ -181,3 +230,70 @@ class HttpCompressionMiddleware:
         if encoding == b"zstd" and b"zstd" in ACCEPTED_ENCODINGS:
             return _unzstd(body, max_size=max_size)
         return body
+
+
+class _LazyBodyDecoder:
+    """Decodes the body of a response returned by
+    :class:`HttpCompressionMiddleware` when :setting:`COMPRESSION_LAZY` is
+    enabled, the first time that body is accessed.
+
+    :attr:`content_encoding` is the part of the original ``Content-Encoding``
+    header that the encoded body still needs to be decoded from, so that the
+    encoded body can be stored as is.
+
+    Copies of the response share its decoder, which keeps the decoded body, so
+    that it is decoded, and counted in stats, only once.
+    """
+
+    def __init__(
+        self,
+        middleware: HttpCompressionMiddleware,
+        response: Response,
+        to_decode: List[bytes],
+        max_size: int,
+        warn_size: int,
+        spider: Spider,
+    ):
+        self._middleware = middleware
+        self._response_repr = repr(response)
+        self._to_decode = to_decode
+        self._max_size = max_size
+        self._warn_size = warn_size
+        self._spider = spider
+        self._decoded_body: Optional[bytes] = None
+
+    @property
+    def content_encoding(self) -> List[bytes]:
+        return self._to_decode[::-1]
+
+    def __call__(self, body: bytes) -> bytes:
+        if self._decoded_body is not None:
+            return self._decoded_body
+        decoded_body = body
+        try:
+            for encoding in self._to_decode:
+                decoded_body = self._middleware._decode(
+                    decoded_body, encoding, self._max_size
+                )
+        except _DecompressionMaxSizeExceeded:
+            raise IgnoreRequest(
+                f"Ignored response {self._response_repr} because its body "
+                f"({len(body)} B compressed) exceeded DOWNLOAD_MAXSIZE "
+                f"({self._max_size} B) during decompression."
+            )
+        if len(body) < self._warn_size <= len(decoded_body):
+            logger.warning(
+                f"{self._response_repr} body size after decompression "
+                f"({len(decoded_body)} B) is larger than the "
+                f"download warning size ({self._warn_size} B)."
+            )
+        stats = self._middleware.stats
+        if stats:
+            stats.inc_value(
+                "httpcompression/response_bytes",
+                len(decoded_body),
+                spider=self._spider,
+            )
+            stats.inc_value("httpcompression/response_count", spider=self._spider)
+        self._decoded_body = decoded_body
+        return decoded_body
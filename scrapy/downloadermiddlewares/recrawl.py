@@ -0,0 +1,174 @@
+"""
+Conditional requests for periodic recrawls, without a full HTTP cache
+
+See documentation in docs/topics/downloader-middleware.rst
+"""
+
+from __future__ import annotations
+
+import hashlib
+import struct
+from importlib import import_module
+from pathlib import Path
+from time import time
+from types import ModuleType
+from typing import TYPE_CHECKING, Any, NamedTuple, Optional, Union
+
+from scrapy import Request, Spider, signals
+from scrapy.crawler import Crawler
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.http import Response
+from scrapy.statscollectors import StatsCollector
+from scrapy.utils.project import data_path
+from scrapy.utils.request import RequestFingerprinter
+
+if TYPE_CHECKING:
+    # typing.Self requires Python 3.11
+    from typing_extensions import Self
+
+
+class _Validators(NamedTuple):
+    """What is known about the last response of a request."""
+
+    etag: Optional[bytes]
+    last_modified: Optional[bytes]
+    #: SHA-256 digest of the body
+    content_hash: bytes
+    #: Time of the last crawl, as seconds since the epoch
+    last_crawl: float
+
+
+class _ValidatorIndex:
+    """Persistent index of validators by request fingerprint, in a DBM
+    database."""
+
+    #: Prefix of the records, followed by the ETag and Last-Modified values
+    RECORD = struct.Struct("<d32sHH")
+
+    def __init__(self, path: Path, dbmodule: ModuleType):
+        self.path: Path = path
+        self.db: Any = dbmodule.open(str(path), "c")
+
+    def get(self, fingerprint: bytes) -> Optional[_Validators]:
+        if fingerprint not in self.db:
+            return None
+        data = self.db[fingerprint]
+        last_crawl, content_hash, etag_length, last_modified_length = (
+            self.RECORD.unpack_from(data)
+        )
+        start = self.RECORD.size
+        etag = data[start : start + etag_length] if etag_length else None
+        start += etag_length
+        last_modified = (
+            data[start : start + last_modified_length] if last_modified_length else None
+        )
+        return _Validators(etag, last_modified, content_hash, last_crawl)
+
+    def set(self, fingerprint: bytes, validators: _Validators) -> None:
+        etag = validators.etag or b""
+        last_modified = validators.last_modified or b""
+        self.db[fingerprint] = (
+            self.RECORD.pack(
+                validators.last_crawl,
+                validators.content_hash,
+                len(etag),
+                len(last_modified),
+            )
+            + etag
+            + last_modified
+        )
+
+    def close(self) -> None:
+        self.db.close()
+
+
+class RecrawlMiddleware:
+    """Remember the validators of responses across crawls to send
+    conditional requests, and drop unchanged responses."""
+
+    def __init__(self, crawler: Crawler):
+        settings = crawler.settings
+        if not settings.getbool("RECRAWL_ENABLED"):
+            raise NotConfigured
+        self.dir: str = data_path(settings["RECRAWL_DIR"], createdir=True)
+        self.dbmodule: ModuleType = import_module(settings["RECRAWL_DBM_MODULE"])
+        self.drop_unchanged: bool = settings.getbool("RECRAWL_DROP_UNCHANGED")
+        assert crawler.stats
+        self.stats: StatsCollector = crawler.stats
+        assert crawler.request_fingerprinter
+        self._fingerprinter: RequestFingerprinter = crawler.request_fingerprinter
+        self.index: Optional[_ValidatorIndex] = None
+        crawler.signals.connect(self.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(self.spider_closed, signal=signals.spider_closed)
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> Self:
+        return cls(crawler)
+
+    def spider_opened(self, spider: Spider) -> None:
+        self.index = _ValidatorIndex(Path(self.dir, f"{spider.name}.db"), self.dbmodule)
+
+    def spider_closed(self, spider: Spider) -> None:
+        if self.index is not None:
+            self.index.close()
+            self.index = None
+
+    def process_request(
+        self, request: Request, spider: Spider
+    ) -> Union[Request, Response, None]:
+        if (
+            request.method != "GET"
+            or request.meta.get("dont_validate")
+            or b"If-None-Match" in request.headers
+            or b"If-Modified-Since" in request.headers
+        ):
+            return None
+        assert self.index is not None
+        validators = self.index.get(self._fingerprinter.fingerprint(request))
+        if validators is None:
+            return None
+        if validators.etag:
+            request.headers[b"If-None-Match"] = validators.etag
+        if validators.last_modified:
+            request.headers[b"If-Modified-Since"] = validators.last_modified
+        if validators.etag or validators.last_modified:
+            self.stats.inc_value("recrawl/conditional", spider=spider)
+        return None
+
+    def process_response(
+        self, request: Request, response: Response, spider: Spider
+    ) -> Union[Request, Response]:
+        if request.method != "GET" or "cached" in response.flags:
+            return response
+        if response.status != 304 and not 200 <= response.status < 300:
+            return response
+        assert self.index is not None
+        fingerprint = self._fingerprinter.fingerprint(request)
+        validators = self.index.get(fingerprint)
+        etag = response.headers.get(b"ETag")
+        last_modified = response.headers.get(b"Last-Modified")
+        if response.status == 304:
+            if validators is None:
+                # Validators set by someone else
+                return response
+            self.stats.inc_value("recrawl/not_modified", spider=spider)
+            content_hash = validators.content_hash
+            # 304 responses may omit the validators
+            etag = etag or validators.etag
+            last_modified = last_modified or validators.last_modified
+        else:
+            content_hash = hashlib.sha256(response.body).digest()
+        self.index.set(
+            fingerprint, _Validators(etag, last_modified, content_hash, time())
+        )
+        if validators is None:
+            self.stats.inc_value("recrawl/new", spider=spider)
+            return response
+        if content_hash != validators.content_hash:
+            self.stats.inc_value("recrawl/changed", spider=spider)
+            return response
+        self.stats.inc_value("recrawl/unchanged", spider=spider)
+        if self.drop_unchanged:
+            raise IgnoreRequest(f"Unchanged since the last crawl: {request}")
+        response.flags.append("unchanged")
+        return response
@@ -0,0 +1,239 @@
+"""
+Adaptive concurrency extension
+
+Adjusts the concurrency of each downloader slot using an
+additive-increase/multiplicative-decrease (AIMD) policy.
+
+See documentation in docs/topics/extensions.rst
+"""
+
+from __future__ import annotations
+
+import logging
+from collections import deque
+from time import time
+from typing import TYPE_CHECKING, Deque, Optional, Set, Tuple
+from weakref import WeakKeyDictionary
+
+from scrapy import Request, Spider, signals
+from scrapy.core.downloader import Slot
+from scrapy.crawler import Crawler
+from scrapy.exceptions import NotConfigured
+from scrapy.extensions.httpcache import rfc1123_to_epoch
+from scrapy.http import Response
+
+if TYPE_CHECKING:
+    # typing.Self requires Python 3.11
+    from typing_extensions import Self
+
+logger = logging.getLogger(__name__)
+
+
+def _percentile(values: Deque[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+def _parse_retry_after(value: Optional[bytes], now: float) -> Optional[float]:
+    """Return the number of seconds a ``Retry-After`` header value asks to
+    wait, or ``None`` if the value cannot be parsed."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    epoch = rfc1123_to_epoch(value)
+    if epoch is None:
+        return None
+    return max(0.0, epoch - now)
+
+
+class _SlotState:
+    def __init__(self, window: int, concurrency: int):
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.baseline: Optional[float] = None
+        self.successes: int = 0
+        self.since_decrease: int = concurrency
+        self.hold_until: float = 0.0
+
+
+class AdaptiveConcurrency:
+    def __init__(self, crawler: Crawler):
+        self.crawler: Crawler = crawler
+        settings = crawler.settings
+        if not settings.getbool("ADAPTIVE_CONCURRENCY_ENABLED"):
+            raise NotConfigured
+
+        self.debug: bool = settings.getbool("ADAPTIVE_CONCURRENCY_DEBUG")
+        self.min_concurrency: int = settings.getint("ADAPTIVE_CONCURRENCY_MIN")
+        self.max_concurrency: int = settings.getint(
+            "ADAPTIVE_CONCURRENCY_MAX"
+        ) or settings.getint("CONCURRENT_REQUESTS")
+        self.increase: int = settings.getint("ADAPTIVE_CONCURRENCY_INCREASE")
+        self.decrease_factor: float = settings.getfloat(
+            "ADAPTIVE_CONCURRENCY_DECREASE_FACTOR"
+        )
+        self.latency_tolerance: float = settings.getfloat(
+            "ADAPTIVE_CONCURRENCY_LATENCY_TOLERANCE"
+        )
+        self.window: int = settings.getint("ADAPTIVE_CONCURRENCY_WINDOW")
+        self.backoff_http_codes: Set[int] = {
+            int(code) for code in settings.getlist("ADAPTIVE_CONCURRENCY_HTTP_CODES")
+        }
+        if self.min_concurrency < 1:
+            raise NotConfigured(
+                f"ADAPTIVE_CONCURRENCY_MIN ({self.min_concurrency!r}) must be "
+                f"higher than 0."
+            )
+        if self.max_concurrency < self.min_concurrency:
+            raise NotConfigured(
+                f"ADAPTIVE_CONCURRENCY_MAX ({self.max_concurrency!r}) must not "
+                f"be lower than ADAPTIVE_CONCURRENCY_MIN "
+                f"({self.min_concurrency!r})."
+            )
+        if not 0.0 < self.decrease_factor < 1.0:
+            raise NotConfigured(
+                f"ADAPTIVE_CONCURRENCY_DECREASE_FACTOR "
+                f"({self.decrease_factor!r}) must be between 0 and 1."
+            )
+
+        self._states: WeakKeyDictionary[Slot, _SlotState] = WeakKeyDictionary()
+        self._responded: Set[Request] = set()
+        crawler.signals.connect(
+            self._response_downloaded, signal=signals.response_downloaded
+        )
+        crawler.signals.connect(
+            self._request_left_downloader, signal=signals.request_left_downloader
+        )
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> Self:
+        return cls(crawler)
+
+    def _get_slot(self, request: Request) -> Tuple[Optional[str], Optional[Slot]]:
+        key: Optional[str] = request.meta.get("download_slot")
+        if key is None:
+            return None, None
+        assert self.crawler.engine
+        return key, self.crawler.engine.downloader.slots.get(key)
+
+    def _get_state(self, slot: Slot) -> _SlotState:
+        if slot not in self._states:
+            slot.concurrency = min(
+                max(slot.concurrency, self.min_concurrency), self.max_concurrency
+            )
+            self._states[slot] = _SlotState(self.window, slot.concurrency)
+        return self._states[slot]
+
+    def _response_downloaded(
+        self, response: Response, request: Request, spider: Spider
+    ) -> None:
+        self._responded.add(request)
+        key, slot = self._get_slot(request)
+        if key is None or slot is None or slot.throttle is False:
+            return
+        state = self._get_state(slot)
+        state.since_decrease += 1
+        now = time()
+
+        retry_after = _parse_retry_after(response.headers.get("Retry-After"), now)
+        if retry_after is not None:
+            state.hold_until = max(state.hold_until, now + retry_after)
+            self._decrease(key, slot, state, "retry_after", spider)
+            return
+        if response.status in self.backoff_http_codes:
+            self._decrease(key, slot, state, f"http_{response.status}", spider)
+            return
+
+        latency = request.meta.get("download_latency")
+        if latency is not None:
+            state.latencies.append(latency)
+            if len(state.latencies) == state.latencies.maxlen:
+                p50 = _percentile(state.latencies, 0.5)
+                p90 = _percentile(state.latencies, 0.9)
+                if state.baseline is None or p50 < state.baseline:
+                    state.baseline = p50
+                else:
+                    # Let the baseline follow a server that became slower for
+                    # good, instead of pinning the slot to the minimum.
+                    state.baseline += (p50 - state.baseline) * 0.1
+                self._set_stat(key, "latency_baseline", state.baseline)
+                if p90 > state.baseline * self.latency_tolerance:
+                    self._decrease(key, slot, state, "latency", spider)
+                    return
+
+        state.successes += 1
+        if state.successes >= slot.concurrency and now >= state.hold_until:
+            state.successes = 0
+            self._increase(key, slot, request, spider)
+
+    def _request_left_downloader(self, request: Request, spider: Spider) -> None:
+        if request in self._responded:
+            self._responded.discard(request)
+            return
+        key, slot = self._get_slot(request)
+        if key is None or slot is None or slot.throttle is False:
+            return
+        state = self._get_state(slot)
+        state.since_decrease += 1
+        self._decrease(key, slot, state, "error", spider)
+
+    def _increase(self, key: str, slot: Slot, request: Request, spider: Spider) -> None:
+        max_concurrency = self.max_concurrency
+        # Do not go beyond what the HTTP/2 connections to the server can
+        # serve without queuing requests
+        max_streams = request.meta.get("h2_max_concurrent_streams")
+        if max_streams:
+            max_concurrency = max(
+                min(max_concurrency, max_streams), self.min_concurrency
+            )
+        new_concurrency = min(slot.concurrency + self.increase, max_concurrency)
+        if new_concurrency <= slot.concurrency:
+            return
+        self._change(key, slot, new_concurrency, "increase", spider)
+
+    def _decrease(
+        self, key: str, slot: Slot, state: _SlotState, reason: str, spider: Spider
+    ) -> None:
+        # Only back off once per round trip: requests that were already in
+        # flight when concurrency was last decreased report the same
+        # congestion and must not shrink the slot any further.
+        state.successes = 0
+        if state.since_decrease < slot.concurrency:
+            return
+        state.since_decrease = 0
+        state.latencies.clear()
+        new_concurrency = max(
+            int(slot.concurrency * self.decrease_factor), self.min_concurrency
+        )
+        if new_concurrency == slot.concurrency:
+            return
+        self.crawler.stats.inc_value(
+            f"adaptive_concurrency/decrease/{reason}", spider=spider
+        )
+        self._change(key, slot, new_concurrency, "decrease", spider)
+
+    def _change(
+        self, key: str, slot: Slot, new_concurrency: int, action: str, spider: Spider
+    ) -> None:
+        old_concurrency = slot.concurrency
+        slot.concurrency = new_concurrency
+        stats = self.crawler.stats
+        stats.inc_value(f"adaptive_concurrency/{action}", spider=spider)
+        stats.inc_value(f"adaptive_concurrency/{key}/{action}", spider=spider)
+        self._set_stat(key, "concurrency", new_concurrency)
+        if self.debug:
+            logger.info(
+                "slot: %(slot)s | %(action)s concurrency: %(old)d -> %(new)d",
+                {
+                    "slot": key,
+                    "action": action,
+                    "old": old_concurrency,
+                    "new": new_concurrency,
+                },
+                extra={"spider": spider},
+            )
+
+    def _set_stat(self, key: str, name: str, value: float) -> None:
+        self.crawler.stats.set_value(f"adaptive_concurrency/{key}/{name}", value)
@@ -1,26 +1,70 @@
 import gzip
+import hashlib
 import logging
+import mmap
 import os
 import pickle  # nosec
+import shutil
+import struct
+import threading
+from contextlib import contextmanager
 from email.utils import mktime_tz, parsedate_tz
 from importlib import import_module
 from pathlib import Path
 from time import time
 from types import ModuleType
-from typing import IO, TYPE_CHECKING, Any, Callable, Dict, List, Optional, Union, cast
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+    cast,
+)
+from urllib.parse import urlparse
 from weakref import WeakKeyDictionary
 
+from twisted.internet.threads import deferToThread
 from w3lib.http import headers_dict_to_raw, headers_raw_to_dict
 
+import scrapy
+from scrapy.exceptions import NotConfigured
 from scrapy.http import Headers, Response
 from scrapy.http.request import Request
 from scrapy.responsetypes import responsetypes
 from scrapy.settings import BaseSettings
 from scrapy.spiders import Spider
+from scrapy.statscollectors import StatsCollector
 from scrapy.utils.httpobj import urlparse_cached
+from scrapy.utils.log import failure_to_exc_info
 from scrapy.utils.project import data_path
 from scrapy.utils.python import to_bytes, to_unicode
-from scrapy.utils.request import RequestFingerprinter
+from scrapy.utils.request import RequestFingerprinter, request_httprepr
+from scrapy.utils.warc import (
+    CDX_HEADER,
+    CdxEntry,
+    cdx_timestamp,
+    format_cdx_entry,
+    parse_cdx_line,
+    parse_cdx_timestamp,
+    parse_response_block,
+    payload_digest,
+    read_record,
+    record_id,
+    response_block,
+    warc_date,
+    write_record,
+)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 if TYPE_CHECKING:
     # typing.Concatenate requires Python 3.10
@@ -67,6 +111,10 @@ class RFC2616Policy:
             to_bytes(cc)
             for cc in settings.getlist("HTTPCACHE_IGNORE_RESPONSE_CACHE_CONTROLS")
         ]
+        self.stale_while_revalidate: bool = settings.getbool(
+            "HTTPCACHE_STALE_WHILE_REVALIDATE"
+        )
+        self.max_staleness: float = settings.getfloat("HTTPCACHE_MAX_STALENESS")
 
     def _parse_cachecontrol(
         self, r: Union[Request, Response]
@@ -162,6 +210,27 @@ class RFC2616Policy:
         self._set_conditional_validators(request, cachedresponse)
         return False
 
+    def can_serve_stale(self, cachedresponse: Response, request: Request) -> bool:
+        """Return whether the stale *cachedresponse* can be used while it is
+        revalidated in the background."""
+        if not self.stale_while_revalidate:
+            return False
+        cc = self._parse_cachecontrol(cachedresponse)
+        ccreq = self._parse_cachecontrol(request)
+        if b"no-cache" in cc or b"no-cache" in ccreq or b"must-revalidate" in cc:
+            return False
+        if not self.max_staleness:
+            return True
+        now = time()
+        freshnesslifetime = self._compute_freshness_lifetime(
+            cachedresponse, request, now
+        )
+        reqmaxage = self._get_max_age(ccreq)
+        if reqmaxage is not None:
+            freshnesslifetime = min(freshnesslifetime, reqmaxage)
+        currentage = self._compute_current_age(cachedresponse, request, now)
+        return currentage - freshnesslifetime <= self.max_staleness
+
     def is_cached_response_valid(
         self, cachedresponse: Response, response: Response, request: Request
     ) -> bool:
@@ -247,16 +316,271 @@ class RFC2616Policy:
         return currentage
 
 
+def _body_hash(body: bytes, encoding: Optional[str] = None) -> str:
+    """Return the key of the stored blob of *body*: its SHA-256 hash, suffixed
+    with the encoding of the blob, if any, so that the blobs of a body stored
+    with and without compression are not mixed up."""
+    body_hash = hashlib.sha256(body).hexdigest()
+    if encoding is not None:
+        return f"{body_hash}.{encoding}"
+    return body_hash
+
+
+def _record_dedup_stats(
+    stats: Optional[StatsCollector], body_size: int, stored_size: int
+) -> None:
+    """Account for a response body of *body_size* bytes, of which
+    *stored_size* bytes had to be stored."""
+    if stats is None:
+        return
+    stats.inc_value("httpcache/dedup/body_bytes", body_size)
+    stats.inc_value("httpcache/dedup/stored_bytes", stored_size)
+    stored_bytes = stats.get_value("httpcache/dedup/stored_bytes")
+    if stored_bytes:
+        stats.set_value(
+            "httpcache/dedup/ratio",
+            round(stats.get_value("httpcache/dedup/body_bytes") / stored_bytes, 2),
+        )
+
+
+class _ZstdCodec:
+    """Compress cached data with zstd, optionally with dictionaries trained
+    from the first data stored for each spider or domain.
+
+    Dictionaries are stored in *path*, in a directory per spider or domain,
+    as numbered versions that are never modified. Compressed data records the
+    ID of its dictionary, so it can be decompressed with any version.
+
+    Samples are kept in memory for up to :attr:`MAX_SAMPLED_SCOPES` scopes at
+    a time, up to :attr:`MAX_SAMPLES_SIZE` bytes each, and dictionaries are
+    trained in a thread.
+    """
+
+    MAX_SAMPLED_SCOPES = 16
+    MAX_SAMPLES_SIZE = 4 * 1024 * 1024
+
+    def __init__(
+        self,
+        path: Path,
+        settings: BaseSettings,
+        stats: Optional[StatsCollector] = None,
+    ):
+        if zstandard is None:
+            raise NotConfigured("HTTPCACHE_ZSTD requires the zstandard package")
+        self.path: Path = path
+        self.level: int = settings.getint("HTTPCACHE_ZSTD_LEVEL")
+        self.dictionary_scope: Optional[str] = settings.get("HTTPCACHE_ZSTD_DICTIONARY")
+        if self.dictionary_scope not in (None, "spider", "domain"):
+            raise ValueError(
+                f"Invalid HTTPCACHE_ZSTD_DICTIONARY value: "
+                f"{self.dictionary_scope!r}, expected 'spider' or 'domain'"
+            )
+        self.dictionary_samples: int = settings.getint(
+            "HTTPCACHE_ZSTD_DICTIONARY_SAMPLES"
+        )
+        self.dictionary_size: int = settings.getint("HTTPCACHE_ZSTD_DICTIONARY_SIZE")
+        self.stats: Optional[StatsCollector] = stats
+        self._compressors: Dict[str, Any] = {}
+        self._dictionaries: Dict[int, Any] = {}
+        # Decompressors are not thread-safe, and cache lookups can run in
+        # several threads, see HTTPCACHE_READ_THREADS
+        self._local: threading.local = threading.local()
+        # Data to train the dictionary of scopes without one
+        self._samples: Dict[str, List[bytes]] = {}
+        self._samples_size: Dict[str, int] = {}
+
+    def compress(self, data: bytes, spider_name: str, url: str) -> bytes:
+        scope = spider_name
+        if self.dictionary_scope == "domain":
+            scope = urlparse(url).hostname or ""
+        compressor = self._compressors.get(scope)
+        if compressor is None:
+            compressor = self._load_compressor(scope)
+        compressed: bytes = compressor.compress(data)
+        if scope in self._samples:
+            self._add_sample(scope, data)
+        if self.stats is not None:
+            self.stats.inc_value("httpcache/zstd/raw_bytes", len(data))
+            self.stats.inc_value("httpcache/zstd/compressed_bytes", len(compressed))
+        return compressed
+
+    def decompress(self, data: bytes) -> bytes:
+        dict_id = zstandard.get_frame_parameters(data).dict_id
+        decompressors = getattr(self._local, "decompressors", None)
+        if decompressors is None:
+            decompressors = self._local.decompressors = {}
+        decompressor = decompressors.get(dict_id)
+        if decompressor is None:
+            dictionary = None
+            if dict_id:
+                if dict_id not in self._dictionaries:
+                    self._load_dictionaries()
+                dictionary = self._dictionaries[dict_id]
+            decompressor = decompressors[dict_id] = zstandard.ZstdDecompressor(
+                dict_data=dictionary
+            )
+        return cast(bytes, decompressor.decompress(data))
+
+    def _load_compressor(self, scope: str) -> Any:
+        dictionary = None
+        if self.dictionary_scope is not None:
+            versions = sorted(self._versions(scope))
+            if versions:
+                dictionary = zstandard.ZstdCompressionDict(
+                    (self.path / scope / f"{versions[-1]}.dict").read_bytes()
+                )
+            elif len(self._samples) < self.MAX_SAMPLED_SCOPES:
+                self._samples[scope] = []
+                self._samples_size[scope] = 0
+        compressor = zstandard.ZstdCompressor(level=self.level, dict_data=dictionary)
+        self._compressors[scope] = compressor
+        return compressor
+
+    def _versions(self, scope: str) -> Iterator[int]:
+        for path in (self.path / scope).glob("*.dict"):
+            if path.stem.isdigit():
+                yield int(path.stem)
+
+    def _load_dictionaries(self) -> None:
+        for path in self.path.glob("*/*.dict"):
+            dictionary = zstandard.ZstdCompressionDict(path.read_bytes())
+            self._dictionaries.setdefault(dictionary.dict_id(), dictionary)
+
+    def _add_sample(self, scope: str, data: bytes) -> None:
+        samples = self._samples[scope]
+        samples.append(data)
+        self._samples_size[scope] += len(data)
+        if (
+            len(samples) < self.dictionary_samples
+            and self._samples_size[scope] < self.MAX_SAMPLES_SIZE
+        ):
+            return
+        del self._samples[scope]
+        del self._samples_size[scope]
+        # Training takes seconds with the default settings
+        d = deferToThread(self._train_dictionary, scope, samples)
+        d.addCallback(self._set_dictionary, scope)
+        d.addErrback(
+            lambda f: logger.error(
+                "Error while training a zstd dictionary for %(scope)s",
+                {"scope": scope},
+                exc_info=failure_to_exc_info(f),
+            )
+        )
+
+    def _train_dictionary(self, scope: str, samples: List[bytes]) -> Any:
+        """Train and store a dictionary for *scope*, and return it, or
+        ``None`` if it could not be trained."""
+        try:
+            dictionary = zstandard.train_dictionary(
+                self.dictionary_size, samples, level=self.level
+            )
+        except zstandard.ZstdError as e:
+            logger.warning(
+                "Could not train a zstd dictionary for %(scope)s: %(error)s",
+                {"scope": scope, "error": e},
+            )
+            return None
+        (self.path / scope).mkdir(parents=True, exist_ok=True)
+        version = max(self._versions(scope), default=0) + 1
+        while True:
+            # Several crawls can train a dictionary at the same time
+            try:
+                with (self.path / scope / f"{version}.dict").open("xb") as f:
+                    f.write(dictionary.as_bytes())
+                break
+            except FileExistsError:
+                version += 1
+        return dictionary
+
+    def _set_dictionary(self, dictionary: Any, scope: str) -> None:
+        if dictionary is None:
+            return
+        self._compressors[scope] = zstandard.ZstdCompressor(
+            level=self.level, dict_data=dictionary
+        )
+        if self.stats is not None:
+            self.stats.inc_value("httpcache/zstd/dictionaries")
+
+
+class _ExpirationIndex:
+    """Append-only log of the keys of cache entries with the time at which
+    they were stored, in storage order.
+
+    Since the oldest entries come first, expired entries are found without
+    reading the rest of the log. The position of the first entry that has not
+    been pruned is kept in a separate file, and the pruned part of the log is
+    only dropped once it is larger than the rest.
+    """
+
+    def __init__(self, path: Path):
+        self.path: Path = path
+        self._start_path: Path = path.with_name(f"{path.name}.start")
+        self._file: Optional[IO[str]] = None
+
+    def add(self, key: str, timestamp: float) -> None:
+        if self._file is None:
+            self._file = self.path.open("a", encoding="ascii")
+        self._file.write(f"{timestamp!r} {key}\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def pop_expired(self, cutoff: float) -> Iterator[Tuple[str, float]]:
+        """Yield the key and storage time of the entries stored before
+        *cutoff*, removing them from the log.
+
+        An entry may have been stored again after the yielded time.
+        """
+        if not self.path.exists():
+            return
+        start = int(self._start_path.read_text()) if self._start_path.exists() else 0
+        with self.path.open("rb") as f:
+            f.seek(start)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # being written
+                timestamp, _, key = line.decode("ascii").rstrip("\n").partition(" ")
+                if float(timestamp) >= cutoff:
+                    break
+                yield key, float(timestamp)
+                start += len(line)
+        self._set_start(start)
+
+    def _set_start(self, start: int) -> None:
+        size = self.path.stat().st_size
+        if start * 2 < size:
+            self._start_path.write_text(str(start))
+            return
+        tmp_path = self.path.with_name(f"{self.path.name}.tmp")
+        with self.path.open("rb") as f, tmp_path.open("wb") as tmp:
+            f.seek(start)
+            shutil.copyfileobj(f, tmp)
+        tmp_path.replace(self.path)
+        self._start_path.unlink(missing_ok=True)
+
+
 class DbmCacheStorage:
     def __init__(self, settings: BaseSettings):
         self.cachedir: str = data_path(settings["HTTPCACHE_DIR"], createdir=True)
         self.expiration_secs: int = settings.getint("HTTPCACHE_EXPIRATION_SECS")
         self.dbmodule: ModuleType = import_module(settings["HTTPCACHE_DBM_MODULE"])
+        self.dedup_bodies: bool = settings.getbool("HTTPCACHE_DEDUP_BODIES")
+        self.use_zstd: bool = settings.getbool("HTTPCACHE_ZSTD")
+        if self.use_zstd and zstandard is None:
+            raise NotConfigured("HTTPCACHE_ZSTD requires the zstandard package")
+        self.settings: BaseSettings = settings
         self.db: Any = None  # the real type is private
+        self._expiration_index: Optional[_ExpirationIndex] = None
+        self._zstd: Optional[_ZstdCodec] = None
 
     def open_spider(self, spider: Spider) -> None:
         dbpath = Path(self.cachedir, f"{spider.name}.db")
         self.db = self.dbmodule.open(str(dbpath), "c")
+        self._expiration_index = self._get_expiration_index(spider.name)
 
         logger.debug(
             "Using DBM cache storage in %(cachepath)s",
@@ -266,9 +590,18 @@ class DbmCacheStorage:
 
         assert spider.crawler.request_fingerprinter
         self._fingerprinter: RequestFingerprinter = spider.crawler.request_fingerprinter
+        self._stats: Optional[StatsCollector] = spider.crawler.stats
+        if zstandard is not None:  # also to read entries stored with zstd
+            self._zstd = _ZstdCodec(
+                Path(self.cachedir, f"{spider.name}.dictionaries"),
+                self.settings,
+                self._stats,
+            )
 
     def close_spider(self, spider: Spider) -> None:
         self.db.close()
+        if self._expiration_index is not None:
+            self._expiration_index.close()
 
     def retrieve_response(self, spider: Spider, request: Request) -> Optional[Response]:
         data = self._read_data(spider, request)
@@ -277,7 +610,13 @@ class DbmCacheStorage:
         url = data["url"]
         status = data["status"]
         headers = Headers(data["headers"])
-        body = data["body"]
+        if "body_hash" in data:
+            body = self.db[f"blob_{data['body_hash']}_data"]
+        else:
+            body = data["body"]
+        if data.get("body_encoding") == "zstd":
+            assert self._zstd is not None
+            body = self._zstd.decompress(body)
         respcls = responsetypes.from_args(headers=headers, url=url, body=body)
         response = respcls(url=url, headers=headers, status=status, body=body)
         return response
@@ -292,8 +631,115 @@ class DbmCacheStorage:
             "headers": dict(response.headers),
             "body": response.body,
         }
+        if self.use_zstd:
+            assert self._zstd is not None
+            data["body"] = self._zstd.compress(response.body, spider.name, response.url)
+            data["body_encoding"] = "zstd"
+        if self.dedup_bodies:
+            old_hash = self._stored_body_hash(key)
+            data["body_hash"] = _body_hash(response.body, data.get("body_encoding"))
+            self._acquire_blob(data["body_hash"], data.pop("body"))
+            if old_hash is not None:
+                self._release_blob(old_hash)
+        timestamp = time()
         self.db[f"{key}_data"] = pickle.dumps(data, protocol=4)
-        self.db[f"{key}_time"] = str(time())
+        self.db[f"{key}_time"] = repr(timestamp)
+        assert self._expiration_index is not None
+        self._expiration_index.add(key, timestamp)
+
+    def prune(self, spider_name: str, max_age: float) -> int:
+        """Remove the entries of the *spider_name* cache stored more than
+        *max_age* seconds ago, and return how many were removed."""
+        self.db = self._open_db(spider_name, "w")
+        if self.db is None:
+            return 0
+        count = 0
+        index = self._get_expiration_index(spider_name)
+        try:
+            for key, timestamp in index.pop_expired(time() - max_age):
+                tkey = f"{key}_time"
+                if tkey not in self.db or float(self.db[tkey]) > timestamp:
+                    continue  # removed or stored again since
+                body_hash = self._stored_body_hash(key)
+                del self.db[f"{key}_data"]
+                del self.db[tkey]
+                if body_hash is not None:
+                    self._release_blob(body_hash)
+                count += 1
+        finally:
+            self.db.close()
+        return count
+
+    def compact(self, spider_name: str) -> None:
+        """Reclaim the space of removed entries, if the DBM module
+        supports it."""
+        db = self._open_db(spider_name, "w")
+        if db is None:
+            return
+        try:
+            if hasattr(db, "reorganize"):
+                db.reorganize()
+        finally:
+            db.close()
+
+    def info(self, spider_name: str) -> Dict[str, int]:
+        """Return the number of entries and the size in bytes of the
+        *spider_name* cache."""
+        db = self._open_db(spider_name, "r")
+        if db is None:
+            return {"entries": 0, "bytes": 0}
+        try:
+            entries = sum(1 for key in db.keys() if to_bytes(key).endswith(b"_time"))
+        finally:
+            db.close()
+        size = sum(
+            path.stat().st_size
+            for path in Path(self.cachedir).glob(f"{spider_name}.*")
+            if path.is_file()
+        )
+        return {"entries": entries, "bytes": size}
+
+    def _get_expiration_index(self, spider_name: str) -> _ExpirationIndex:
+        return _ExpirationIndex(Path(self.cachedir, f"{spider_name}.expiration"))
+
+    def _open_db(self, spider_name: str, flag: str) -> Any:
+        """Open the existing database of *spider_name*, or return ``None``
+        if it has no cache."""
+        dbpath = Path(self.cachedir, f"{spider_name}.db")
+        errors = getattr(self.dbmodule, "error", OSError)
+        # The error of the dbm package is a tuple of exception classes
+        if not isinstance(errors, tuple):
+            errors = (errors,)
+        try:
+            return self.dbmodule.open(str(dbpath), flag)
+        except (*errors, OSError):
+            return None
+
+    def _stored_body_hash(self, key: str) -> Optional[str]:
+        if f"{key}_data" not in self.db:
+            return None
+        data = pickle.loads(self.db[f"{key}_data"])  # nosec
+        return cast(Optional[str], data.get("body_hash"))
+
+    def _acquire_blob(self, body_hash: str, body: bytes) -> None:
+        """Add a reference to the blob of *body*, storing it if needed."""
+        refs_key = f"blob_{body_hash}_refs"
+        refs = int(self.db[refs_key]) if refs_key in self.db else 0
+        if not refs:
+            self.db[f"blob_{body_hash}_data"] = body
+        self.db[refs_key] = str(refs + 1)
+        _record_dedup_stats(self._stats, len(body), 0 if refs else len(body))
+
+    def _release_blob(self, body_hash: str) -> None:
+        """Remove a reference to a blob, deleting it if it was the last
+        one."""
+        refs_key = f"blob_{body_hash}_refs"
+        refs = int(self.db[refs_key]) - 1
+        if refs:
+            self.db[refs_key] = str(refs)
+            return
+        del self.db[refs_key]
+        del self.db[f"blob_{body_hash}_data"]
 
     def _read_data(self, spider: Spider, request: Request) -> Optional[Dict[str, Any]]:
         key = self._fingerprinter.fingerprint(request).hex()
@@ -310,10 +756,19 @@ class DbmCacheStorage:
 
 
 class FilesystemCacheStorage:
+    #: Lookups can run in several threads at a time, see HTTPCACHE_READ_THREADS
+    concurrent_reads = True
+
     def __init__(self, settings: BaseSettings):
         self.cachedir: str = data_path(settings["HTTPCACHE_DIR"])
         self.expiration_secs: int = settings.getint("HTTPCACHE_EXPIRATION_SECS")
         self.use_gzip: bool = settings.getbool("HTTPCACHE_GZIP")
+        self.dedup_bodies: bool = settings.getbool("HTTPCACHE_DEDUP_BODIES")
+        self.use_zstd: bool = settings.getbool("HTTPCACHE_ZSTD")
+        if self.use_zstd and zstandard is None:
+            raise NotConfigured("HTTPCACHE_ZSTD requires the zstandard package")
+        self.settings: BaseSettings = settings
+        self._zstd: Optional[_ZstdCodec] = None
         # https://github.com/python/mypy/issues/10740
         self._open: Callable[Concatenate[Union[str, os.PathLike], str, ...], IO] = (
             gzip.open if self.use_gzip else open  # type: ignore[assignment]
@@ -328,9 +783,20 @@ class FilesystemCacheStorage:
 
         assert spider.crawler.request_fingerprinter
         self._fingerprinter = spider.crawler.request_fingerprinter
+        self._stats: Optional[StatsCollector] = spider.crawler.stats
+
+        self._expiration_index: _ExpirationIndex = self._get_expiration_index(
+            spider.name
+        )
+        if zstandard is not None:  # also to read entries stored with zstd
+            self._zstd = _ZstdCodec(
+                Path(self.cachedir, spider.name, "dictionaries"),
+                self.settings,
+                self._stats,
+            )
 
     def close_spider(self, spider: Spider) -> None:
-        pass
+        self._expiration_index.close()
 
     def retrieve_response(self, spider: Spider, request: Request) -> Optional[Response]:
         """Return response if present in cache, or None otherwise."""
@@ -340,6 +806,9 @@ class FilesystemCacheStorage:
         rpath = Path(self._get_request_path(spider, request))
         with self._open(rpath / "response_body", "rb") as f:
             body = f.read()
+        if metadata.get("body_encoding") == "zstd":
+            assert self._zstd is not None
+            body = self._zstd.decompress(body)
         with self._open(rpath / "response_headers", "rb") as f:
             rawheaders = f.read()
         url = metadata["response_url"]
@@ -354,8 +823,11 @@ class FilesystemCacheStorage:
     ) -> None:
         """Store the given response in the cache."""
         rpath = Path(self._get_request_path(spider, request))
+        old_metadata = None
         if not rpath.exists():
             rpath.mkdir(parents=True)
+        elif self.dedup_bodies:
+            old_metadata = self._read_meta(spider, request, check_expiration=False)
         metadata = {
             "url": request.url,
             "method": request.method,
@@ -363,35 +835,587 @@ class FilesystemCacheStorage:
             "response_url": response.url,
             "timestamp": time(),
         }
+        body = response.body
+        if self.use_zstd:
+            assert self._zstd is not None
+            body = self._zstd.compress(body, spider.name, response.url)
+            metadata["body_encoding"] = "zstd"
+        if self.dedup_bodies:
+            metadata["body_hash"] = _body_hash(
+                response.body, metadata.get("body_encoding")
+            )
         with self._open(rpath / "meta", "wb") as f:
             f.write(to_bytes(repr(metadata)))
         with self._open(rpath / "pickled_meta", "wb") as f:
             pickle.dump(metadata, f, protocol=4)
         with self._open(rpath / "response_headers", "wb") as f:
             f.write(headers_dict_to_raw(response.headers))
-        with self._open(rpath / "response_body", "wb") as f:
-            f.write(response.body)
+        if self.dedup_bodies:
+            self._link_blob(spider.name, metadata["body_hash"], body, rpath)
+            if old_metadata is not None and "body_hash" in old_metadata:
+                self._collect_blob(spider.name, old_metadata["body_hash"])
+        else:
+            (rpath / "response_body").unlink(missing_ok=True)
+            with self._open(rpath / "response_body", "wb") as f:
+                f.write(body)
         with self._open(rpath / "request_headers", "wb") as f:
             f.write(headers_dict_to_raw(request.headers))
         with self._open(rpath / "request_body", "wb") as f:
             f.write(request.body)
+        self._expiration_index.add(rpath.name, metadata["timestamp"])
+
+    def prune(self, spider_name: str, max_age: float) -> int:
+        """Remove the entries of the *spider_name* cache stored more than
+        *max_age* seconds ago, and return how many were removed."""
+        count = 0
+        index = self._get_expiration_index(spider_name)
+        for key, timestamp in index.pop_expired(time() - max_age):
+            rpath = Path(self.cachedir, spider_name, key[0:2], key)
+            try:
+                with self._open(rpath / "pickled_meta", "rb") as f:
+                    metadata = pickle.load(f)  # nosec
+            except FileNotFoundError:
+                continue  # removed since
+            if metadata["timestamp"] > timestamp:
+                continue  # stored again since
+            shutil.rmtree(rpath)
+            if "body_hash" in metadata:
+                self._collect_blob(spider_name, metadata["body_hash"])
+            count += 1
+        return count
+
+    def compact(self, spider_name: str) -> None:
+        """Remove the empty directories left by removed entries."""
+        spider_path = Path(self.cachedir, spider_name)
+        if not spider_path.is_dir():
+            return
+        for path in spider_path.iterdir():
+            if path.is_dir() and not any(path.iterdir()):
+                path.rmdir()
+
+    def info(self, spider_name: str) -> Dict[str, int]:
+        """Return the number of entries and the size in bytes of the
+        *spider_name* cache."""
+        entries = size = 0
+        seen_inodes = set()
+        for path in Path(self.cachedir, spider_name).rglob("*"):
+            if path.name == "pickled_meta":
+                entries += 1
+            stat = path.lstat()
+            if path.is_file() and stat.st_ino not in seen_inodes:
+                # Hard links to deduplicated bodies are counted once
+                seen_inodes.add(stat.st_ino)
+                size += stat.st_size
+        return {"entries": entries, "bytes": size}
+
+    def _get_expiration_index(self, spider_name: str) -> _ExpirationIndex:
+        return _ExpirationIndex(Path(self.cachedir, spider_name, "expiration"))
 
     def _get_request_path(self, spider: Spider, request: Request) -> str:
         key = self._fingerprinter.fingerprint(request).hex()
         return str(Path(self.cachedir, spider.name, key[0:2], key))
 
-    def _read_meta(self, spider: Spider, request: Request) -> Optional[Dict[str, Any]]:
+    def _get_blob_path(self, spider_name: str, body_hash: str) -> Path:
+        return Path(self.cachedir, spider_name, "blobs", body_hash[0:2], body_hash)
+
+    def _link_blob(
+        self, spider_name: str, body_hash: str, body: bytes, rpath: Path
+    ) -> None:
+        """Make the ``response_body`` file of *rpath* a hard link to the blob
+        of *body*, storing the blob if needed.
+
+        The link count of blobs is their reference count.
+        """
+        blob_path = self._get_blob_path(spider_name, body_hash)
+        stored_size = 0
+        if not blob_path.exists():
+            blob_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = blob_path.with_name(f"{body_hash}.tmp")
+            with self._open(tmp_path, "wb") as f:
+                f.write(body)
+            tmp_path.replace(blob_path)
+            stored_size = len(body)
+        body_path = rpath / "response_body"
+        body_path.unlink(missing_ok=True)
+        os.link(blob_path, body_path)
+        _record_dedup_stats(self._stats, len(body), stored_size)
+
+    def _collect_blob(self, spider_name: str, body_hash: str) -> None:
+        """Delete the blob with the given hash if no response links to it
+        anymore."""
+        blob_path = self._get_blob_path(spider_name, body_hash)
+        try:
+            if blob_path.stat().st_nlink == 1:
+                blob_path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def _read_meta(
+        self, spider: Spider, request: Request, check_expiration: bool = True
+    ) -> Optional[Dict[str, Any]]:
         rpath = Path(self._get_request_path(spider, request))
         metapath = rpath / "pickled_meta"
         if not metapath.exists():
             return None  # not found
         mtime = metapath.stat().st_mtime
-        if 0 < self.expiration_secs < time() - mtime:
+        if check_expiration and 0 < self.expiration_secs < time() - mtime:
             return None  # expired
         with self._open(metapath, "rb") as f:
             return cast(Dict[str, Any], pickle.load(f))  # nosec
 
 
+class PackedCacheStorage:
+    """Cache storage that appends responses to large segment files, and keeps
+    an append-only index of their location by request fingerprint.
+
+    Index entries with a length of 0 are tombstones, which remove the entry of
+    their fingerprint if it is not newer than their timestamp.
+    """
+
+    #: Prefix of the records of segment files
+    RECORD_HEADER = struct.Struct("<4sBHIIQ")
+    RECORD_MAGIC = b"SPK1"
+    #: Prefix of the entries of the index file, followed by the fingerprint
+    INDEX_ENTRY = struct.Struct("<IQQdB")
+
+    _FLAG_ZSTD = 1
+
+    concurrent_reads = True
+
+    def __init__(self, settings: BaseSettings):
+        self.cachedir: str = data_path(settings["HTTPCACHE_DIR"], createdir=True)
+        self.expiration_secs: int = settings.getint("HTTPCACHE_EXPIRATION_SECS")
+        self.segment_size: int = settings.getint("HTTPCACHE_PACKED_SEGMENT_SIZE")
+        self.use_zstd: bool = settings.getbool("HTTPCACHE_ZSTD")
+        if self.use_zstd and zstandard is None:
+            raise NotConfigured("HTTPCACHE_ZSTD requires the zstandard package")
+        self.settings: BaseSettings = settings
+        self._zstd: Optional[_ZstdCodec] = None
+        # fingerprint -> (segment, offset, length, timestamp)
+        self._index: Dict[bytes, Tuple[int, int, int, float]] = {}
+        self._maps: Dict[int, mmap.mmap] = {}
+        # Number of reads in progress by mapping ID, so that mappings replaced
+        # while other threads read them are closed after those reads
+        self._map_readers: Dict[int, int] = {}
+        self._maps_lock: threading.Lock = threading.Lock()
+        self._index_file: Optional[IO[bytes]] = None
+        self._segment_file: Optional[IO[bytes]] = None
+        self._segment: int = 0
+        self._expiration_index: Optional[_ExpirationIndex] = None
+
+    def open_spider(self, spider: Spider) -> None:
+        self._set_path(spider.name)
+        self._path.mkdir(exist_ok=True)
+        self._load_index()
+        self._index_file = (self._path / "index").open("ab")
+        self._segment = self._last_segment()
+        self._segment_file = self._segment_path(self._segment).open("ab")
+        self._expiration_index = _ExpirationIndex(self._path / "expiration")
+        if zstandard is not None:  # also to read entries stored with zstd
+            self._zstd = _ZstdCodec(
+                self._path / "dictionaries", self.settings, spider.crawler.stats
+            )
+
+        logger.debug(
+            "Using packed cache storage in %(cachepath)s",
+            {"cachepath": self._path},
+            extra={"spider": spider},
+        )
+
+        assert spider.crawler.request_fingerprinter
+        self._fingerprinter: RequestFingerprinter = spider.crawler.request_fingerprinter
+
+    def close_spider(self, spider: Spider) -> None:
+        for mapping in self._maps.values():
+            mapping.close()
+        self._maps.clear()
+        if self._segment_file is not None:
+            self._segment_file.close()
+        if self._index_file is not None:
+            self._index_file.close()
+        if self._expiration_index is not None:
+            self._expiration_index.close()
+
+    def retrieve_response(self, spider: Spider, request: Request) -> Optional[Response]:
+        key = self._fingerprinter.fingerprint(request)
+        entry = self._index.get(key)
+        if entry is None:
+            return None  # not found
+        segment, offset, length, timestamp = entry
+        if 0 < self.expiration_secs < time() - timestamp:
+            return None  # expired
+        url, status, rawheaders, body = self._read_record(segment, offset, length)
+        headers = Headers(headers_raw_to_dict(rawheaders))
+        respcls = responsetypes.from_args(headers=headers, url=url, body=body)
+        return respcls(url=url, headers=headers, status=status, body=body)
+
+    def store_response(
+        self, spider: Spider, request: Request, response: Response
+    ) -> None:
+        assert self._segment_file is not None and self._index_file is not None
+        url = to_bytes(response.url)
+        rawheaders = headers_dict_to_raw(response.headers) or b""
+        flags = 0
+        payload: bytes = b"".join((url, rawheaders, response.body))
+        if self.use_zstd:
+            flags |= self._FLAG_ZSTD
+            assert self._zstd is not None
+            payload = self._zstd.compress(payload, spider.name, response.url)
+        header = self.RECORD_HEADER.pack(
+            self.RECORD_MAGIC,
+            flags,
+            response.status,
+            len(url),
+            len(rawheaders),
+            len(response.body),
+        )
+        if self._segment_file.tell() >= self.segment_size:
+            self._segment_file.close()
+            self._segment += 1
+            self._segment_file = self._segment_path(self._segment).open("ab")
+        offset = self._segment_file.tell()
+        self._segment_file.write(header + payload)
+        self._segment_file.flush()
+        key = self._fingerprinter.fingerprint(request)
+        entry = (self._segment, offset, len(header) + len(payload), time())
+        self._index_file.write(
+            self.INDEX_ENTRY.pack(*entry, len(key)) + key,
+        )
+        self._index_file.flush()
+        self._index[key] = entry
+        assert self._expiration_index is not None
+        self._expiration_index.add(key.hex(), entry[3])
+
+    def prune(self, spider_name: str, max_age: float) -> int:
+        """Remove the entries of the *spider_name* cache stored more than
+        *max_age* seconds ago, and return how many were removed.
+
+        The space of their records is only reclaimed by :meth:`compact`.
+        """
+        self._set_path(spider_name)
+        if not self._path.is_dir():
+            return 0
+        self._load_index()
+        count = 0
+        index = _ExpirationIndex(self._path / "expiration")
+        with (self._path / "index").open("ab") as index_file:
+            for key, timestamp in index.pop_expired(time() - max_age):
+                fingerprint = bytes.fromhex(key)
+                entry = self._index.get(fingerprint)
+                if entry is None or entry[3] > timestamp:
+                    continue  # removed or stored again since
+                del self._index[fingerprint]
+                index_file.write(
+                    self.INDEX_ENTRY.pack(0, 0, 0, timestamp, len(fingerprint))
+                    + fingerprint
+                )
+                count += 1
+        return count
+
+    def compact(self, spider_name: str) -> None:
+        """Copy the records of the *spider_name* cache that are still
+        indexed to new segments, and remove the old segments."""
+        self._set_path(spider_name)
+        if not self._path.is_dir():
+            return
+        self._load_index()
+        old_segments = list(self._path.glob("segment-*"))
+        self._segment = self._last_segment() + 1
+        segment_file = self._segment_path(self._segment).open("wb")
+        index_path = self._path / "index"
+        tmp_path = self._path / "index.tmp"
+        try:
+            with tmp_path.open("wb") as index_file:
+                for key, (segment, offset, length, timestamp) in list(
+                    self._index.items()
+                ):
+                    if segment_file.tell() >= self.segment_size:
+                        segment_file.close()
+                        self._segment += 1
+                        segment_file = self._segment_path(self._segment).open("wb")
+                    new_offset = segment_file.tell()
+                    with self._map(segment, offset + length) as mapping:
+                        segment_file.write(mapping[offset : offset + length])
+                    entry = (self._segment, new_offset, length, timestamp)
+                    index_file.write(self.INDEX_ENTRY.pack(*entry, len(key)) + key)
+                    self._index[key] = entry
+        finally:
+            segment_file.close()
+            for mapping in self._maps.values():
+                mapping.close()
+            self._maps.clear()
+        tmp_path.replace(index_path)
+        for path in old_segments:
+            path.unlink()
+
+    def info(self, spider_name: str) -> Dict[str, int]:
+        """Return the number of entries and the size in bytes of the
+        *spider_name* cache."""
+        self._set_path(spider_name)
+        if not self._path.is_dir():
+            return {"entries": 0, "bytes": 0}
+        self._load_index()
+        size = sum(path.stat().st_size for path in self._path.iterdir())
+        return {"entries": len(self._index), "bytes": size}
+
+    def _set_path(self, spider_name: str) -> None:
+        self._path = Path(self.cachedir, f"{spider_name}.packed")
+
+    def _last_segment(self) -> int:
+        return max(
+            (int(p.name.split("-")[1]) for p in self._path.glob("segment-*")),
+            default=0,
+        )
+
+    def _segment_path(self, segment: int) -> Path:
+        return self._path / f"segment-{segment:06d}"
+
+    def _load_index(self) -> None:
+        self._index.clear()
+        index_path = self._path / "index"
+        if not index_path.exists():
+            return
+        data = index_path.read_bytes()
+        position = 0
+        size = self.INDEX_ENTRY.size
+        while position + size <= len(data):
+            *entry, key_length = self.INDEX_ENTRY.unpack_from(data, position)
+            position += size
+            if position + key_length > len(data):
+                break  # truncated by an interrupted write
+            key = data[position : position + key_length]
+            position += key_length
+            segment, offset, length, timestamp = entry
+            if length == 0:
+                if key in self._index and self._index[key][3] <= timestamp:
+                    del self._index[key]
+                continue
+            self._index[key] = (segment, offset, length, timestamp)
+
+    @contextmanager
+    def _map(self, segment: int, end: int) -> Iterator[mmap.mmap]:
+        """Return a mapping of *segment* of at least *end* bytes, which is
+        kept open until the block ends."""
+        with self._maps_lock:
+            mapping = self._maps.get(segment)
+            if mapping is None or len(mapping) < end:
+                # The current segment grows as responses are stored
+                if mapping is not None and id(mapping) not in self._map_readers:
+                    mapping.close()
+                with self._segment_path(segment).open("rb") as f:
+                    mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps[segment] = mapping
+            self._map_readers[id(mapping)] = self._map_readers.get(id(mapping), 0) + 1
+        try:
+            yield mapping
+        finally:
+            with self._maps_lock:
+                readers = self._map_readers.pop(id(mapping)) - 1
+                if readers:
+                    self._map_readers[id(mapping)] = readers
+                elif self._maps.get(segment) is not mapping:
+                    mapping.close()  # replaced while being read
+
+    def _read_record(
+        self, segment: int, offset: int, length: int
+    ) -> Tuple[str, int, bytes, bytes]:
+        with self._map(segment, offset + length) as mapping:
+            magic, flags, status, url_length, headers_length, body_length = (
+                self.RECORD_HEADER.unpack_from(mapping, offset)
+            )
+            if magic != self.RECORD_MAGIC:
+                raise ValueError(
+                    f"Invalid record at offset {offset} of "
+                    f"{self._segment_path(segment)}"
+                )
+            start, end = offset + self.RECORD_HEADER.size, offset + length
+            if flags & self._FLAG_ZSTD:
+                with memoryview(mapping)[start:end] as compressed:
+                    assert self._zstd is not None
+                    payload = memoryview(self._zstd.decompress(compressed))
+            else:
+                # Slices of the mapping are read from the page cache without
+                # intermediate copies
+                payload = memoryview(mapping)[start:end]
+            with payload:
+                url = to_unicode(payload[:url_length].tobytes())
+                rawheaders = payload[url_length : url_length + headers_length].tobytes()
+                body = payload[url_length + headers_length :].tobytes()
+        if len(body) != body_length:
+            raise ValueError(
+                f"Truncated record at offset {offset} of {self._segment_path(segment)}"
+            )
+        return url, status, rawheaders, body
+
+
+class WarcCacheStorage:
+    """Cache storage that writes responses, and the requests that got them,
+    to WARC files, with a gzip member per record, and keeps a CDX index of
+    the response records by request fingerprint."""
+
+    concurrent_reads = True
+
+    def __init__(self, settings: BaseSettings):
+        self.cachedir: str = data_path(settings["HTTPCACHE_DIR"], createdir=True)
+        self.expiration_secs: int = settings.getint("HTTPCACHE_EXPIRATION_SECS")
+        self.file_size: int = settings.getint("HTTPCACHE_WARC_FILE_SIZE")
+        # fingerprint -> CDX entry of the last response stored
+        self._index: Dict[str, CdxEntry] = {}
+        self._index_file: Optional[IO[str]] = None
+        self._warc_file: Optional[IO[bytes]] = None
+        # Files are read from a file object per thread, since reads seek
+        self._local: threading.local = threading.local()
+        self._readers: List[IO[bytes]] = []
+        self._readers_lock: threading.Lock = threading.Lock()
+
+    def open_spider(self, spider: Spider) -> None:
+        self._path = Path(self.cachedir, f"{spider.name}.warc")
+        self._path.mkdir(exist_ok=True)
+        self._prefix = spider.name
+        index_path = self._path / "index.cdx"
+        self._load_index(index_path)
+        self._index_file = index_path.open("a", encoding="utf-8")
+        if not self._index_file.tell():
+            self._index_file.write(CDX_HEADER)
+        self._number = max(
+            (
+                int(p.name[: -len(".warc.gz")].rsplit("-", 1)[1])
+                for p in self._path.glob(f"{self._prefix}-*.warc.gz")
+            ),
+            default=0,
+        )
+        self._open_warc_file()
+
+        logger.debug(
+            "Using WARC cache storage in %(cachepath)s",
+            {"cachepath": self._path},
+            extra={"spider": spider},
+        )
+
+        assert spider.crawler.request_fingerprinter
+        self._fingerprinter: RequestFingerprinter = spider.crawler.request_fingerprinter
+
+    def close_spider(self, spider: Spider) -> None:
+        for reader in self._readers:
+            reader.close()
+        self._readers.clear()
+        self._local = threading.local()
+        if self._warc_file is not None:
+            self._warc_file.close()
+        if self._index_file is not None:
+            self._index_file.close()
+
+    def retrieve_response(self, spider: Spider, request: Request) -> Optional[Response]:
+        entry = self._index.get(self._fingerprinter.fingerprint(request).hex())
+        if entry is None:
+            return None  # not found
+        timestamp = parse_cdx_timestamp(entry.timestamp)
+        if 0 < self.expiration_secs < time() - timestamp:
+            return None  # expired
+        readers = getattr(self._local, "readers", None)
+        if readers is None:
+            readers = self._local.readers = {}
+        reader = readers.get(entry.filename)
+        if reader is None:
+            reader = readers[entry.filename] = (self._path / entry.filename).open("rb")
+            with self._readers_lock:
+                self._readers.append(reader)
+        record = read_record(reader, entry.offset, entry.length)
+        status, rawheaders, body = parse_response_block(record.block)
+        url = entry.url
+        headers = Headers(headers_raw_to_dict(rawheaders))
+        respcls = responsetypes.from_args(headers=headers, url=url, body=body)
+        return respcls(url=url, headers=headers, status=status, body=body)
+
+    def store_response(
+        self, spider: Spider, request: Request, response: Response
+    ) -> None:
+        assert self._warc_file is not None and self._index_file is not None
+        if self._warc_file.tell() >= self.file_size:
+            self._warc_file.close()
+            self._number += 1
+            self._open_warc_file()
+        now = time()
+        response_id = record_id()
+        block, payload = response_block(response)
+        digest = payload_digest(payload)
+        offset, length = write_record(
+            self._warc_file,
+            "response",
+            [
+                ("WARC-Record-ID", response_id),
+                ("WARC-Date", warc_date(now)),
+                ("WARC-Target-URI", response.url),
+                ("WARC-Payload-Digest", digest),
+                ("Content-Type", "application/http; msgtype=response"),
+            ],
+            block,
+        )
+        write_record(
+            self._warc_file,
+            "request",
+            [
+                ("WARC-Record-ID", record_id()),
+                ("WARC-Date", warc_date(now)),
+                ("WARC-Target-URI", request.url),
+                ("WARC-Concurrent-To", response_id),
+                ("Content-Type", "application/http; msgtype=request"),
+            ],
+            request_httprepr(request),
+        )
+        self._warc_file.flush()
+        entry = CdxEntry(
+            key=self._fingerprinter.fingerprint(request).hex(),
+            timestamp=cdx_timestamp(now),
+            url=response.url,
+            status=response.status,
+            length=length,
+            offset=offset,
+            filename=self._warc_filename(),
+        )
+        mimetype = to_unicode(response.headers.get(b"Content-Type") or b"")
+        mimetype = mimetype.partition(";")[0].replace(" ", "")
+        self._index_file.write(format_cdx_entry(entry, mimetype, digest))
+        self._index_file.flush()
+        self._index[entry.key] = entry
+
+    def _warc_filename(self) -> str:
+        return f"{self._prefix}-{self._number:05d}.warc.gz"
+
+    def _open_warc_file(self) -> None:
+        filename = self._warc_filename()
+        self._warc_file = (self._path / filename).open("ab")
+        if self._warc_file.tell():
+            return
+        write_record(
+            self._warc_file,
+            "warcinfo",
+            [
+                ("WARC-Record-ID", record_id()),
+                ("WARC-Date", warc_date(time())),
+                ("WARC-Filename", filename),
+                ("Content-Type", "application/warc-fields"),
+            ],
+            to_bytes(
+                f"software: Scrapy/{scrapy.__version__}\r\n"
+                f"format: WARC File Format 1.1\r\n"
+            ),
+        )
+        self._warc_file.flush()
+
+    def _load_index(self, index_path: Path) -> None:
+        self._index.clear()
+        if not index_path.exists():
+            return
+        with index_path.open(encoding="utf-8") as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break  # truncated by an interrupted write
+                entry = parse_cdx_line(line)
+                if entry is not None:
+                    self._index[entry.key] = entry
+
+
 def parse_cachecontrol(header: bytes) -> Dict[bytes, Optional[bytes]]:
     """Parse Cache-Control header
 
@@ -43,11 +43,17 @@ class Headers(CaselessDict):
     def update(  # type: ignore[override]
         self, seq: Union[Mapping[AnyStr, Any], Iterable[Tuple[AnyStr, Any]]]
     ) -> None:
-        seq = seq.items() if isinstance(seq, Mapping) else seq
-        iseq: Dict[bytes, List[bytes]] = {}
-        for k, v in seq:
-            iseq.setdefault(self.normkey(k), []).extend(self.normvalue(v))
-        super().update(iseq)
+        iseq: Dict[bytes, List[bytes]]
+        if type(seq) is Headers and type(self) is Headers:
+            # Keys and values are already normalized, only copy the lists.
+            iseq = {k: list(v) for k, v in dict.items(seq)}
+        else:
+            seq = seq.items() if isinstance(seq, Mapping) else seq
+            iseq = {}
+            for k, v in seq:
+                iseq.setdefault(self.normkey(k), []).extend(self.normvalue(v))
+        # Skip CaselessDict.update(), keys and values are normalized already.
+        dict.update(self, iseq)
 
     def normkey(self, key: AnyStr) -> bytes:  # type: ignore[override]
         """Normalize key to bytes"""
@@ -60,6 +60,8 @@ class Response(object_ref):
     Currently used by :meth:`Response.replace`.
     """
 
+    _body_decoder: Optional[Callable[[bytes], bytes]] = None
+
     def __init__(
         self,
         url: str,
@@ -116,6 +118,11 @@ class Response(object_ref):
 
     @property
     def body(self) -> bytes:
+        if self._body_decoder is not None:
+            # The body is stored encoded until it is first needed, see
+            # the COMPRESSION_LAZY setting.
+            self._body = self._body_decoder(self._body)
+            self._body_decoder = None
         return self._body
 
     def _set_body(self, body: Optional[bytes]) -> None:
@@ -139,10 +146,18 @@ class Response(object_ref):
 
     def replace(self, *args: Any, **kwargs: Any) -> Response:
         """Create a new Response with the same attributes except for those given new values"""
+        body_decoder = None
+        if "body" not in kwargs and self._body_decoder is not None:
+            # Keep the body encoded.
+            kwargs["body"] = self._body
+            body_decoder = self._body_decoder
         for x in self.attributes:
             kwargs.setdefault(x, getattr(self, x))
         cls = kwargs.pop("cls", self.__class__)
-        return cast(Response, cls(*args, **kwargs))
+        response = cast(Response, cls(*args, **kwargs))
+        if body_decoder is not None:
+            response._body_decoder = body_decoder
+        return response
 
     def urljoin(self, url: str) -> str:
         """Join this Response's url with a possible relative url to form an
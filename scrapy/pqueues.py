@@ -177,7 +177,11 @@ class DownloaderInterface:
         self.downloader: Downloader = crawler.engine.downloader
 
     def stats(self, possible_slots: Iterable[str]) -> List[Tuple[int, str]]:
-        return [(self._active_downloads(slot), slot) for slot in possible_slots]
+        return [
+            (self._active_downloads(slot), slot)
+            for slot in possible_slots
+            if not self.downloader.slot_blocked(slot)
+        ]
 
     def get_slot_key(self, request: Request) -> str:
         return self.downloader.get_slot_key(request)
@@ -192,7 +196,8 @@ class DownloaderInterface:
 class DownloaderAwarePriorityQueue:
     """PriorityQueue which takes Downloader activity into account:
     domains (slots) with the least amount of active downloads are dequeued
-    first.
+    first, and requests of slots held back by their circuit breaker (see
+    DOWNLOAD_BREAKER_ENABLED) are not dequeued.
     """
 
     @classmethod
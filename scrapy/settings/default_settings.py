@@ -17,6 +17,16 @@ import sys
 from importlib import import_module
 from pathlib import Path
 
+ADAPTIVE_CONCURRENCY_DEBUG = False
+ADAPTIVE_CONCURRENCY_DECREASE_FACTOR = 0.5
+ADAPTIVE_CONCURRENCY_ENABLED = False
+ADAPTIVE_CONCURRENCY_HTTP_CODES = [429, 503]
+ADAPTIVE_CONCURRENCY_INCREASE = 1
+ADAPTIVE_CONCURRENCY_LATENCY_TOLERANCE = 2.0
+ADAPTIVE_CONCURRENCY_MAX = 0
+ADAPTIVE_CONCURRENCY_MIN = 1
+ADAPTIVE_CONCURRENCY_WINDOW = 20
+
 ADDONS = {}
 
 AJAXCRAWL_ENABLED = False
@@ -39,6 +49,8 @@ CLOSESPIDER_ERRORCOUNT = 0
 COMMANDS_MODULE = ""
 
 COMPRESSION_ENABLED = True
+COMPRESSION_LAZY = False
+COMPRESSION_STREAMING = False
 
 CONCURRENT_ITEMS = 100
 
@@ -65,8 +77,21 @@ DNSCACHE_SIZE = 10000
 DNS_RESOLVER = "scrapy.resolver.CachingThreadedResolver"
 DNS_TIMEOUT = 60
 
+DOWNLOAD_BANDWIDTH = 0
+DOWNLOAD_BANDWIDTH_PER_SLOT = 0
+
+DOWNLOAD_BREAKER_ENABLED = False
+DOWNLOAD_BREAKER_COOLDOWN = 60
+DOWNLOAD_BREAKER_FAILURES = 5
+
 DOWNLOAD_DELAY = 0
 
+DOWNLOAD_REQUESTS_PER_SECOND = 0
+
+DOWNLOAD_HEDGE_ENABLED = False
+DOWNLOAD_HEDGE_BUDGET = 0.05
+DOWNLOAD_HEDGE_PERCENTILE = 95
+
 DOWNLOAD_HANDLERS = {}
 DOWNLOAD_HANDLERS_BASE = {
     "data": "scrapy.core.downloader.handlers.datauri.DataURIDownloadHandler",
@@ -78,6 +103,15 @@ DOWNLOAD_HANDLERS_BASE = {
 }
 
 DOWNLOAD_TIMEOUT = 180  # 3mins
+DOWNLOAD_TIMEOUT_ADAPTIVE = False
+DOWNLOAD_TIMEOUT_ADAPTIVE_FACTOR = 4
+DOWNLOAD_TIMEOUT_ADAPTIVE_MIN = 10
+DOWNLOAD_TIMEOUT_ADAPTIVE_PERCENTILE = 99
+
+DOWNLOAD_CONNECT_TIMEOUT = 0
+
+DOWNLOAD_SLOW_REQUEST_THRESHOLD = 0
+DOWNLOAD_TIMINGS_STATS = False
 
 DOWNLOAD_MAXSIZE = 1024 * 1024 * 1024  # 1024m
 DOWNLOAD_WARNSIZE = 32 * 1024 * 1024  # 32m
@@ -95,6 +129,7 @@ DOWNLOADER_CLIENTCONTEXTFACTORY = (
 DOWNLOADER_CLIENT_TLS_CIPHERS = "DEFAULT"
 # Use highest TLS/SSL protocol version supported by the platform, also allowing negotiation:
 DOWNLOADER_CLIENT_TLS_METHOD = "TLS"
+DOWNLOADER_CLIENT_TLS_SESSION_CACHE_SIZE = 1000
 DOWNLOADER_CLIENT_TLS_VERBOSE_LOGGING = False
 
 DOWNLOADER_MIDDLEWARES = {}
@@ -110,6 +145,7 @@ DOWNLOADER_MIDDLEWARES_BASE = {
     "scrapy.downloadermiddlewares.retry.RetryMiddleware": 550,
     "scrapy.downloadermiddlewares.ajaxcrawl.AjaxCrawlMiddleware": 560,
     "scrapy.downloadermiddlewares.redirect.MetaRefreshMiddleware": 580,
+    "scrapy.downloadermiddlewares.recrawl.RecrawlMiddleware": 585,
     "scrapy.downloadermiddlewares.httpcompression.HttpCompressionMiddleware": 590,
     "scrapy.downloadermiddlewares.redirect.RedirectMiddleware": 600,
     "scrapy.downloadermiddlewares.cookies.CookiesMiddleware": 700,
@@ -139,6 +175,7 @@ EXTENSIONS_BASE = {
     "scrapy.extensions.logstats.LogStats": 0,
     "scrapy.extensions.spiderstate.SpiderState": 0,
     "scrapy.extensions.throttle.AutoThrottle": 0,
+    "scrapy.extensions.concurrency.AdaptiveConcurrency": 0,
 }
 
 FEED_TEMPDIR = None
@@ -183,6 +220,10 @@ FTP_PASSIVE_MODE = True
 
 GCS_PROJECT_ID = None
 
+H2_CONNECTION_WINDOW_SIZE = 65535
+H2_INITIAL_WINDOW_SIZE = 65535
+H2_MAX_CONNECTIONS_PER_HOST = 1
+
 HTTPCACHE_ENABLED = False
 HTTPCACHE_DIR = "httpcache"
 HTTPCACHE_IGNORE_MISSING = False
@@ -195,6 +236,22 @@ HTTPCACHE_IGNORE_RESPONSE_CACHE_CONTROLS = []
 HTTPCACHE_DBM_MODULE = "dbm"
 HTTPCACHE_POLICY = "scrapy.extensions.httpcache.DummyPolicy"
 HTTPCACHE_GZIP = False
+HTTPCACHE_DEDUP_BODIES = False
+HTTPCACHE_ZSTD = False
+HTTPCACHE_ZSTD_LEVEL = 3
+HTTPCACHE_ZSTD_DICTIONARY = None
+HTTPCACHE_ZSTD_DICTIONARY_SAMPLES = 1000
+HTTPCACHE_ZSTD_DICTIONARY_SIZE = 112640  # 110k
+HTTPCACHE_PACKED_SEGMENT_SIZE = 1024 * 1024 * 1024  # 1024m
+HTTPCACHE_WARC_FILE_SIZE = 1024 * 1024 * 1024  # 1024m
+HTTPCACHE_WRITE_BEHIND = False
+HTTPCACHE_WRITE_QUEUE_SIZE = 1000
+HTTPCACHE_WRITE_BATCH_SIZE = 100
+HTTPCACHE_READ_THREADS = 0
+HTTPCACHE_MEMORY_SIZE = 0
+HTTPCACHE_STALE_WHILE_REVALIDATE = False
+HTTPCACHE_MAX_STALENESS = 86400
+HTTPCACHE_REVALIDATE_PRIORITY_ADJUST = -100
 
 HTTPPROXY_ENABLED = True
 HTTPPROXY_AUTH_ENCODING = "latin-1"
@@ -253,6 +310,11 @@ RANDOMIZE_DOWNLOAD_DELAY = True
 
 REACTOR_THREADPOOL_MAXSIZE = 10
 
+RECRAWL_ENABLED = False
+RECRAWL_DIR = "recrawl"
+RECRAWL_DBM_MODULE = "dbm"
+RECRAWL_DROP_UNCHANGED = True
+
 REDIRECT_ENABLED = True
 REDIRECT_MAX_TIMES = 20  # uses Firefox default setting
 REDIRECT_PRIORITY_ADJUST = +2
@@ -321,6 +383,8 @@ URLLENGTH_LIMIT = 2083
 
 USER_AGENT = f'Scrapy/{import_module("scrapy").__version__} (+https://scrapy.org)'
 
+WARC_REPLAY_PATHS = []
+
 TELNETCONSOLE_ENABLED = 1
 TELNETCONSOLE_PORT = [6023, 6073]
 TELNETCONSOLE_HOST = "127.0.0.1"
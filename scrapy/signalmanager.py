@@ -1,4 +1,4 @@
-from typing import Any, List, Tuple
+from typing import Any, Dict, List, Tuple
 
 from pydispatch import dispatcher
 from twisted.internet.defer import Deferred
@@ -9,6 +9,7 @@ from scrapy.utils import signal as _signal
 class SignalManager:
     def __init__(self, sender: Any = dispatcher.Anonymous):
         self.sender: Any = sender
+        self._receivers: Dict[Any, _signal._CachedReceivers] = {}
 
     def connect(self, receiver: Any, signal: Any, **kwargs: Any) -> None:
         """
@@ -43,8 +44,19 @@ class SignalManager:
         The keyword arguments are passed to the signal handlers (connected
         through the :meth:`connect` method).
         """
-        kwargs.setdefault("sender", self.sender)
-        return _signal.send_catch_log(signal, **kwargs)
+        sender = kwargs.pop("sender", self.sender)
+        if sender is not self.sender:
+            return _signal.send_catch_log(signal, sender, **kwargs)
+        try:
+            receivers = self._receivers[signal]
+        except KeyError:
+            receivers = self._receivers[signal] = _signal._CachedReceivers(
+                sender, signal
+            )
+        live_receivers = receivers.get()
+        if not live_receivers:
+            return []
+        return _signal._send_catch_log(live_receivers, signal, sender, **kwargs)
 
     def send_catch_log_deferred(self, signal: Any, **kwargs: Any) -> Deferred:
         """
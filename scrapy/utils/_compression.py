@@ -1,5 +1,6 @@
 import zlib
 from io import BytesIO
+from typing import List, Optional
 from warnings import warn
 
 from scrapy.exceptions import ScrapyDeprecationWarning
@@ -124,3 +125,204 @@ def _unzstd(data: bytes, *, max_size: int = 0) -> bytes:
         output_stream.write(output_chunk)
     output_stream.seek(0)
     return output_stream.read()
+
+
+def _check_max_size(decompressed_size: int, max_size: int) -> None:
+    if max_size and decompressed_size > max_size:
+        raise _DecompressionMaxSizeExceeded(
+            f"The number of bytes decompressed so far "
+            f"({decompressed_size} B) exceed the specified maximum "
+            f"({max_size} B)."
+        )
+
+
+class _GzipDecompressor:
+    """Incremental counterpart of :func:`scrapy.utils.gz.gunzip`.
+
+    Like ``gunzip``, it supports concatenated gzip members and, once some
+    data has been decompressed, it ignores trailing garbage and CRC errors.
+
+    Like the other incremental decompressors below, :meth:`decompress`
+    returns at most *max_length* bytes, if not 0, and keeps the rest of the
+    input; it must be called again, with or without new data, until it
+    returns nothing.
+    """
+
+    def __init__(self) -> None:
+        self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self._decompressed_size = 0
+        self._failed = False
+
+    def decompress(self, data: bytes, max_length: int = 0) -> bytes:
+        while not self._failed:
+            if self._decompressor.eof:
+                data = self._decompressor.unused_data + data
+                if not data:
+                    return b""
+                self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            else:
+                data = self._decompressor.unconsumed_tail + data
+            try:
+                chunk = self._decompressor.decompress(data, max_length)
+            except zlib.error:
+                if not self._decompressed_size:
+                    raise
+                self._failed = True
+                break
+            self._decompressed_size += len(chunk)
+            if chunk or not self._decompressor.eof:
+                return chunk
+            data = b""
+        return b""
+
+    def flush(self) -> bytes:
+        if self._failed:
+            return b""
+        return self._decompressor.flush()
+
+
+class _DeflateDecompressor:
+    """Incremental counterpart of :func:`_inflate`, including its fallback
+    to raw deflate data."""
+
+    def __init__(self) -> None:
+        self._decompressor = zlib.decompressobj()
+        self._head: Optional[bytes] = b""
+
+    def decompress(self, data: bytes, max_length: int = 0) -> bytes:
+        if self._head is None:
+            return self._decompressor.decompress(
+                self._decompressor.unconsumed_tail + data, max_length
+            )
+        # Wait until the zlib header can be checked.
+        self._head += data
+        if len(self._head) < 2:
+            return b""
+        data, self._head = self._head, None
+        try:
+            return self._decompressor.decompress(data, max_length)
+        except zlib.error:
+            # see _inflate
+            self._decompressor = zlib.decompressobj(wbits=-15)
+            return self._decompressor.decompress(data, max_length)
+
+    def flush(self) -> bytes:
+        if self._head:
+            return zlib.decompressobj(wbits=-15).decompress(self._head)
+        return self._decompressor.flush()
+
+
+class _SlicedDecompressor:
+    """Base class of incremental decompressors that cannot limit the size of
+    their output.
+
+    When *max_length* is not 0, they are fed slices of their input instead,
+    starting with a single byte, and the slice size is adjusted to the
+    compression ratio of the data, so that outputs stay close to
+    *max_length*. The output for a single byte is still unbounded in theory:
+    it is at most a block (128 KiB) for zstd, but brotli can expand a few
+    bytes into a whole meta-block (up to 16 MiB).
+    """
+
+    def __init__(self) -> None:
+        self._pending = bytearray()
+        self._slice_size = 1
+
+    def _process(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+    def decompress(self, data: bytes, max_length: int = 0) -> bytes:
+        self._pending += data
+        while self._pending:
+            size = self._slice_size if max_length else len(self._pending)
+            data = bytes(self._pending[:size])
+            del self._pending[:size]
+            output = self._process(data)
+            if max_length:
+                if len(output) > max_length:
+                    self._slice_size = max(
+                        1, self._slice_size * max_length // len(output)
+                    )
+                elif len(output) < max_length // 2:
+                    self._slice_size = min(self._slice_size * 2, _CHUNK_SIZE)
+            if output:
+                return output
+        return b""
+
+    def flush(self) -> bytes:
+        return b""
+
+
+class _BrotliDecompressor(_SlicedDecompressor):
+    def __init__(self) -> None:
+        super().__init__()
+        self._decompressor = brotli.Decompressor()
+
+    def _process(self, data: bytes) -> bytes:
+        return _brotli_decompress(self._decompressor, data)
+
+
+class _ZstdDecompressor(_SlicedDecompressor):
+    def __init__(self) -> None:
+        super().__init__()
+        self._decompressor = zstandard.ZstdDecompressor().decompressobj()
+
+    def _process(self, data: bytes) -> bytes:
+        return self._decompressor.decompress(data)
+
+
+_DECOMPRESSORS = {
+    b"gzip": _GzipDecompressor,
+    b"x-gzip": _GzipDecompressor,
+    b"deflate": _DeflateDecompressor,
+    b"br": _BrotliDecompressor,
+    b"zstd": _ZstdDecompressor,
+}
+
+
+class _StreamDecompressor:
+    """Decode data compressed with one or more content codings as it arrives.
+
+    *encodings* lists the content codings in the order in which they must be
+    decoded, i.e. in the reverse order of the ``Content-Encoding`` header.
+    Decoded data is returned as soon as it is available, and
+    :exc:`_DecompressionMaxSizeExceeded` is raised as soon as the decoded
+    size goes over *max_size*.
+    """
+
+    def __init__(self, encodings: List[bytes], *, max_size: int = 0):
+        self._decompressors = [_DECOMPRESSORS[encoding]() for encoding in encodings]
+        self._max_size = max_size
+        self.decompressed_size = 0
+
+    def _feed(self, index: int, data: bytes, output: List[bytes]) -> None:
+        """Decode *data* with the decompressors from *index* on, adding the
+        decoded data to *output*.
+
+        Decompressors return at most :data:`_CHUNK_SIZE` bytes at a time, so
+        that the size of the decoded data is checked before it goes much
+        over *max_size*, even if *data* expands a lot.
+        """
+        if index == len(self._decompressors):
+            self.decompressed_size += len(data)
+            _check_max_size(self.decompressed_size, self._max_size)
+            output.append(data)
+            return
+        decompressor = self._decompressors[index]
+        while True:
+            chunk = decompressor.decompress(data, _CHUNK_SIZE)
+            if not chunk:
+                return
+            data = b""
+            self._feed(index + 1, chunk, output)
+
+    def decompress(self, data: bytes) -> bytes:
+        output: List[bytes] = []
+        self._feed(0, data, output)
+        return b"".join(output)
+
+    def flush(self) -> bytes:
+        output: List[bytes] = []
+        for index, decompressor in enumerate(self._decompressors):
+            self._feed(index + 1, decompressor.flush(), output)
+        return b"".join(output)
@@ -3,16 +3,18 @@
 import collections.abc
 import logging
 from typing import Any as TypingAny
-from typing import List, Tuple
+from typing import Callable, FrozenSet, Iterable, List, Optional, Tuple
 
 from pydispatch.dispatcher import (
+    WEAKREF_TYPES,
     Anonymous,
     Any,
+    connections,
     disconnect,
     getAllReceivers,
     liveReceivers,
 )
-from pydispatch.robustapply import robustApply
+from pydispatch.robustapply import function, robustApply
 from twisted.internet.defer import Deferred, DeferredList
 from twisted.python.failure import Failure
 
@@ -32,6 +34,22 @@ def send_catch_log(
     """Like pydispatcher.robust.sendRobust but it also logs errors and returns
     Failures instead of exceptions.
     """
+    receivers = (
+        (receiver, robustApply)
+        for receiver in liveReceivers(getAllReceivers(sender, signal))
+    )
+    return _send_catch_log(receivers, signal, sender, *arguments, **named)
+
+
+def _send_catch_log(
+    receivers: Iterable[Tuple[TypingAny, Callable[..., TypingAny]]],
+    signal: TypingAny,
+    sender: TypingAny,
+    *arguments: TypingAny,
+    **named: TypingAny
+) -> List[Tuple[TypingAny, TypingAny]]:
+    """Implementation of :func:`send_catch_log` that sends the signal to the
+    given pairs of receiver and function used to call that receiver."""
     dont_log = named.pop("dont_log", ())
     dont_log = (
         tuple(dont_log)
@@ -41,10 +59,10 @@ def send_catch_log(
     dont_log += (StopDownload,)
     spider = named.get("spider", None)
     responses: List[Tuple[TypingAny, TypingAny]] = []
-    for receiver in liveReceivers(getAllReceivers(sender, signal)):
+    for receiver, apply in receivers:
         result: TypingAny
         try:
-            response = robustApply(
+            response = apply(
                 receiver, signal=signal, sender=sender, *arguments, **named
             )
             if isinstance(response, Deferred):
@@ -114,3 +132,90 @@ def disconnect_all(signal: TypingAny = Any, sender: TypingAny = Any) -> None:
     """
     for receiver in liveReceivers(getAllReceivers(sender, signal)):
         disconnect(receiver, signal=signal, sender=sender)
+
+
+class _KeywordApply:
+    """Equivalent of :func:`pydispatch.robustapply.robustApply` for a given
+    receiver, with the inspection of its signature done only once."""
+
+    def __init__(self, receiver: TypingAny):
+        _, code, start_index = function(receiver)
+        self._acceptable: Optional[FrozenSet[str]] = None
+        if not code.co_flags & 8:  # no **kwargs
+            self._acceptable = frozenset(
+                code.co_varnames[start_index : code.co_argcount]
+            )
+
+    def __call__(
+        self, receiver: TypingAny, *arguments: TypingAny, **named: TypingAny
+    ) -> TypingAny:
+        if arguments:
+            return robustApply(receiver, *arguments, **named)
+        acceptable = self._acceptable
+        if acceptable is None:
+            return receiver(**named)
+        return receiver(**{k: v for k, v in named.items() if k in acceptable})
+
+
+class _CachedReceivers:
+    """Receivers of a signal from a given sender, as returned by
+    :func:`pydispatch.dispatcher.getAllReceivers`, cached along with the way
+    to call each of them.
+
+    The cache is checked against the pydispatcher connection tables on every
+    :meth:`get` call, so it is invalidated by any connection or disconnection,
+    including those of receivers that get garbage-collected. Checking it is
+    much cheaper than building the receiver list and inspecting the signature
+    of every receiver, which is what each signal dispatch needs otherwise.
+    """
+
+    def __init__(self, sender: TypingAny, signal: TypingAny):
+        self._keys: Tuple[Tuple[int, TypingAny], ...] = (
+            (id(sender), signal),
+            (id(sender), Any),
+            (id(Any), signal),
+            (id(Any), Any),
+        )
+        self._sender: TypingAny = sender
+        self._signal: TypingAny = signal
+        self._tables: Optional[List[List[TypingAny]]] = None
+        self._receivers: List[Tuple[TypingAny, Callable[..., TypingAny]]] = []
+
+    def _current_tables(self) -> List[List[TypingAny]]:
+        tables = []
+        for sender_key, signal in self._keys:
+            try:
+                tables.append(connections[sender_key][signal])
+            except KeyError:
+                tables.append([])
+        return tables
+
+    def get(self) -> List[Tuple[TypingAny, Callable[..., TypingAny]]]:
+        """Return pairs of live receiver and function to call it with, to be
+        passed to :func:`_send_catch_log`."""
+        tables = self._current_tables()
+        if tables != self._tables:
+            self._tables = [list(table) for table in tables]
+            # Keep only references to receivers that pydispatcher keeps,
+            # usually weak references.
+            self._receivers = [
+                (receiver, self._apply(receiver))
+                for receiver in getAllReceivers(self._sender, self._signal)
+            ]
+        live_receivers = []
+        for receiver, apply in self._receivers:
+            if isinstance(receiver, WEAKREF_TYPES):
+                receiver = receiver()
+                if receiver is None:
+                    continue
+            live_receivers.append((receiver, apply))
+        return live_receivers
+
+    @staticmethod
+    def _apply(receiver: TypingAny) -> Callable[..., TypingAny]:
+        if isinstance(receiver, WEAKREF_TYPES):
+            receiver = receiver()
+        try:
+            return _KeywordApply(receiver)
+        except ValueError:  # unsupported receiver type
+            return robustApply
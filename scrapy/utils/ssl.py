@@ -57,6 +57,10 @@ def get_temp_key_info(ssl_object: Any) -> Optional[str]:
     return ", ".join(key_info)
 
 
+def is_session_reused(ssl_object: Any) -> bool:
+    return bool(pyOpenSSLutil.lib.SSL_session_reused(ssl_object))
+
+
 def get_openssl_version() -> str:
     system_openssl_bytes = OpenSSL.SSL.SSLeay_version(OpenSSL.SSL.SSLEAY_VERSION)
     system_openssl = system_openssl_bytes.decode("ascii", errors="replace")
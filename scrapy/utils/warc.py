@@ -0,0 +1,194 @@
+"""Helper functions for reading and writing WARC files
+
+https://iipc.github.io/warc-specifications/specifications/warc-format/warc-1.1/
+
+Records are written as separate gzip members, so that they can be read
+individually from their offset in the file.
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import IO, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from uuid import uuid4
+
+from twisted.web import http
+from w3lib.http import headers_dict_to_raw
+
+from scrapy.http import Response
+from scrapy.utils.python import to_bytes, to_unicode
+
+WARC_VERSION = b"WARC/1.1"
+
+#: Header line of CDX index files, see
+#: https://iipc.github.io/warc-specifications/specifications/cdx-format/cdx-2015/
+CDX_HEADER = " CDX N b a m s k r M S V g\n"
+
+
+class WarcRecord(NamedTuple):
+    headers: Dict[bytes, bytes]
+    block: bytes
+
+
+class CdxEntry(NamedTuple):
+    #: Lookup key, the request fingerprint in the indexes written by Scrapy
+    key: str
+    #: 14-digit timestamp, i.e. YYYYmmddHHMMSS
+    timestamp: str
+    url: str
+    status: int
+    #: Compressed length and offset of the record in *filename*
+    length: int
+    offset: int
+    filename: str
+
+
+def warc_date(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime(
+        "%Y-%m-%dT%H:%M:%SZ"
+    )
+
+
+def cdx_timestamp(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y%m%d%H%M%S")
+
+
+def parse_cdx_timestamp(timestamp: str) -> float:
+    return (
+        datetime.strptime(timestamp, "%Y%m%d%H%M%S")
+        .replace(tzinfo=timezone.utc)
+        .timestamp()
+    )
+
+
+def record_id() -> str:
+    return f"<urn:uuid:{uuid4()}>"
+
+
+def payload_digest(payload: bytes) -> str:
+    return "sha1:" + base64.b32encode(hashlib.sha1(payload).digest()).decode()  # nosec
+
+
+def response_block(response: Response) -> Tuple[bytes, bytes]:
+    """Return the HTTP response message of *response*, as stored in WARC
+    ``response`` records, and its payload.
+
+    The body of *response* is already decoded from any transfer encoding, so
+    the ``Transfer-Encoding`` header is left out.
+    """
+    headers = response.headers.copy()
+    headers.pop(b"Transfer-Encoding", None)
+    reason = http.RESPONSES.get(response.status, b"")
+    head = [b"HTTP/1.1 " + to_bytes(str(response.status)) + b" " + reason]
+    if headers:
+        head.append(headers_dict_to_raw(headers))
+    block = b"\r\n".join(head) + b"\r\n\r\n" + response.body
+    return block, response.body
+
+
+def parse_response_block(block: bytes) -> Tuple[int, bytes, bytes]:
+    """Return the status, raw headers and body of the HTTP response message
+    of a WARC ``response`` record."""
+    head, _, body = block.partition(b"\r\n\r\n")
+    status_line, _, rawheaders = head.partition(b"\r\n")
+    status = int(status_line.split(b" ", 2)[1])
+    return status, rawheaders, body
+
+
+def write_record(
+    f: IO[bytes], warc_type: str, headers: List[Tuple[str, str]], block: bytes
+) -> Tuple[int, int]:
+    """Write a WARC record to *f* as a gzip member, and return its offset and
+    compressed length."""
+    head = [
+        WARC_VERSION,
+        b"WARC-Type: " + to_bytes(warc_type),
+        *(to_bytes(f"{name}: {value}") for name, value in headers),
+        b"Content-Length: " + to_bytes(str(len(block))),
+    ]
+    compressor = zlib.compressobj(wbits=31)
+    data = compressor.compress(b"\r\n".join(head) + b"\r\n\r\n" + block + b"\r\n\r\n")
+    data += compressor.flush()
+    offset = f.tell()
+    f.write(data)
+    return offset, len(data)
+
+
+def parse_record(data: bytes) -> WarcRecord:
+    """Parse an uncompressed WARC record."""
+    head, _, rest = data.partition(b"\r\n\r\n")
+    lines = head.split(b"\r\n")
+    if not lines[0].startswith(b"WARC/"):
+        raise ValueError(f"Invalid WARC record: {data[:20]!r}")
+    headers: Dict[bytes, bytes] = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(b":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers[b"content-length"])
+    return WarcRecord(headers, rest[:length])
+
+
+def read_record(f: IO[bytes], offset: int, length: int) -> WarcRecord:
+    """Read the gzip-compressed record at *offset* of *f*."""
+    f.seek(offset)
+    return parse_record(zlib.decompress(f.read(length), wbits=31))
+
+
+def iter_records(
+    path: Path, chunk_size: int = 1024 * 1024
+) -> Iterator[Tuple[int, int, WarcRecord]]:
+    """Yield the offset, compressed length and content of the records of a
+    WARC file with a gzip member per record."""
+    offset = 0
+    with path.open("rb") as f:
+        data = b""
+        while True:
+            decompressor = zlib.decompressobj(wbits=31)
+            record = b""
+            consumed = 0
+            while not decompressor.eof:
+                if not data:
+                    data = f.read(chunk_size)
+                    if not data:
+                        # End of file, or a record truncated by an
+                        # interrupted write
+                        return
+                record += decompressor.decompress(data)
+                consumed += len(data) - len(decompressor.unused_data)
+                data = decompressor.unused_data
+            yield offset, consumed, parse_record(record)
+            offset += consumed
+
+
+def format_cdx_entry(entry: CdxEntry, mimetype: Optional[str], digest: str) -> str:
+    return (
+        f"{entry.key} {entry.timestamp} {entry.url} {mimetype or '-'} "
+        f"{entry.status} {digest} - - {entry.length} {entry.offset} "
+        f"{entry.filename}\n"
+    )
+
+
+def parse_cdx_line(line: str) -> Optional[CdxEntry]:
+    """Parse a line of a CDX index in the format of :data:`CDX_HEADER`, or
+    return ``None`` for the header line."""
+    if line.startswith(" CDX"):
+        return None
+    fields = line.rstrip("\n").split(" ")
+    key, timestamp, url, _, status, _, _, _, length, offset, filename = fields
+    return CdxEntry(
+        key,
+        timestamp,
+        url,
+        int(status) if status.isdigit() else 0,
+        int(length),
+        int(offset),
+        filename,
+    )
+
+
+def record_url(record: WarcRecord) -> str:
+    return to_unicode(record.headers.get(b"warc-target-uri", b"")).strip("<>")
@@ -352,6 +352,23 @@ class SingleRequestSpider(MetaSpider):
             return self.errback_func(failure)
 
 
+class UnreachableSpider(MetaSpider):
+    name = "unreachable"
+
+    def __init__(self, url="http://localhost:65432/", total=10, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.url = url
+        self.total = total
+        self.failure_times = []
+
+    def start_requests(self):
+        for i in range(self.total):
+            yield Request(f"{self.url}?i={i}", errback=self.errback)
+
+    def errback(self, failure):
+        self.failure_times.append(time.time())
+
+
 class DuplicateStartRequestsSpider(MockServerSpider):
     dont_filter = True
     name = "duplicatestartrequests"
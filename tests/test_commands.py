@@ -649,6 +649,43 @@ class MiscCommandsTest(CommandTest):
     def test_list(self):
         self.assertEqual(0, self.call("list"))
 
+    def test_cache(self):
+        self.assertEqual(2, self.call("cache"))
+        self.assertEqual(2, self.call("cache", "clear"))
+        self.assertEqual(0, self.call("cache", "info"))
+        # HTTPCACHE_EXPIRATION_SECS is 0 by default
+        self.assertEqual(2, self.call("cache", "prune"))
+        self.assertEqual(0, self.call("cache", "prune", "--max-age", "60"))
+        self.assertEqual(0, self.call("cache", "compact"))
+
+    def test_cache_missing(self):
+        """Spiders without a cache are reported as empty, and no cache is
+        created for them."""
+        spider = self.proj_mod_path / "spiders" / "myspider.py"
+        spider.write_text(
+            "import scrapy\n\nclass MySpider(scrapy.Spider):\n    name = 'myspider'\n",
+            encoding="utf-8",
+        )
+        cachedir = self.proj_path / ".scrapy" / "httpcache"
+        for storage in ("Dbm", "Filesystem", "Packed", "Warc"):
+            args = [
+                "-s",
+                f"HTTPCACHE_STORAGE=scrapy.extensions.httpcache.{storage}CacheStorage",
+            ]
+            p, out, err = self.proc("cache", "info", *args)
+            if storage == "Warc":
+                self.assertEqual(p.returncode, 2, msg=err)
+                continue
+            self.assertEqual(p.returncode, 0, msg=err)
+            self.assertIn("myspider: 0 entries, 0 bytes", out)
+            for action in ("prune", "compact"):
+                self.assertEqual(
+                    0, self.call("cache", action, "--max-age", "60", *args)
+                )
+            self.assertEqual(
+                [], [p.name for p in cachedir.iterdir()] if cachedir.exists() else []
+            )
+
 
 class RunSpiderCommandTest(CommandTest):
     spider_filename = "myspider.py"
@@ -1,6 +1,16 @@
+from testfixtures import LogCapture
+from twisted.internet import defer, error, reactor
+from twisted.internet.task import deferLater
 from twisted.trial import unittest
 
-from scrapy.core.downloader import Slot
+from scrapy import Request
+from scrapy.core.downloader import Downloader, Slot
+from scrapy.core.downloader.bandwidth import TokenBucket
+from scrapy.core.downloader.breaker import CircuitBreaker
+from scrapy.core.downloader.hedging import RequestHedger
+from scrapy.core.downloader.timings import DownloadTimer, timing_bucket
+from scrapy.http import Response
+from scrapy.utils.test import get_crawler
 
 
 class SlotTest(unittest.TestCase):
@@ -10,3 +20,466 @@ class SlotTest(unittest.TestCase):
             repr(slot),
             "Slot(concurrency=8, delay=0.10, randomize_delay=True, throttle=None)",
         )
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TokenBucketTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_invalid_rate(self):
+        with self.assertRaises(ValueError):
+            TokenBucket(0)
+
+    def test_consume(self):
+        bucket = TokenBucket(1000, clock=self.clock)
+        self.assertEqual(bucket.consume(600), 0)
+        self.assertEqual(bucket.consume(400), 0)
+        self.assertAlmostEqual(bucket.consume(500), 0.5)
+        # the debt is paid off after waiting for the returned delay
+        self.clock.now += 0.5
+        self.assertEqual(bucket.consume(0), 0)
+        self.assertAlmostEqual(bucket.consume(100), 0.1)
+
+    def test_wait_time(self):
+        bucket = TokenBucket(2, capacity=1, clock=self.clock)
+        self.assertEqual(bucket.wait_time(1), 0)
+        bucket.consume(1)
+        self.assertAlmostEqual(bucket.wait_time(1), 0.5)
+        self.clock.now += 0.25
+        self.assertAlmostEqual(bucket.wait_time(1), 0.25)
+
+    def test_capacity(self):
+        bucket = TokenBucket(1000, capacity=100, clock=self.clock)
+        self.clock.now += 10
+        self.assertEqual(bucket.consume(100), 0)
+        self.assertAlmostEqual(bucket.consume(100), 0.1)
+
+
+class DownloaderTransferDelayTest(unittest.TestCase):
+    def _get_downloader(self, settings_dict):
+        crawler = get_crawler(settings_dict=settings_dict)
+        crawler.stats.open_spider(None)
+        downloader = Downloader(crawler)
+        downloader._slot_gc_loop.stop()  # Prevent an unclean reactor.
+        return downloader
+
+    def _get_request(self, downloader, url):
+        request = Request(url)
+        key, _ = downloader._get_slot(request, spider=None)
+        request.meta[Downloader.DOWNLOAD_SLOT] = key
+        return request
+
+    def test_no_limit(self):
+        downloader = self._get_downloader({})
+        request = self._get_request(downloader, "https://example.com")
+        self.assertEqual(downloader.transfer_delay(request, 10**9), 0)
+        self.assertIsNone(
+            downloader.stats.get_value("downloader/bandwidth/delay_count")
+        )
+
+    def test_global_limit(self):
+        downloader = self._get_downloader({"DOWNLOAD_BANDWIDTH": 1000})
+        request1 = self._get_request(downloader, "https://a.example")
+        request2 = self._get_request(downloader, "https://b.example")
+        self.assertEqual(downloader.transfer_delay(request1, 1000), 0)
+        self.assertGreater(downloader.transfer_delay(request2, 1000), 0.9)
+        self.assertEqual(
+            downloader.stats.get_value("downloader/bandwidth/delay_count"), 1
+        )
+
+    def test_slot_limit(self):
+        downloader = self._get_downloader(
+            {
+                "DOWNLOAD_BANDWIDTH_PER_SLOT": 1000,
+                "DOWNLOAD_SLOTS": {"b.example": {"bandwidth": 10**6}},
+            }
+        )
+        request1 = self._get_request(downloader, "https://a.example")
+        request2 = self._get_request(downloader, "https://b.example")
+        self.assertEqual(downloader.transfer_delay(request1, 1000), 0)
+        self.assertGreater(downloader.transfer_delay(request1, 1000), 0.9)
+        self.assertEqual(downloader.transfer_delay(request2, 2000), 0)
+        self.assertEqual(downloader.slots["a.example"].response_bytes, 2000)
+        self.assertEqual(downloader.slots["b.example"].response_bytes, 2000)
+
+
+class DownloaderRateLimitTest(unittest.TestCase):
+    def _get_downloader(self, settings_dict):
+        crawler = get_crawler(settings_dict=settings_dict)
+        crawler.stats.open_spider(None)
+        downloader = Downloader(crawler)
+        downloader._slot_gc_loop.stop()  # Prevent an unclean reactor.
+        return downloader
+
+    def test_no_limit(self):
+        downloader = self._get_downloader({})
+        self.assertIsNone(downloader.rate_bucket)
+        self.assertEqual(downloader.rate_limit_delay(), 0)
+        self.assertFalse(downloader.needs_backout())
+
+    def test_limit(self):
+        downloader = self._get_downloader({"DOWNLOAD_REQUESTS_PER_SECOND": 2})
+        clock = FakeClock()
+        downloader.rate_bucket = TokenBucket(2, capacity=1, clock=clock)
+        self.assertFalse(downloader.needs_backout())
+        downloader.rate_bucket.consume(1)
+        self.assertTrue(downloader.needs_backout())
+        self.assertAlmostEqual(downloader.rate_limit_delay(), 0.5)
+        clock.now += 0.5
+        self.assertFalse(downloader.needs_backout())
+        downloader._record_rate_limit_wait()
+        self.assertEqual(
+            downloader.stats.get_value("downloader/rate_limit/wait_count"), 1
+        )
+
+    @defer.inlineCallbacks
+    def test_answered_by_middleware(self):
+        class CacheMiddleware:
+            def process_request(self, request, spider):
+                return Response(request.url)
+
+        downloader = self._get_downloader({"DOWNLOAD_REQUESTS_PER_SECOND": 2})
+        downloader.middleware.methods.clear()
+        downloader.middleware.methods["process_request"].append(
+            CacheMiddleware().process_request
+        )
+        for _ in range(3):
+            yield downloader.fetch(Request("https://example.com"), None)
+        self.assertFalse(downloader.needs_backout())
+
+
+class RequestHedgerTest(unittest.TestCase):
+    def setUp(self):
+        crawler = get_crawler(
+            settings_dict={"DOWNLOAD_HEDGE_ENABLED": True, "DOWNLOAD_HEDGE_BUDGET": 1}
+        )
+        crawler.stats.open_spider(None)
+        self.stats = crawler.stats
+        self.hedger = RequestHedger(crawler.settings, crawler.stats)
+        self.slot = Slot(concurrency=8, delay=0, randomize_delay=False)
+        self.slot.latencies.extend([0.01] * RequestHedger.min_samples)
+        self.request = Request("https://example.com")
+
+    def _download_func(self, outcomes):
+        """Return a download function whose calls return the deferreds in
+        *outcomes*, after adding them to self.cancelled when cancelled, and
+        their request to self.requests."""
+        self.cancelled = []
+        self.requests = []
+        outcomes = iter(outcomes)
+
+        def download(request):
+            self.requests.append(request)
+            d = next(outcomes)
+            d.addErrback(self._record_cancelled, d)
+            return d
+
+        return download
+
+    def _record_cancelled(self, failure, d):
+        if failure.check(defer.CancelledError):
+            self.cancelled.append(d)
+        return failure
+
+    def test_threshold(self):
+        self.slot.latencies.clear()
+        self.slot.latencies.extend(range(1, 101))
+        self.assertEqual(self.hedger.threshold(self.slot, self.request), 96)
+        self.hedger.percentile = 50
+        self.assertEqual(self.hedger.threshold(self.slot, self.request), 51)
+
+    def test_threshold_not_hedged(self):
+        for request in (
+            Request("https://example.com", method="POST"),
+            Request("https://example.com", meta={"dont_hedge": True}),
+        ):
+            self.assertIsNone(self.hedger.threshold(self.slot, request))
+        slot = Slot(concurrency=8, delay=0, randomize_delay=False)
+        self.assertIsNone(self.hedger.threshold(slot, self.request))
+
+    def test_fast_response(self):
+        response = Response("https://example.com")
+        download = self._download_func([defer.succeed(response)])
+        d = self.hedger.download(self.slot, self.request, download)
+        self.assertIs(self.successResultOf(d), response)
+        self.assertIsNone(self.stats.get_value("downloader/hedge/request_count"))
+
+    @defer.inlineCallbacks
+    def test_hedge_wins(self):
+        response = Response("https://example.com")
+        primary = defer.Deferred()
+        download = self._download_func([primary, defer.succeed(response)])
+        result = yield self.hedger.download(self.slot, self.request, download)
+        self.assertIs(result, response)
+        self.assertEqual(self.cancelled, [primary])
+        self.assertEqual(self.stats.get_value("downloader/hedge/request_count"), 1)
+        self.assertEqual(self.stats.get_value("downloader/hedge/win_count"), 1)
+        self.assertNotIn("hedge", self.request.meta)
+
+    @defer.inlineCallbacks
+    def test_hedge_request(self):
+        response = Response("https://example.com")
+        primary, hedge = defer.Deferred(), defer.Deferred()
+        download = self._download_func([primary, hedge])
+        d = self.hedger.download(self.slot, self.request, download)
+        yield deferLater(reactor, 0.05, lambda: None)
+        original, hedge_request = self.requests
+        self.assertIs(original, self.request)
+        self.assertIsNot(hedge_request, self.request)
+        self.assertIs(hedge_request.meta["hedge"], True)
+        self.assertEqual(self.slot.active, {hedge_request})
+        self.assertEqual(self.slot.transferring, {hedge_request})
+        hedge_request.meta["download_latency"] = 1.0
+        hedge.callback(response)
+        self.assertIs(self.successResultOf(d), response)
+        self.assertEqual(self.request.meta, {"download_latency": 1.0})
+        self.assertEqual(self.slot.active, set())
+        self.assertEqual(self.slot.transferring, set())
+
+    @defer.inlineCallbacks
+    def test_slot_full(self):
+        self.slot.concurrency = 0
+        primary = defer.Deferred()
+        download = self._download_func([primary])
+        d = self.hedger.download(self.slot, self.request, download)
+        yield deferLater(reactor, 0.05, lambda: None)
+        self.assertEqual(len(self.requests), 1)
+        primary.callback(Response("https://example.com"))
+        self.successResultOf(d)
+
+    @defer.inlineCallbacks
+    def test_primary_wins(self):
+        response = Response("https://example.com")
+        primary, hedge = defer.Deferred(), defer.Deferred()
+        download = self._download_func([primary, hedge])
+        d = self.hedger.download(self.slot, self.request, download)
+        yield deferLater(reactor, 0.05, lambda: None)
+        primary.callback(response)
+        self.assertIs(self.successResultOf(d), response)
+        self.assertEqual(self.cancelled, [hedge])
+        self.assertEqual(self.stats.get_value("downloader/hedge/request_count"), 1)
+        self.assertIsNone(self.stats.get_value("downloader/hedge/win_count"))
+
+    @defer.inlineCallbacks
+    def test_primary_fails(self):
+        response = Response("https://example.com")
+        primary, hedge = defer.Deferred(), defer.Deferred()
+        download = self._download_func([primary, hedge])
+        d = self.hedger.download(self.slot, self.request, download)
+        yield deferLater(reactor, 0.05, lambda: None)
+        primary.errback(ValueError())
+        self.assertNoResult(d)
+        hedge.callback(response)
+        self.assertIs(self.successResultOf(d), response)
+
+    @defer.inlineCallbacks
+    def test_budget(self):
+        self.hedger.budget = 0
+        response = Response("https://example.com")
+        primary = defer.Deferred()
+        download = self._download_func([primary])
+        d = self.hedger.download(self.slot, self.request, download)
+        yield deferLater(reactor, 0.05, lambda: None)
+        self.assertEqual(self.stats.get_value("downloader/hedge/budget_exceeded"), 1)
+        primary.callback(response)
+        self.assertIs(self.successResultOf(d), response)
+
+    def test_cancel(self):
+        primary = defer.Deferred()
+        download = self._download_func([primary])
+        d = self.hedger.download(self.slot, self.request, download)
+        d.cancel()
+        self.failureResultOf(d, defer.CancelledError)
+        self.assertEqual(self.cancelled, [primary])
+
+
+class CircuitBreakerTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(max_failures=2, cooldown=10, clock=self.clock)
+
+    def test_closed(self):
+        self.assertFalse(self.breaker.record_failure())
+        self.assertFalse(self.breaker.record_success())
+        self.assertFalse(self.breaker.record_failure())
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertFalse(self.breaker.blocked())
+        self.assertTrue(self.breaker.allow_request())
+
+    def test_open(self):
+        self.assertFalse(self.breaker.record_failure())
+        self.assertTrue(self.breaker.record_failure())
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertTrue(self.breaker.blocked())
+        self.assertFalse(self.breaker.allow_request())
+        self.assertEqual(self.breaker.retry_after(), 10)
+        # failures of requests sent before the circuit opened
+        self.assertFalse(self.breaker.record_failure())
+        self.clock.now += 4
+        self.assertEqual(self.breaker.retry_after(), 6)
+
+    def test_probe_success(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now += 10
+        self.assertFalse(self.breaker.blocked())
+        self.assertTrue(self.breaker.allow_request())
+        self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(self.breaker.blocked())
+        self.assertFalse(self.breaker.allow_request())
+        self.assertTrue(self.breaker.record_success())
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(self.breaker.allow_request())
+
+    def test_probe_failure(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.clock.now += 10
+        self.assertTrue(self.breaker.allow_request())
+        self.assertTrue(self.breaker.record_failure())
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(self.breaker.retry_after(), 10)
+
+    def test_parked_requests(self):
+        crawler = get_crawler(
+            settings_dict={"CONCURRENT_REQUESTS": 2, "DOWNLOAD_BREAKER_ENABLED": True}
+        )
+        downloader = Downloader(crawler)
+        downloader._slot_gc_loop.stop()  # Prevent an unclean reactor.
+        request = Request("https://example.com")
+        key, slot = downloader._get_slot(request, spider=None)
+        self.assertIsInstance(slot.breaker, CircuitBreaker)
+        downloader.active.update([request, Request("https://example.com/2")])
+        slot.queue.append((request, defer.Deferred()))
+        self.assertTrue(downloader.needs_backout())
+        for _ in range(slot.breaker.max_failures):
+            slot.breaker.record_failure()
+        downloader.broken_slots.add(key)
+        self.assertTrue(downloader.slot_blocked(key))
+        self.assertFalse(downloader.needs_backout())
+
+    def test_slot_gc(self):
+        crawler = get_crawler(settings_dict={"DOWNLOAD_BREAKER_ENABLED": True})
+        downloader = Downloader(crawler)
+        downloader._slot_gc_loop.stop()  # Prevent an unclean reactor.
+        key, slot = downloader._get_slot(Request("https://example.com"), None)
+        for _ in range(slot.breaker.max_failures):
+            slot.breaker.record_failure()
+        downloader.broken_slots.add(key)
+        downloader._slot_gc(age=-1)
+        self.assertIs(downloader.slots[key], slot)
+        self.assertIn(key, downloader.broken_slots)
+        slot.breaker.state = CircuitBreaker.CLOSED
+        downloader.broken_slots.discard(key)
+        downloader._slot_gc(age=-1)
+        self.assertNotIn(key, downloader.slots)
+
+
+class DownloadTimerTest(unittest.TestCase):
+    def test_mark(self):
+        clock = FakeClock()
+        timer = DownloadTimer(clock=clock)
+        clock.now += 0.5
+        timer.mark("connect")
+        clock.now += 1
+        timer.mark("ttfb")
+        clock.now += 0.25
+        timer.mark("connect")
+        self.assertEqual(timer.timings, {"connect": 0.75, "ttfb": 1})
+
+    def test_timing_bucket(self):
+        self.assertEqual(timing_bucket(0), "0-10ms")
+        self.assertEqual(timing_bucket(0.01), "10-50ms")
+        self.assertEqual(timing_bucket(0.7), "500ms-1s")
+        self.assertEqual(timing_bucket(60), "60s+")
+
+
+class DownloaderTimingsTest(unittest.TestCase):
+    def _get_downloader(self, settings_dict):
+        crawler = get_crawler(settings_dict=settings_dict)
+        crawler.stats.open_spider(None)
+        downloader = Downloader(crawler)
+        downloader._slot_gc_loop.stop()  # Prevent an unclean reactor.
+        return downloader
+
+    def _get_request(self, timings):
+        return Request(
+            "https://example.com",
+            meta={"download_slot": "example.com", "download_timings": timings},
+        )
+
+    def test_queue(self):
+        downloader = self._get_downloader(
+            {"CONCURRENT_REQUESTS_PER_DOMAIN": 1, "DOWNLOAD_TIMINGS_STATS": True}
+        )
+        downloader.handlers.download_request = lambda request, spider: (
+            defer.Deferred()
+        )
+        request1 = Request("https://example.com/1")
+        request2 = Request("https://example.com/2")
+        downloader._enqueue_request(request1, None)
+        downloader._enqueue_request(request2, None)
+        self.assertEqual(set(request1.meta["download_timings"]), {"queue"})
+        self.assertNotIn("download_timings", request2.meta)
+        slot = downloader.slots["example.com"]
+        self.assertEqual(list(slot.enqueued), [request2])
+
+    def test_queue_disabled(self):
+        downloader = self._get_downloader({})
+        downloader.handlers.download_request = lambda request, spider: (
+            defer.Deferred()
+        )
+        request = Request("https://example.com")
+        downloader._enqueue_request(request, None)
+        self.assertNotIn("download_timings", request.meta)
+
+    def test_timeout_latency(self):
+        downloader = self._get_downloader({})
+        downloader.handlers.download_request = lambda request, spider: defer.fail(
+            error.TimeoutError()
+        )
+        d = downloader._enqueue_request(Request("https://example.com"), None)
+        self.failureResultOf(d, error.TimeoutError)
+        self.assertEqual(len(downloader.slots["example.com"].latencies), 1)
+
+    def test_stats(self):
+        downloader = self._get_downloader({"DOWNLOAD_TIMINGS_STATS": True})
+        for ttfb in (0.2, 0.3, 2):
+            downloader._record_timings(self._get_request({"queue": 0, "ttfb": ttfb}))
+        stats = downloader.stats.get_stats()
+        self.assertEqual(stats["downloader/timings/example.com/queue/0-10ms"], 3)
+        self.assertEqual(stats["downloader/timings/example.com/ttfb/100-500ms"], 2)
+        self.assertEqual(stats["downloader/timings/example.com/ttfb/1-5s"], 1)
+
+    def test_no_stats(self):
+        downloader = self._get_downloader({})
+        downloader._record_timings(self._get_request({"queue": 0, "ttfb": 0.2}))
+        self.assertFalse(
+            any(
+                key.startswith("downloader/timings/")
+                for key in downloader.stats.get_stats()
+            )
+        )
+
+    def test_slow_request_log(self):
+        downloader = self._get_downloader({"DOWNLOAD_SLOW_REQUEST_THRESHOLD": 1})
+        with LogCapture("scrapy.core.downloader") as log:
+            downloader._record_timings(self._get_request({"queue": 0.1, "ttfb": 0.5}))
+            downloader._record_timings(self._get_request({"queue": 0.5, "ttfb": 1}))
+        log.check(
+            (
+                "scrapy.core.downloader",
+                "INFO",
+                "Slow download of <GET https://example.com> (1.500s): "
+                "queue 0.500s, ttfb 1.000s",
+            )
+        )
+        self.assertEqual(downloader.stats.get_value("downloader/slow_request_count"), 1)
@@ -49,6 +49,7 @@ from tests.spiders import (
     HeadersReceivedErrbackSpider,
     SimpleSpider,
     SingleRequestSpider,
+    UnreachableSpider,
 )
 
 
@@ -107,6 +108,44 @@ class CrawlTestCase(TestCase):
             average > delay / tolerance, "test total or delay values are too small"
         )
 
+    @defer.inlineCallbacks
+    def test_requests_per_second(self):
+        crawler = get_crawler(FollowAllSpider, {"DOWNLOAD_REQUESTS_PER_SECOND": 20})
+        yield crawler.crawl(total=10, mockserver=self.mockserver)
+        times = crawler.spider.times
+        self.assertEqual(len(times), 11)
+        # 10 requests after the first one, one every 0.05 seconds
+        self.assertGreater(times[-1] - times[0], 0.4)
+        stats = crawler.stats
+        self.assertGreater(stats.get_value("downloader/rate_limit/wait_count"), 0)
+        self.assertGreater(stats.get_value("downloader/rate_limit/wait_time"), 0)
+
+    @defer.inlineCallbacks
+    def test_circuit_breaker(self):
+        settings = {
+            "CONCURRENT_REQUESTS_PER_DOMAIN": 1,
+            "DOWNLOAD_BREAKER_ENABLED": True,
+            "DOWNLOAD_BREAKER_COOLDOWN": 0.2,
+            "DOWNLOAD_BREAKER_FAILURES": 2,
+            "RETRY_ENABLED": False,
+        }
+        crawler = get_crawler(UnreachableSpider, settings)
+        with LogCapture() as log:
+            yield crawler.crawl(total=5)
+        times = crawler.spider.failure_times
+        self.assertEqual(len(times), 5)
+        # 2 failures open the circuit, then each probe fails after a cooldown
+        self.assertGreater(times[-1] - times[0], 3 * 0.2)
+        self.assertEqual(
+            crawler.stats.get_value("downloader/circuit_breaker/open_count"), 4
+        )
+        self.assertGreater(
+            crawler.stats.get_value("downloader/circuit_breaker/failed_download_time"),
+            0,
+        )
+        self.assertIn("after 2 consecutive failures", str(log))
+        self.assertIn("after a failed probe request", str(log))
+
     @defer.inlineCallbacks
     def test_timeout_success(self):
         crawler = get_crawler(DelaySpider)
@@ -1,5 +1,7 @@
 import contextlib
+import gzip
 import os
+import random
 import shutil
 import sys
 from pathlib import Path
@@ -17,6 +19,7 @@ from twisted.web._newclient import ResponseFailed
 from twisted.web.http import _DataLoss
 from w3lib.url import path_to_file_uri
 
+from scrapy import signals
 from scrapy.core.downloader.handlers import DownloadHandlers
 from scrapy.core.downloader.handlers.datauri import DataURIDownloadHandler
 from scrapy.core.downloader.handlers.file import FileDownloadHandler
@@ -24,7 +27,9 @@ from scrapy.core.downloader.handlers.http import HTTPDownloadHandler
 from scrapy.core.downloader.handlers.http10 import HTTP10DownloadHandler
 from scrapy.core.downloader.handlers.http11 import HTTP11DownloadHandler
 from scrapy.core.downloader.handlers.s3 import S3DownloadHandler
-from scrapy.exceptions import NotConfigured
+from scrapy.core.downloader.handlers.warc import WarcDownloadHandler
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.extensions.httpcache import WarcCacheStorage
 from scrapy.http import Headers, HtmlResponse, Request
 from scrapy.http.response.text import TextResponse
 from scrapy.responsetypes import responsetypes
@@ -210,6 +215,25 @@ class LargeChunkedFileResource(resource.Resource):
         return server.NOT_DONE_YET
 
 
+class GzipResource(resource.Resource):
+    """Serve 1 MiB of gzip-compressed data in several chunks."""
+
+    body = random.Random(0).getrandbits(8 * 1024 * 1024).to_bytes(1024 * 1024, "big")
+
+    def render(self, request):
+        compressed = gzip.compress(self.body)
+        request.setHeader(b"Content-Encoding", b"gzip")
+        request.setHeader(b"Content-Type", b"text/plain")
+
+        def response():
+            for i in range(0, len(compressed), 1024):
+                request.write(compressed[i : i + 1024])
+            request.finish()
+
+        reactor.callLater(0, response)
+        return server.NOT_DONE_YET
+
+
 class DuplicateHeaderResource(resource.Resource):
     def render(self, request):
         request.responseHeaders.setRawHeaders(b"Set-Cookie", [b"a=b", b"c=d"])
@@ -241,6 +265,7 @@ class HttpTestCase(unittest.TestCase):
         r.putChild(b"nocontenttype", EmptyContentTypeHeaderResource())
         r.putChild(b"largechunkedfile", LargeChunkedFileResource())
         r.putChild(b"duplicate-header", DuplicateHeaderResource())
+        r.putChild(b"gzip", GzipResource())
         r.putChild(b"echo", Echo())
         self.site = server.Site(r, timeout=None)
         self.wrapper = WrappingFactory(self.site)
@@ -446,6 +471,11 @@ class Http11TestCase(HttpTestCase):
     """HTTP 1.1 test case"""
 
     download_handler_cls: Type = HTTP11DownloadHandler
+    logger_path = "scrapy.core.downloader.handlers.http11.logger"
+    # URL path -> phase of the download in which the timeout happens
+    timeout_phases = {"wait": "response", "hang-after-headers": "body"}
+    # Phases of download_timings timed when a new connection is opened
+    connection_phases = {"dns", "connect"}
 
     def test_download_without_maxsize_limit(self):
         request = Request(self.getURL("file"))
@@ -484,7 +514,7 @@ class Http11TestCase(HttpTestCase):
 
     @defer.inlineCallbacks
     def test_download_with_maxsize_very_large_file(self):
-        with mock.patch("scrapy.core.downloader.handlers.http11.logger") as logger:
+        with mock.patch(self.logger_path) as logger:
             request = Request(self.getURL("largechunkedfile"))
 
             def check(logger):
@@ -501,6 +531,69 @@ class Http11TestCase(HttpTestCase):
             reactor.callLater(0.1, d.callback, logger)
             yield d
 
+    @defer.inlineCallbacks
+    def test_download_bandwidth_limit(self):
+        crawler = get_crawler()
+        crawler.engine = mock.Mock()
+        transfer_delay = crawler.engine.downloader.transfer_delay
+        transfer_delay.return_value = 0.01
+        download_handler = build_from_crawler(self.download_handler_cls, crawler)
+        request = Request(self.getURL("largechunkedfile"))
+        try:
+            response = yield download_handler.download_request(
+                request, Spider.from_crawler(crawler, "foo")
+            )
+        finally:
+            yield download_handler.close()
+        self.assertEqual(response.body, b"x" * 1024 * 1024)
+        calls = transfer_delay.call_args_list
+        self.assertGreater(len(calls), 1)
+        self.assertTrue(all(call.args[0] is request for call in calls))
+        self.assertEqual(sum(call.args[1] for call in calls), len(response.body))
+
+    @defer.inlineCallbacks
+    def test_timeout_stats(self):
+        crawler = get_crawler()
+        download_handler = build_from_crawler(self.download_handler_cls, crawler)
+        expected = {}
+        try:
+            for path, phase in self.timeout_phases.items():
+                request = Request(self.getURL(path), meta={"download_timeout": 0.5})
+                d = download_handler.download_request(request, Spider("foo"))
+                yield self.assertFailure(d, error.TimeoutError)
+                key = f"downloader/timeout/{phase}"
+                expected[key] = expected.get(key, 0) + 1
+                self.assertEqual(crawler.stats.get_value(key), expected[key])
+        finally:
+            yield download_handler.close()
+
+    @defer.inlineCallbacks
+    def test_download_timings(self):
+        crawler = get_crawler(settings_dict={"DOWNLOAD_TIMINGS_STATS": True})
+        download_handler = build_from_crawler(self.download_handler_cls, crawler)
+        try:
+            request = Request(self.getURL("file"))
+            yield download_handler.download_request(request, Spider("foo"))
+            timings = request.meta["download_timings"]
+            self.assertEqual(
+                set(timings), self.connection_phases | {"ttfb", "transfer"}
+            )
+            self.assertTrue(all(duration >= 0 for duration in timings.values()))
+
+            # A reused connection
+            request = Request(self.getURL("file"))
+            yield download_handler.download_request(request, Spider("foo"))
+            self.assertEqual(
+                set(request.meta["download_timings"]), {"ttfb", "transfer"}
+            )
+        finally:
+            yield download_handler.close()
+
+        # Timings are not recorded unless they are used
+        request = Request(self.getURL("file"))
+        yield self.download_request(request, Spider("foo"))
+        self.assertNotIn("download_timings", request.meta)
+
     @defer.inlineCallbacks
     def test_download_with_maxsize_per_req(self):
         meta = {"download_maxsize": 2}
@@ -576,9 +669,71 @@ class Http11TestCase(HttpTestCase):
         d.addCallback(self.assertEqual, "HTTP/1.1")
         return d
 
+    @defer.inlineCallbacks
+    def test_headers_received_copy(self):
+        crawler = get_crawler()
+        download_handler = build_from_crawler(self.download_handler_cls, crawler)
+        self.addCleanup(download_handler.close)
+        received = []
+
+        def headers_received(headers):
+            received.append(headers)
+            headers[b"X-Foo"] = b"bar"
+
+        crawler.signals.connect(headers_received, signals.headers_received)
+        request = Request(self.getURL("file"))
+        response = yield download_handler.download_request(request, Spider("foo"))
+        self.assertEqual(received[0][b"Content-Length"], b"10")
+        self.assertEqual(response.headers[b"Content-Length"], b"10")
+        self.assertNotIn(b"X-Foo", response.headers)
+
+    @defer.inlineCallbacks
+    def test_download_compressed(self):
+        request = Request(self.getURL("gzip"))
+        response = yield self.download_request(request, Spider("foo"))
+        self.assertEqual(response.headers[b"Content-Encoding"], b"gzip")
+        self.assertEqual(gzip.decompress(response.body), GzipResource.body)
+
+    def _streaming_download_handler(self, **settings):
+        crawler = get_crawler(settings_dict={"COMPRESSION_STREAMING": True, **settings})
+        crawler.stats.open_spider(None)
+        download_handler = build_from_crawler(self.download_handler_cls, crawler)
+        self.addCleanup(download_handler.close)
+        return download_handler
+
+    @defer.inlineCallbacks
+    def test_download_compressed_streaming(self):
+        download_handler = self._streaming_download_handler()
+        request = Request(self.getURL("gzip"))
+        response = yield download_handler.download_request(request, Spider("foo"))
+        self.assertNotIn(b"Content-Encoding", response.headers)
+        self.assertIsInstance(response, TextResponse)
+        self.assertEqual(response.body, GzipResource.body)
+        stats = download_handler._crawler.stats
+        self.assertEqual(stats.get_value("httpcompression/response_count"), 1)
+        self.assertEqual(
+            stats.get_value("httpcompression/response_bytes"),
+            len(GzipResource.body),
+        )
+
+    @defer.inlineCallbacks
+    def test_download_compressed_streaming_disabled(self):
+        download_handler = self._streaming_download_handler(COMPRESSION_ENABLED=False)
+        request = Request(self.getURL("gzip"))
+        response = yield download_handler.download_request(request, Spider("foo"))
+        self.assertEqual(response.headers[b"Content-Encoding"], b"gzip")
+
+    @defer.inlineCallbacks
+    def test_download_compressed_streaming_maxsize(self):
+        download_handler = self._streaming_download_handler()
+        request = Request(self.getURL("gzip"), meta={"download_maxsize": 10240})
+        d = download_handler.download_request(request, Spider("foo"))
+        yield self.assertFailure(d, defer.CancelledError, error.ConnectionAborted)
+
 
 class Https11TestCase(Http11TestCase):
     scheme = "https"
+    connection_phases = {"dns", "connect", "tls"}
 
     tls_log_message = (
         'SSL connection certificate: issuer "/C=IE/O=Scrapy/CN=localhost", '
@@ -604,9 +759,44 @@ class Https11TestCase(Http11TestCase):
         finally:
             yield download_handler.close()
 
+    def _close_connections(self, download_handler):
+        return download_handler._pool.closeCachedConnections()
+
+    @defer.inlineCallbacks
+    def _download_with_new_connections(self, settings_dict, count=3):
+        crawler = get_crawler(settings_dict=settings_dict)
+        crawler.stats.open_spider(None)
+        download_handler = build_from_crawler(self.download_handler_cls, crawler)
+        try:
+            for _ in range(count):
+                request = Request(self.getURL("file"))
+                response = yield download_handler.download_request(
+                    request, Spider("foo")
+                )
+                self.assertEqual(response.body, b"0123456789")
+                yield self._close_connections(download_handler)
+        finally:
+            yield download_handler.close()
+        return crawler.stats
+
+    @defer.inlineCallbacks
+    def test_tls_session_resumption(self):
+        stats = yield self._download_with_new_connections({})
+        self.assertEqual(stats.get_value("downloader/tls_handshake_count"), 3)
+        self.assertEqual(stats.get_value("downloader/tls_session_resumed_count"), 2)
+
+    @defer.inlineCallbacks
+    def test_tls_session_resumption_disabled(self):
+        stats = yield self._download_with_new_connections(
+            {"DOWNLOADER_CLIENT_TLS_SESSION_CACHE_SIZE": 0}
+        )
+        self.assertEqual(stats.get_value("downloader/tls_handshake_count"), 3)
+        self.assertIsNone(stats.get_value("downloader/tls_session_resumed_count"))
+
 
 class Https11WrongHostnameTestCase(Http11TestCase):
     scheme = "https"
+    connection_phases = {"dns", "connect", "tls"}
 
     # above tests use a server certificate for "localhost",
     # client connection to "localhost" too.
@@ -1251,3 +1441,93 @@ class DataURITestCase(unittest.TestCase):
 
         request = Request("data:,")
         return self.download_request(request, self.spider).addCallback(_test)
+
+
+class WarcReplayTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = mkdtemp()
+        self.crawler = get_crawler(Spider, {"HTTPCACHE_DIR": self.tmpdir})
+        self.spider = self.crawler._create_spider("foo")
+        self.crawler.stats.open_spider(self.spider)
+        self.request = Request("http://example.com/a")
+        storage = WarcCacheStorage(self.crawler.settings)
+        storage.open_spider(self.spider)
+        storage.store_response(
+            self.spider,
+            self.request,
+            HtmlResponse(
+                "http://example.com/a",
+                headers={"Content-Type": "text/html"},
+                body=b"<p>a</p>",
+            ),
+        )
+        storage.store_response(
+            self.spider,
+            Request("http://example.com/b", method="POST", body=b"b"),
+            HtmlResponse("http://example.com/b", status=201, body=b"b"),
+        )
+        storage.close_spider(self.spider)
+        self.path = Path(self.tmpdir, "foo.warc")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _download_handler(self, paths):
+        crawler = get_crawler(Spider, {"WARC_REPLAY_PATHS": paths})
+        crawler.stats = self.crawler.stats
+        handler = build_from_crawler(WarcDownloadHandler, crawler)
+        self.addCleanup(handler.close)
+        return handler
+
+    def test_not_configured(self):
+        with self.assertRaises(NotConfigured):
+            build_from_crawler(WarcDownloadHandler, get_crawler())
+
+    @defer.inlineCallbacks
+    def test_index(self):
+        handler = self._download_handler([str(self.path)])
+        response = yield handler.download_request(self.request, self.spider)
+        self.assertIsInstance(response, HtmlResponse)
+        self.assertEqual(response.body, b"<p>a</p>")
+        self.assertEqual(response.headers[b"Content-Type"], b"text/html")
+
+        request = Request("http://example.com/b", method="POST", body=b"b")
+        response = yield handler.download_request(request, self.spider)
+        self.assertEqual(response.status, 201)
+
+        # Looked up by fingerprint, not by URL
+        request = Request("http://example.com/b", method="POST", body=b"c")
+        yield self.assertFailure(
+            handler.download_request(request, self.spider), IgnoreRequest
+        )
+        self.assertEqual(self.crawler.stats.get_value("downloader/warc_replay/hit"), 2)
+        self.assertEqual(self.crawler.stats.get_value("downloader/warc_replay/miss"), 1)
+
+    @defer.inlineCallbacks
+    def test_scan(self):
+        (self.path / "index.cdx").unlink()
+        handler = self._download_handler([str(self.path)])
+        request = Request("http://example.com/a", headers={"Accept": "text/html"})
+        response = yield handler.download_request(request, self.spider)
+        self.assertEqual(response.body, b"<p>a</p>")
+
+        # Only GET and HEAD requests are looked up by URL
+        request = Request("http://example.com/b", method="POST", body=b"b")
+        yield self.assertFailure(
+            handler.download_request(request, self.spider), IgnoreRequest
+        )
+
+    @defer.inlineCallbacks
+    def test_foreign_index(self):
+        # e.g. a CDX index with the 9 fields of older tools
+        (self.path / "index.cdx").write_text(
+            " CDX N b a m s k r V g\n"
+            "com,example)/a 20240101000000 http://example.com/a text/html 200 "
+            "- - 0 foo-00000.warc.gz\n",
+            encoding="utf-8",
+        )
+        with LogCapture("scrapy.core.downloader.handlers.warc") as log:
+            handler = self._download_handler([str(self.path)])
+        self.assertIn("Ignoring", str(log))
+        response = yield handler.download_request(self.request, self.spider)
+        self.assertEqual(response.body, b"<p>a</p>")
@@ -0,0 +1,197 @@
+from typing import Type
+from unittest import mock
+
+import pytest
+from pytest import mark
+from twisted.internet import defer, error, reactor
+from twisted.internet.protocol import Factory, Protocol
+from twisted.internet.task import deferLater
+from twisted.trial import unittest
+from twisted.web.client import ResponseFailed
+
+from scrapy.core.downloader.handlers.http11_asyncio import (
+    AsyncioHTTP11DownloadHandler,
+    _Connection,
+)
+from scrapy.exceptions import NotConfigured
+from scrapy.http import Request
+from scrapy.spiders import Spider
+from scrapy.utils.misc import build_from_crawler
+from scrapy.utils.test import get_crawler
+from tests.test_downloader_handlers import (
+    Http11MockServerTestCase,
+    Http11ProxyTestCase,
+    Http11TestCase,
+    Https11TestCase,
+)
+
+
+class LongHeaderProtocol(Protocol):
+    """Server protocol that answers with a header longer than the read buffer
+    of the client"""
+
+    def dataReceived(self, data):
+        self.transport.write(
+            b"HTTP/1.1 200 OK\r\nX-Long: " + b"a" * 100_000 + b"\r\n\r\n"
+        )
+
+
+class SilentFactory(Factory):
+    """Factory of servers that accept connections but never send data"""
+
+    protocol = Protocol
+
+    def __init__(self):
+        self.protocols = []
+
+    def buildProtocol(self, addr):
+        protocol = super().buildProtocol(addr)
+        self.protocols.append(protocol)
+        return protocol
+
+
+@mark.only_not_asyncio()
+class NotConfiguredTestCase(unittest.TestCase):
+    def test_not_configured(self):
+        with pytest.raises(NotConfigured):
+            build_from_crawler(AsyncioHTTP11DownloadHandler, get_crawler())
+
+
+STREAMING_SKIP_REASON = (
+    "COMPRESSION_STREAMING is only supported by the HTTP/1.1 download handler"
+)
+TLS_SKIP_REASON = (
+    "TLS connections of the asyncio HTTP/1.1 download handler use the ssl "
+    "module of the standard library"
+)
+
+
+@mark.only_asyncio()
+class AsyncioHttp11TestCase(Http11TestCase):
+    download_handler_cls: Type = AsyncioHTTP11DownloadHandler
+    logger_path = "scrapy.core.downloader.handlers.http11_asyncio.logger"
+    connection_phases = {"connect"}
+
+    def test_download_compressed_streaming(self):
+        raise unittest.SkipTest(STREAMING_SKIP_REASON)
+
+    def test_download_compressed_streaming_maxsize(self):
+        raise unittest.SkipTest(STREAMING_SKIP_REASON)
+
+    @defer.inlineCallbacks
+    def test_connection_reused(self):
+        spider = Spider("foo")
+        for _ in range(2):
+            response = yield self.download_request(Request(self.getURL("file")), spider)
+            self.assertEqual(response.body, b"0123456789")
+        (idle,) = self.download_handler._pool._idle.values()
+        self.assertEqual(len(idle), 1)
+
+    @defer.inlineCallbacks
+    def test_stale_connection_retried(self):
+        channels = []
+        build_protocol = self.site.buildProtocol
+
+        def track_channel(addr):
+            channels.append(build_protocol(addr))
+            return channels[-1]
+
+        self.site.buildProtocol = track_channel
+        spider = Spider("foo")
+        response = yield self.download_request(Request(self.getURL("file")), spider)
+        self.assertEqual(response.body, b"0123456789")
+        # The server closes the idle connection, which the pool only notices
+        # when using it
+        channels[0]._channel.transport.loseConnection()
+        yield deferLater(reactor, 0.1, lambda: None)
+        with mock.patch.object(
+            _Connection, "reusable", new_callable=mock.PropertyMock, return_value=True
+        ):
+            response = yield self.download_request(Request(self.getURL("file")), spider)
+        self.assertEqual(response.body, b"0123456789")
+        self.assertEqual(len(channels), 2)
+
+    @defer.inlineCallbacks
+    def test_connect_timeout(self):
+        # The server never answers the TLS handshake, which is part of
+        # establishing the connection
+        factory = SilentFactory()
+        port = reactor.listenTCP(0, factory, interface="127.0.0.1")
+        crawler = get_crawler(settings_dict={"DOWNLOAD_CONNECT_TIMEOUT": 0.2})
+        download_handler = build_from_crawler(self.download_handler_cls, crawler)
+        request = Request(
+            f"https://127.0.0.1:{port.getHost().port}/", meta={"download_timeout": 5}
+        )
+        try:
+            d = download_handler.download_request(request, Spider("foo"))
+            exception = yield self.assertFailure(d, error.TimeoutError)
+        finally:
+            yield download_handler.close()
+            for protocol in factory.protocols:
+                protocol.transport.loseConnection()
+            yield port.stopListening()
+        self.assertIn("Connecting to", str(exception))
+        self.assertEqual(crawler.stats.get_value("downloader/timeout/connect"), 1)
+
+    @defer.inlineCallbacks
+    def test_long_header_line(self):
+        factory = Factory.forProtocol(LongHeaderProtocol)
+        port = reactor.listenTCP(0, factory, interface="127.0.0.1")
+        request = Request(f"http://127.0.0.1:{port.getHost().port}/")
+        try:
+            d = self.download_request(request, Spider("foo"))
+            yield self.assertFailure(d, ResponseFailed)
+        finally:
+            yield port.stopListening()
+
+    @defer.inlineCallbacks
+    def test_name_resolver(self):
+        resolve = mock.Mock(wraps=reactor.nameResolver.resolveHostName)
+        with mock.patch.object(reactor.nameResolver, "resolveHostName", resolve):
+            request = Request(self.getURL("file"))
+            response = yield self.download_request(request, Spider("foo"))
+        self.assertEqual(response.body, b"0123456789")
+        self.assertEqual(resolve.call_args[0][1], "localhost")
+
+    @defer.inlineCallbacks
+    def test_dns_lookup_error(self):
+        request = Request("http://nonexistent.invalid/")
+        d = self.download_request(request, Spider("foo"))
+        yield self.assertFailure(d, error.DNSLookupError)
+
+
+@mark.only_asyncio()
+class AsyncioHttps11TestCase(Https11TestCase):
+    download_handler_cls: Type = AsyncioHTTP11DownloadHandler
+    logger_path = "scrapy.core.downloader.handlers.http11_asyncio.logger"
+    connection_phases = {"connect"}
+
+    def test_download_compressed_streaming(self):
+        raise unittest.SkipTest(STREAMING_SKIP_REASON)
+
+    def test_download_compressed_streaming_maxsize(self):
+        raise unittest.SkipTest(STREAMING_SKIP_REASON)
+
+    def test_tls_logging(self):
+        raise unittest.SkipTest(TLS_SKIP_REASON)
+
+    def test_tls_session_resumption(self):
+        raise unittest.SkipTest(TLS_SKIP_REASON)
+
+    def test_tls_session_resumption_disabled(self):
+        raise unittest.SkipTest(TLS_SKIP_REASON)
+
+
+@mark.only_asyncio()
+class AsyncioHttp11MockServerTestCase(Http11MockServerTestCase):
+    settings_dict = {
+        "DOWNLOAD_HANDLERS": {
+            "http": "scrapy.core.downloader.handlers.http11_asyncio.AsyncioHTTP11DownloadHandler",
+            "https": "scrapy.core.downloader.handlers.http11_asyncio.AsyncioHTTP11DownloadHandler",
+        }
+    }
+
+
+@mark.only_asyncio()
+class AsyncioHttp11ProxyTestCase(Http11ProxyTestCase):
+    download_handler_cls: Type = AsyncioHTTP11DownloadHandler
@@ -4,6 +4,7 @@ from unittest import mock, skipIf
 from pytest import mark
 from testfixtures import LogCapture
 from twisted.internet import defer, error, reactor
+from twisted.protocols.policies import WrappingFactory
 from twisted.trial import unittest
 from twisted.web import server
 from twisted.web.error import SchemeNotSupported
@@ -27,6 +28,11 @@ from tests.test_downloader_handlers import (
 class Https2TestCase(Https11TestCase):
     scheme = "https"
     HTTP2_DATALOSS_SKIP_REASON = "Content-Length mismatch raises InvalidBodyLengthError"
+    HTTP2_STREAMING_SKIP_REASON = (
+        "COMPRESSION_STREAMING is only supported by the HTTP/1.1 download handler"
+    )
+    # Responses are only returned by streams once complete
+    timeout_phases = {"wait": "response", "hang-after-headers": "response"}
 
     @classmethod
     def setUpClass(cls):
@@ -66,6 +72,20 @@ class Https2TestCase(Https11TestCase):
         d = self.download_request(request, Spider("foo"))
         yield self.assertFailure(d, SchemeNotSupported)
 
+    def _close_connections(self, download_handler):
+        return download_handler._pool.close_connections()
+
+    def test_headers_received_copy(self):
+        raise unittest.SkipTest(
+            "The HTTP/2 download handler does not send headers_received"
+        )
+
+    def test_download_compressed_streaming(self):
+        raise unittest.SkipTest(self.HTTP2_STREAMING_SKIP_REASON)
+
+    def test_download_compressed_streaming_maxsize(self):
+        raise unittest.SkipTest(self.HTTP2_STREAMING_SKIP_REASON)
+
     def test_download_broken_content_cause_data_loss(self, url="broken"):
         raise unittest.SkipTest(self.HTTP2_DATALOSS_SKIP_REASON)
 
@@ -99,6 +119,62 @@ class Https2TestCase(Https11TestCase):
 
         return defer.DeferredList([d1, d2])
 
+    def _h2_download_handler(self, **settings):
+        crawler = get_crawler(settings_dict=settings)
+        download_handler = build_from_crawler(self.download_handler_cls, crawler)
+        self.addCleanup(download_handler.close)
+        return download_handler
+
+    @defer.inlineCallbacks
+    def test_max_connections_per_host(self):
+        from scrapy.core.http2.protocol import H2ClientProtocol
+
+        download_handler = self._h2_download_handler(H2_MAX_CONNECTIONS_PER_HOST=2)
+        pool = download_handler._pool
+        spider = Spider("foo")
+        with mock.patch.object(
+            H2ClientProtocol,
+            "allowed_max_concurrent_streams",
+            new_callable=mock.PropertyMock,
+            return_value=1,
+        ):
+            request1 = Request(self.getURL("file"))
+            response = yield download_handler.download_request(request1, spider)
+            self.assertEqual(response.body, b"0123456789")
+            self.assertEqual(request1.meta["h2_max_concurrent_streams"], 2)
+            (connections,) = pool._connections.values()
+            self.assertEqual(len(connections), 1)
+
+            # The only stream of the first connection is busy, a second
+            # connection is opened
+            d2 = download_handler.download_request(Request(self.getURL("wait")), spider)
+            request3 = Request(self.getURL("file"))
+            response = yield download_handler.download_request(request3, spider)
+            self.assertEqual(response.body, b"0123456789")
+            self.assertEqual(len(connections), 2)
+
+            # No more connections are opened beyond the limit
+            d4 = download_handler.download_request(Request(self.getURL("wait")), spider)
+            d5 = download_handler.download_request(Request(self.getURL("file")), spider)
+            self.assertEqual(len(connections), 2)
+
+            for d in (d2, d4, d5):
+                d.cancel()
+            yield defer.DeferredList([d2, d4, d5], consumeErrors=True)
+
+    @defer.inlineCallbacks
+    def test_flow_control_window_size(self):
+        download_handler = self._h2_download_handler(
+            H2_INITIAL_WINDOW_SIZE=2**20,
+            H2_CONNECTION_WINDOW_SIZE=2**24,
+        )
+        request = Request(self.getURL("file"))
+        response = yield download_handler.download_request(request, Spider("foo"))
+        self.assertEqual(response.body, b"0123456789")
+        ((conn,),) = download_handler._pool._connections.values()
+        self.assertEqual(conn.conn.local_settings.initial_window_size, 2**20)
+        self.assertGreater(conn.conn.inbound_flow_control_window, 2**23)
+
     @mark.xfail(reason="https://github.com/python-hyper/h2/issues/1247")
     def test_connect_request(self):
         request = Request(self.getURL("file"), method="CONNECT")
@@ -252,3 +328,112 @@ class Https2ProxyTestCase(Http11ProxyTestCase):
     def test_download_with_proxy_https_timeout(self):
         with self.assertRaises(NotImplementedError):
             yield super().test_download_with_proxy_https_timeout()
+
+
+class Http11OnlySite(server.Site):
+    def acceptableProtocols(self):
+        return [b"http/1.1"]
+
+
+@skipIf(not H2_ENABLED, "HTTP/2 support in Twisted is not enabled")
+class HttpsALPNTestCase(unittest.TestCase):
+    keyfile = "keys/localhost.key"
+    certfile = "keys/localhost.crt"
+    host = "localhost"
+
+    @classmethod
+    def setUpClass(cls):
+        from scrapy.core.downloader.handlers.alpn import ALPNDownloadHandler
+
+        cls.download_handler_cls = ALPNDownloadHandler
+
+    def setUp(self):
+        resource = UriResource()
+        self.ports = {
+            "h2": self._listen(server.Site(resource, timeout=None)),
+            "http/1.1": self._listen(Http11OnlySite(resource, timeout=None)),
+            # WrappingFactory hides the ALPN support of the site
+            "no-alpn": self._listen(
+                WrappingFactory(server.Site(resource, timeout=None))
+            ),
+        }
+        crawler = get_crawler()
+        self.download_handler = build_from_crawler(self.download_handler_cls, crawler)
+
+    def _listen(self, factory):
+        port = reactor.listenSSL(
+            0,
+            factory,
+            ssl_context_factory(self.keyfile, self.certfile),
+            interface=self.host,
+        )
+        self.addCleanup(port.stopListening)
+        return port
+
+    def tearDown(self):
+        return self.download_handler.close()
+
+    def getURL(self, server_name, path="file"):
+        port = self.ports[server_name].getHost().port
+        return f"https://{self.host}:{port}/{path}"
+
+    @defer.inlineCallbacks
+    def _download_protocols(self, server_name, count=2):
+        protocols = []
+        for _ in range(count):
+            request = Request(self.getURL(server_name))
+            response = yield self.download_handler.download_request(
+                request, Spider("foo")
+            )
+            protocols.append(response.protocol)
+        return protocols
+
+    @defer.inlineCallbacks
+    def test_h2(self):
+        protocols = yield self._download_protocols("h2")
+        self.assertEqual(protocols, ["h2", "h2"])
+        port = self.ports["h2"].getHost().port
+        self.assertEqual(self.download_handler._protocols[(self.host, port)], b"h2")
+
+    @defer.inlineCallbacks
+    def test_http11(self):
+        with mock.patch.object(
+            self.download_handler._h2_handler,
+            "download_request",
+            wraps=self.download_handler._h2_handler.download_request,
+        ) as h2_download_request:
+            protocols = yield self._download_protocols("http/1.1", count=3)
+        self.assertEqual(protocols, ["HTTP/1.1"] * 3)
+        # Only the first request to the host went through ALPN negotiation
+        self.assertEqual(h2_download_request.call_count, 1)
+
+    @defer.inlineCallbacks
+    def test_no_alpn(self):
+        protocols = yield self._download_protocols("no-alpn")
+        self.assertEqual(protocols, ["HTTP/1.1", "HTTP/1.1"])
+
+    @defer.inlineCallbacks
+    def test_concurrent_requests_http11(self):
+        spider = Spider("foo")
+        responses = yield defer.gatherResults(
+            [
+                self.download_handler.download_request(
+                    Request(self.getURL("http/1.1")), spider
+                )
+                for _ in range(3)
+            ]
+        )
+        self.assertEqual([r.protocol for r in responses], ["HTTP/1.1"] * 3)
+
+    @defer.inlineCallbacks
+    def test_mixed_hosts(self):
+        h2_protocols = yield self._download_protocols("h2", count=1)
+        http11_protocols = yield self._download_protocols("http/1.1", count=1)
+        self.assertEqual(h2_protocols + http11_protocols, ["h2", "HTTP/1.1"])
+
+    @defer.inlineCallbacks
+    def test_error_not_retried(self):
+        request = Request(f"https://{self.host}:1/file")
+        d = self.download_handler.download_request(request, Spider("foo"))
+        yield self.assertFailure(d, error.ConnectionRefusedError)
+        self.assertEqual(len(self.download_handler._protocols), 0)
@@ -1,6 +1,11 @@
 import unittest
+from unittest import mock
 
-from scrapy.downloadermiddlewares.downloadtimeout import DownloadTimeoutMiddleware
+from scrapy.core.downloader import Slot
+from scrapy.downloadermiddlewares.downloadtimeout import (
+    DownloadTimeoutMiddleware,
+    _get_download_timeout,
+)
 from scrapy.http import Request
 from scrapy.spiders import Spider
 from scrapy.utils.test import get_crawler
@@ -39,3 +44,65 @@ class DownloadTimeoutMiddlewareTest(unittest.TestCase):
         req.meta["download_timeout"] = 1
         assert mw.process_request(req, spider) is None
         self.assertEqual(req.meta.get("download_timeout"), 1)
+
+    def get_adaptive_request_spider_mw(self, latencies, settings=None):
+        settings = {"DOWNLOAD_TIMEOUT_ADAPTIVE": True, **(settings or {})}
+        request, spider, mw = self.get_request_spider_mw(settings)
+        slot = Slot(concurrency=8, delay=0, randomize_delay=False)
+        slot.latencies.extend(latencies)
+        mw._crawler.engine = mock.Mock()
+        downloader = mw._crawler.engine.downloader
+        downloader.slots = {"scrapytest.org": slot}
+        downloader.get_slot_key.return_value = "scrapytest.org"
+        mw.spider_opened(spider)
+        return request, spider, mw
+
+    def assertTimeout(self, request, timeout):
+        self.assertEqual(_get_download_timeout(request, 180), timeout)
+
+    def test_adaptive_download_timeout(self):
+        req, spider, mw = self.get_adaptive_request_spider_mw([5] * 19 + [10])
+        assert mw.process_request(req, spider) is None
+        self.assertEqual(req.meta.get("download_timeout"), 180)
+        self.assertTimeout(req, 40)
+
+    def test_adaptive_download_timeout_bounds(self):
+        req, spider, mw = self.get_adaptive_request_spider_mw([0.1] * 20)
+        assert mw.process_request(req, spider) is None
+        self.assertTimeout(req, 10)
+
+        req, spider, mw = self.get_adaptive_request_spider_mw(
+            [60] * 20, {"DOWNLOAD_TIMEOUT": 100}
+        )
+        assert mw.process_request(req, spider) is None
+        self.assertTimeout(req, 100)
+
+    def test_adaptive_download_timeout_few_latencies(self):
+        req, spider, mw = self.get_adaptive_request_spider_mw([1] * 19)
+        assert mw.process_request(req, spider) is None
+        self.assertTimeout(req, 180)
+
+    def test_adaptive_download_timeout_request_meta(self):
+        req, spider, mw = self.get_adaptive_request_spider_mw([1] * 20)
+        req.meta["download_timeout"] = 1000
+        assert mw.process_request(req, spider) is None
+        self.assertEqual(req.meta.get("download_timeout"), 1000)
+        self.assertTimeout(req, 1000)
+
+    def test_adaptive_download_timeout_recomputed(self):
+        req, spider, mw = self.get_adaptive_request_spider_mw([1] * 20)
+        assert mw.process_request(req, spider) is None
+        self.assertTimeout(req, 10)
+        slot = mw._crawler.engine.downloader.slots["scrapytest.org"]
+        slot.latencies.extend([5] * 20)
+        redirected = req.replace(url="http://scrapytest.org/redirected")
+        assert mw.process_request(redirected, spider) is None
+        self.assertTimeout(redirected, 20)
+
+    def test_adaptive_download_timeout_retry(self):
+        req, spider, mw = self.get_adaptive_request_spider_mw([1] * 20)
+        assert mw.process_request(req, spider) is None
+        retry = req.replace()
+        retry.meta["retry_times"] = 1
+        assert mw.process_request(retry, spider) is None
+        self.assertTimeout(retry, 180)
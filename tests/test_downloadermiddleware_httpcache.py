@@ -4,6 +4,12 @@ import tempfile
 import time
 import unittest
 from contextlib import contextmanager
+from pathlib import Path
+from unittest import mock
+
+import pytest
+from twisted.internet import defer
+from twisted.trial.unittest import TestCase as TrialTestCase
 
 from scrapy.downloadermiddlewares.httpcache import HttpCacheMiddleware
 from scrapy.exceptions import IgnoreRequest
@@ -143,6 +149,28 @@ class DefaultStorageTest(_BaseTest):
             self.assertIsInstance(cached_response, HtmlResponse)
             self.assertEqualResponse(response, cached_response)
 
+    def test_prune(self):
+        requests = [Request(f"http://www.example.com/{i}") for i in range(3)]
+        with self._storage(HTTPCACHE_EXPIRATION_SECS=0) as storage:
+            storage.store_response(self.spider, requests[0], self.response)
+            storage.store_response(self.spider, requests[1], self.response)
+            time.sleep(0.5)
+            storage.store_response(self.spider, requests[0], self.response)
+            storage.store_response(self.spider, requests[2], self.response)
+        self.assertEqual(storage.info(self.spider.name)["entries"], 3)
+        # The first entry was stored again, only the second one expired
+        self.assertEqual(storage.prune(self.spider.name, 0.25), 1)
+        self.assertEqual(storage.prune(self.spider.name, 0.25), 0)
+        storage.compact(self.spider.name)
+        info = storage.info(self.spider.name)
+        self.assertEqual(info["entries"], 2)
+        self.assertGreater(info["bytes"], 0)
+        with self._storage(HTTPCACHE_EXPIRATION_SECS=0) as storage:
+            for request in requests[0], requests[2]:
+                cached_response = storage.retrieve_response(self.spider, request)
+                self.assertEqualResponse(self.response, cached_response)
+            self.assertIsNone(storage.retrieve_response(self.spider, requests[1]))
+
 
 class DbmStorageTest(DefaultStorageTest):
     storage_class = "scrapy.extensions.httpcache.DbmCacheStorage"
@@ -171,6 +199,457 @@ class FilesystemStorageGzipTest(FilesystemStorageTest):
         return super()._get_settings(**new_settings)
 
 
+class DedupStorageTestMixin:
+    def _get_settings(self, **new_settings):
+        new_settings.setdefault("HTTPCACHE_DEDUP_BODIES", True)
+        return super()._get_settings(**new_settings)
+
+    def test_dedup(self):
+        requests = [Request(f"http://www.example.com/{i}") for i in range(3)]
+        with self._storage(HTTPCACHE_EXPIRATION_SECS=0) as storage:
+            for request in requests:
+                storage.store_response(self.spider, request, self.response)
+            for request in requests:
+                cached_response = storage.retrieve_response(self.spider, request)
+                self.assertEqualResponse(self.response, cached_response)
+            stats = self.crawler.stats
+            body_size = len(self.response.body)
+            self.assertEqual(
+                stats.get_value("httpcache/dedup/body_bytes"), 3 * body_size
+            )
+            self.assertEqual(stats.get_value("httpcache/dedup/stored_bytes"), body_size)
+            self.assertEqual(stats.get_value("httpcache/dedup/ratio"), 3)
+
+            # Replacing every response releases the shared body
+            response = self.response.replace(body=b"new body")
+            for request in requests:
+                storage.store_response(self.spider, request, response)
+            self.assertEqual(self._blob_count(storage), 1)
+            for request in requests:
+                cached_response = storage.retrieve_response(self.spider, request)
+                self.assertEqualResponse(response, cached_response)
+
+    def test_toggle_zstd(self):
+        pytest.importorskip("zstandard")
+        # Entries stored with and without compression do not share blobs
+        requests = [Request(f"http://www.example.com/{i}") for i in range(2)]
+        settings = {"HTTPCACHE_EXPIRATION_SECS": 0}
+        with self._storage(HTTPCACHE_ZSTD=True, **settings) as storage:
+            storage.store_response(self.spider, requests[0], self.response)
+        with self._storage(**settings) as storage:
+            storage.store_response(self.spider, requests[1], self.response)
+            self.assertEqual(self._blob_count(storage), 2)
+        for zstd in (True, False):
+            with self._storage(HTTPCACHE_ZSTD=zstd, **settings) as storage:
+                for request in requests:
+                    cached_response = storage.retrieve_response(self.spider, request)
+                    self.assertEqualResponse(self.response, cached_response)
+
+
+class DbmDedupStorageTest(DedupStorageTestMixin, DbmStorageTest):
+    def _blob_count(self, storage):
+        return sum(1 for key in storage.db.keys() if key.endswith(b"_refs"))
+
+
+class FilesystemDedupStorageTest(DedupStorageTestMixin, FilesystemStorageTest):
+    def _blob_count(self, storage):
+        blobs = Path(storage.cachedir, self.spider.name, "blobs")
+        return sum(1 for path in blobs.glob("*/*") if path.is_file())
+
+
+class ZstdStorageTestMixin:
+    def setUp(self):
+        pytest.importorskip("zstandard")
+        super().setUp()
+        # Train dictionaries synchronously
+        patcher = mock.patch(
+            "scrapy.extensions.httpcache.deferToThread", defer.maybeDeferred
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _get_settings(self, **new_settings):
+        new_settings.setdefault("HTTPCACHE_ZSTD", True)
+        return super()._get_settings(**new_settings)
+
+    def test_dictionary(self):
+        settings = {
+            "HTTPCACHE_EXPIRATION_SECS": 0,
+            "HTTPCACHE_ZSTD_DICTIONARY": "spider",
+            "HTTPCACHE_ZSTD_DICTIONARY_SAMPLES": 30,
+            "HTTPCACHE_ZSTD_DICTIONARY_SIZE": 1024,
+        }
+        responses = [
+            self.response.replace(
+                url=f"http://www.example.com/{i}",
+                body=(
+                    f"<html><head><title>Page {i}</title></head><body>"
+                    f'<div class="item">Item {i * 7} costs {i * 13}</div>'
+                    f"</body></html>"
+                ).encode(),
+            )
+            for i in range(40)
+        ]
+        stats = self.crawler.stats
+        with self._storage(**settings) as storage:
+            for response in responses[:35]:
+                storage.store_response(self.spider, Request(response.url), response)
+            self.assertEqual(stats.get_value("httpcache/zstd/dictionaries"), 1)
+        # The dictionary is reused, and entries compressed with or without it
+        # can be read
+        with self._storage(**settings) as storage:
+            for response in responses[35:]:
+                storage.store_response(self.spider, Request(response.url), response)
+            for response in responses:
+                cached_response = storage.retrieve_response(
+                    self.spider, Request(response.url)
+                )
+                self.assertEqualResponse(response, cached_response)
+        self.assertEqual(stats.get_value("httpcache/zstd/dictionaries"), 1)
+        self.assertLess(
+            stats.get_value("httpcache/zstd/compressed_bytes"),
+            stats.get_value("httpcache/zstd/raw_bytes"),
+        )
+
+    def test_dictionary_limits(self):
+        settings = {
+            "HTTPCACHE_EXPIRATION_SECS": 0,
+            "HTTPCACHE_ZSTD_DICTIONARY": "domain",
+            "HTTPCACHE_ZSTD_DICTIONARY_SIZE": 1024,
+        }
+        with mock.patch.multiple(
+            "scrapy.extensions.httpcache._ZstdCodec",
+            MAX_SAMPLED_SCOPES=2,
+            MAX_SAMPLES_SIZE=1024,
+        ), self._storage(**settings) as storage:
+            for domain in ("a.example", "b.example", "c.example"):
+                response = self.response.replace(url=f"http://{domain}")
+                storage.store_response(self.spider, Request(response.url), response)
+            # Only the samples of the first 2 domains are kept
+            self.assertEqual(set(storage._zstd._samples), {"a.example", "b.example"})
+            with mock.patch.object(
+                storage._zstd, "_train_dictionary", return_value=None
+            ) as train:
+                for i in range(10):
+                    response = self.response.replace(
+                        url=f"http://a.example/{i}", body=b"%03d" % i * 100
+                    )
+                    storage.store_response(self.spider, Request(response.url), response)
+            # Training starts once the samples reach MAX_SAMPLES_SIZE bytes
+            train.assert_called_once()
+            scope, samples = train.call_args.args
+            self.assertEqual(scope, "a.example")
+            self.assertGreaterEqual(sum(map(len, samples)), 1024)
+            self.assertLess(sum(map(len, samples[:-1])), 1024)
+            self.assertEqual(set(storage._zstd._samples), {"b.example"})
+
+
+class DbmZstdStorageTest(ZstdStorageTestMixin, DbmStorageTest):
+    pass
+
+
+class FilesystemZstdStorageTest(ZstdStorageTestMixin, FilesystemStorageTest):
+    pass
+
+
+class PackedStorageTest(DefaultStorageTest):
+    storage_class = "scrapy.extensions.httpcache.PackedCacheStorage"
+
+    def test_reopen(self):
+        with self._storage(HTTPCACHE_EXPIRATION_SECS=0) as storage:
+            storage.store_response(self.spider, self.request, self.response)
+            response = self.response.replace(body=b"new body")
+            storage.store_response(self.spider, self.request, response)
+        with self._storage(HTTPCACHE_EXPIRATION_SECS=0) as storage:
+            cached_response = storage.retrieve_response(self.spider, self.request)
+            self.assertEqualResponse(response, cached_response)
+
+    def test_segments(self):
+        with self._storage(HTTPCACHE_PACKED_SEGMENT_SIZE=1) as storage:
+            requests = [Request(f"http://www.example.com/{i}") for i in range(3)]
+            for request in requests:
+                storage.store_response(self.spider, request, self.response)
+            for request in requests:
+                cached_response = storage.retrieve_response(self.spider, request)
+                self.assertEqualResponse(self.response, cached_response)
+            segments = sorted(p.name for p in storage._path.glob("segment-*"))
+            self.assertEqual(
+                segments, ["segment-000000", "segment-000001", "segment-000002"]
+            )
+
+    def test_remap(self):
+        with self._storage() as storage:
+            storage.store_response(self.spider, self.request, self.response)
+            storage.retrieve_response(self.spider, self.request)
+            mapping = storage._maps[0]
+            request = Request("http://www.example.com/2")
+            storage.store_response(self.spider, request, self.response)
+            cached_response = storage.retrieve_response(self.spider, request)
+            self.assertEqualResponse(self.response, cached_response)
+            # The mapping of the smaller segment is released
+            self.assertTrue(mapping.closed)
+            self.assertIsNot(storage._maps[0], mapping)
+            self.assertFalse(storage._map_readers)
+
+    def test_truncated_index(self):
+        with self._storage() as storage:
+            storage.store_response(self.spider, self.request, self.response)
+            index_path = storage._path / "index"
+        with index_path.open("ab") as f:
+            f.write(b"\x00\x01")
+        with self._storage() as storage:
+            cached_response = storage.retrieve_response(self.spider, self.request)
+            self.assertEqualResponse(self.response, cached_response)
+
+
+class PackedStorageZstdTest(ZstdStorageTestMixin, PackedStorageTest):
+    pass
+
+
+class WarcStorageTest(DefaultStorageTest):
+    storage_class = "scrapy.extensions.httpcache.WarcCacheStorage"
+
+    @pytest.mark.skip(reason="WARC files are not pruned")
+    def test_prune(self):
+        pass
+
+    def test_reopen(self):
+        with self._storage(HTTPCACHE_EXPIRATION_SECS=0) as storage:
+            storage.store_response(self.spider, self.request, self.response)
+            response = self.response.replace(body=b"new body")
+            storage.store_response(self.spider, self.request, response)
+        with self._storage(HTTPCACHE_EXPIRATION_SECS=0) as storage:
+            cached_response = storage.retrieve_response(self.spider, self.request)
+            self.assertEqualResponse(response, cached_response)
+
+    def test_files(self):
+        with self._storage(HTTPCACHE_WARC_FILE_SIZE=1) as storage:
+            requests = [Request(f"http://www.example.com/{i}") for i in range(3)]
+            for request in requests:
+                storage.store_response(self.spider, request, self.response)
+            for request in requests:
+                cached_response = storage.retrieve_response(self.spider, request)
+                self.assertEqualResponse(self.response, cached_response)
+            path = storage._path
+        # The first file only has the warcinfo record
+        self.assertEqual(
+            sorted(p.name for p in path.glob("*.warc.gz")),
+            [f"example.com-0000{i}.warc.gz" for i in range(4)],
+        )
+        with (path / "index.cdx").open(encoding="utf-8") as f:
+            lines = f.readlines()
+        self.assertEqual(lines[0], " CDX N b a m s k r M S V g\n")
+        self.assertEqual(len(lines), 4)
+        fields = lines[1].split()
+        self.assertEqual(fields[2:5], ["http://www.example.com", "text/html", "202"])
+        self.assertEqual(fields[-1], "example.com-00001.warc.gz")
+
+    def test_truncated_index(self):
+        with self._storage() as storage:
+            storage.store_response(self.spider, self.request, self.response)
+            index_path = storage._path / "index.cdx"
+        with index_path.open("a", encoding="utf-8") as f:
+            f.write("0123")
+        with self._storage() as storage:
+            cached_response = storage.retrieve_response(self.spider, self.request)
+            self.assertEqualResponse(self.response, cached_response)
+
+
+class WriteBehindTest(_BaseTest, TrialTestCase):
+    storage_class = "scrapy.extensions.httpcache.FilesystemCacheStorage"
+    policy_class = "scrapy.extensions.httpcache.DummyPolicy"
+
+    def _write_behind_middleware(self, **new_settings):
+        settings = self._get_settings(HTTPCACHE_WRITE_BEHIND=True, **new_settings)
+        mw = HttpCacheMiddleware(settings, self.crawler.stats)
+        mw.spider_opened(self.spider)
+        return mw
+
+    @defer.inlineCallbacks
+    def test_write_behind(self):
+        mw = self._write_behind_middleware()
+        response = mw.process_response(self.request, self.response, self.spider)
+        self.assertIs(response, self.response)
+        # Visible before being written
+        cached_response = mw.process_request(self.request, self.spider)
+        self.assertEqualResponse(self.response, cached_response)
+        self.assertIn("cached", cached_response.flags)
+        self.assertNotIn("cached", self.response.flags)
+        yield mw.spider_closed(self.spider)
+        self.assertFalse(mw.write_queue._pending)
+
+        with self._storage() as storage:
+            cached_response = storage.retrieve_response(self.spider, self.request)
+            self.assertEqualResponse(self.response, cached_response)
+
+    @defer.inlineCallbacks
+    def test_queue_full(self):
+        mw = self._write_behind_middleware(HTTPCACHE_WRITE_QUEUE_SIZE=1)
+        requests = [Request(f"http://www.example.com/{i}") for i in range(2)]
+        response = mw.process_response(requests[0], self.response, self.spider)
+        self.assertIs(response, self.response)
+        d = mw.process_response(requests[1], self.response, self.spider)
+        self.assertIsInstance(d, defer.Deferred)
+        response = yield d
+        self.assertIs(response, self.response)
+        self.assertEqual(self.crawler.stats.get_value("httpcache/write_queue_full"), 1)
+        yield mw.spider_closed(self.spider)
+
+        with self._storage() as storage:
+            for request in requests:
+                self.assertIsNotNone(storage.retrieve_response(self.spider, request))
+
+
+class AsyncCacheStorage:
+    """In-memory storage with a coroutine to retrieve responses."""
+
+    def __init__(self, settings):
+        self.responses = {}
+
+    def open_spider(self, spider):
+        pass
+
+    def close_spider(self, spider):
+        pass
+
+    async def retrieve_response(self, spider, request):
+        return self.responses.get(request.url)
+
+    def store_response(self, spider, request, response):
+        self.responses[request.url] = response
+
+
+class ReadThreadsTest(_BaseTest, TrialTestCase):
+    storage_class = "scrapy.extensions.httpcache.FilesystemCacheStorage"
+    policy_class = "scrapy.extensions.httpcache.DummyPolicy"
+
+    @defer.inlineCallbacks
+    def _test_read_threads(self, **new_settings):
+        requests = [Request(f"http://www.example.com/{i}") for i in range(10)]
+        settings = self._get_settings(HTTPCACHE_READ_THREADS=4, **new_settings)
+        mw = HttpCacheMiddleware(settings, self.crawler.stats)
+        mw.spider_opened(self.spider)
+        self.assertIsNotNone(mw.read_pool)
+        for request in requests[1:]:
+            mw.process_response(request, self.response, self.spider)
+        results = yield defer.gatherResults(
+            [mw.process_request(request, self.spider) for request in requests]
+        )
+        yield mw.spider_closed(self.spider)
+        self.assertIsNone(results[0])
+        for cached_response in results[1:]:
+            self.assertEqualResponse(self.response, cached_response)
+            self.assertIn("cached", cached_response.flags)
+        self.assertEqual(self.crawler.stats.get_value("httpcache/hit"), 9)
+        self.assertEqual(self.crawler.stats.get_value("httpcache/miss"), 1)
+
+    def test_filesystem(self):
+        return self._test_read_threads()
+
+    def test_filesystem_zstd(self):
+        return self._test_read_threads(HTTPCACHE_ZSTD=True)
+
+    def test_dbm(self):
+        self.storage_class = "scrapy.extensions.httpcache.DbmCacheStorage"
+        return self._test_read_threads()
+
+    def test_packed(self):
+        self.storage_class = "scrapy.extensions.httpcache.PackedCacheStorage"
+        return self._test_read_threads()
+
+    def test_warc(self):
+        self.storage_class = "scrapy.extensions.httpcache.WarcCacheStorage"
+        return self._test_read_threads()
+
+    def test_write_behind(self):
+        return self._test_read_threads(HTTPCACHE_WRITE_BEHIND=True)
+
+    @defer.inlineCallbacks
+    def test_async_storage(self):
+        self.storage_class = f"{__name__}.AsyncCacheStorage"
+        with self._middleware(HTTPCACHE_READ_THREADS=4) as mw:
+            # Coroutines are not run in threads
+            self.assertIsNone(mw.read_pool)
+            d = mw.process_request(self.request, self.spider)
+            self.assertIsInstance(d, defer.Deferred)
+            self.assertIsNone((yield d))
+            mw.process_response(self.request, self.response, self.spider)
+            cached_response = yield mw.process_request(self.request, self.spider)
+            self.assertEqualResponse(self.response, cached_response)
+            self.assertIn("cached", cached_response.flags)
+
+
+class MemoryCacheTest(_BaseTest):
+    policy_class = "scrapy.extensions.httpcache.DummyPolicy"
+
+    def test_hit(self):
+        with self._middleware(HTTPCACHE_MEMORY_SIZE=1024 * 1024) as mw:
+            self.assertIsNone(mw.process_request(self.request, self.spider))
+            mw.process_response(self.request, self.response, self.spider)
+            with mock.patch.object(
+                mw.storage, "retrieve_response", side_effect=AssertionError
+            ):
+                for _ in range(2):
+                    cached_response = mw.process_request(self.request, self.spider)
+                    self.assertIsInstance(cached_response, HtmlResponse)
+                    self.assertEqualResponse(self.response, cached_response)
+                    self.assertEqual(cached_response.flags, ["cached"])
+            # Responses are built again on every hit
+            cached_response.headers[b"X-Foo"] = b"bar"
+            self.assertNotIn(
+                b"X-Foo", mw.process_request(self.request, self.spider).headers
+            )
+        stats = self.crawler.stats
+        self.assertEqual(stats.get_value("httpcache/memory/hit"), 3)
+        self.assertEqual(stats.get_value("httpcache/memory/miss"), 1)
+        self.assertEqual(stats.get_value("httpcache/memory/hit_rate"), 0.75)
+        self.assertGreater(stats.get_value("httpcache/memory/bytes"), 0)
+
+    def test_storage_hit(self):
+        with self._middleware() as mw:
+            mw.process_response(self.request, self.response, self.spider)
+        with self._middleware(HTTPCACHE_MEMORY_SIZE=1024 * 1024) as mw:
+            cached_response = mw.process_request(self.request, self.spider)
+            self.assertEqualResponse(self.response, cached_response)
+            with mock.patch.object(
+                mw.storage, "retrieve_response", side_effect=AssertionError
+            ):
+                cached_response = mw.process_request(self.request, self.spider)
+                self.assertEqualResponse(self.response, cached_response)
+
+    def test_max_size(self):
+        requests = [Request(f"http://www.example.com/{i}") for i in range(3)]
+        response = self.response.replace(body=b"a" * 1000)
+        with self._middleware(HTTPCACHE_MEMORY_SIZE=2500) as mw:
+            for request in requests:
+                mw.process_response(request, response, self.spider)
+            self.assertLessEqual(mw.memory_cache.size, 2500)
+            self.assertEqual(self.crawler.stats.get_value("httpcache/memory/evict"), 1)
+            # The least recently used response was evicted, and is read from
+            # the storage
+            for request in reversed(requests):
+                cached_response = mw.process_request(request, self.spider)
+                self.assertEqualResponse(response, cached_response)
+            self.assertEqual(self.crawler.stats.get_value("httpcache/memory/hit"), 2)
+            self.assertEqual(self.crawler.stats.get_value("httpcache/memory/miss"), 1)
+
+            # Responses larger than the memory cache are not kept
+            request = Request("http://www.example.com/large")
+            response = self.response.replace(body=b"a" * 3000)
+            mw.process_response(request, response, self.spider)
+            self.assertNotIn(
+                self.crawler.request_fingerprinter.fingerprint(request),
+                mw.memory_cache._entries,
+            )
+
+    def test_expiration(self):
+        with self._middleware(HTTPCACHE_MEMORY_SIZE=1024 * 1024) as mw:
+            mw.process_response(self.request, self.response, self.spider)
+            time.sleep(1.5)
+            self.assertIsNone(mw.process_request(self.request, self.spider))
+            self.assertIsNone(self.crawler.stats.get_value("httpcache/memory/hit"))
+
+
 class DummyPolicyTest(_BaseTest):
     policy_class = "scrapy.extensions.httpcache.DummyPolicy"
 
@@ -528,6 +1007,53 @@ class RFC2616PolicyTest(DefaultStorageTest):
                 else:
                     assert "cached" in res5.flags
 
+    def test_stale_while_revalidate(self):
+        self.crawler.engine = mock.Mock()
+        req0 = Request(self.request.url)
+        res0 = Response(
+            req0.url,
+            headers={"Date": self.today, "Expires": self.yesterday, "ETag": "foo"},
+        )
+        with self._middleware(HTTPCACHE_STALE_WHILE_REVALIDATE=True) as mw:
+            self._process_requestresponse(mw, req0, res0)
+            # The stale response is used, and revalidated once in the background
+            for _ in range(2):
+                res1 = mw.process_request(req0.copy(), self.spider)
+                self.assertEqualResponse(res0, res1)
+                self.assertIn("stale", res1.flags)
+            self.crawler.engine.crawl.assert_called_once()
+            req1 = self.crawler.engine.crawl.call_args[0][0]
+            self.assertEqual(req1.headers[b"If-None-Match"], b"foo")
+            self.assertLess(req1.priority, req0.priority)
+            self.assertIsNone(mw.process_request(req1, self.spider))
+            res2 = Response(
+                req0.url, status=304, headers={"Cache-Control": "max-age=3600"}
+            )
+            with self.assertRaises(IgnoreRequest):
+                mw.process_response(req1, res2, self.spider)
+            # The revalidated response is fresh
+            res3 = mw.process_request(req0.copy(), self.spider)
+            self.assertEqualResponse(res0.replace(headers=res3.headers), res3)
+            self.assertNotIn("stale", res3.flags)
+        stats = self.crawler.stats
+        self.assertEqual(stats.get_value("httpcache/stale_hit"), 2)
+        self.assertEqual(stats.get_value("httpcache/stale_revalidate"), 1)
+        self.assertEqual(stats.get_value("httpcache/hit"), 1)
+
+    def test_stale_while_revalidate_max_staleness(self):
+        self.crawler.engine = mock.Mock()
+        req0 = Request(self.request.url)
+        res0 = Response(
+            req0.url,
+            headers={"Date": self.yesterday, "Cache-Control": "max-age=60"},
+        )
+        with self._middleware(
+            HTTPCACHE_STALE_WHILE_REVALIDATE=True, HTTPCACHE_MAX_STALENESS=3600
+        ) as mw:
+            self._process_requestresponse(mw, req0, res0)
+            self.assertIsNone(mw.process_request(req0.copy(), self.spider))
+            self.crawler.engine.crawl.assert_not_called()
+
     def test_process_exception(self):
         with self._middleware() as mw:
             res0 = Response(self.request.url, headers={"Expires": self.yesterday})
@@ -702,6 +702,79 @@ class HttpCompressionTest(TestCase):
         self._test_download_warnsize_request_meta("zstd")
 
 
+class HttpCompressionLazyTest(HttpCompressionTest):
+    def setUp(self):
+        self.crawler = get_crawler(Spider, {"COMPRESSION_LAZY": True})
+        self.spider = self.crawler._create_spider("scrapytest.org")
+        self.mw = HttpCompressionMiddleware.from_crawler(self.crawler)
+        self.crawler.stats.open_spider(self.spider)
+
+    def test_lazy_body(self):
+        response = self._getresponse("gzip")
+        compressed_body = response.body
+        newresponse = self.mw.process_response(response.request, response, self.spider)
+        assert isinstance(newresponse, HtmlResponse)
+        assert "Content-Encoding" not in newresponse.headers
+        self.assertEqual(newresponse._body, compressed_body)
+        self.assertEqual(newresponse._body_decoder.content_encoding, [b"gzip"])
+        self.assertStatsEqual("httpcompression/response_count", None)
+
+        copy = newresponse.copy()
+        self.assertEqual(copy._body, compressed_body)
+
+        assert newresponse.body.startswith(b"<!DOCTYPE")
+        self.assertIsNone(newresponse._body_decoder)
+        self.assertIn("<!DOCTYPE", newresponse.text)
+        self.assertStatsEqual("httpcompression/response_count", 1)
+        self.assertStatsEqual("httpcompression/response_bytes", 74837)
+        self.assertEqual(copy.body, newresponse.body)
+        self.assertIs(copy.body, newresponse.body)
+        self.assertStatsEqual("httpcompression/response_count", 1)
+        self.assertStatsEqual("httpcompression/response_bytes", 74837)
+
+    def test_lazy_body_unknown_type(self):
+        response = self._getresponse("gzip")
+        del response.headers["Content-Type"]
+        response = response.replace(url="http://scrapytest.org/page")
+        newresponse = self.mw.process_response(response.request, response, self.spider)
+        self.assertIsNone(newresponse._body_decoder)
+        assert isinstance(newresponse, HtmlResponse)
+        self.assertStatsEqual("httpcompression/response_count", 1)
+
+    def _test_compression_bomb_setting(self, compression_id):
+        settings = {"DOWNLOAD_MAXSIZE": 10_000_000, "COMPRESSION_LAZY": True}
+        crawler = get_crawler(Spider, settings_dict=settings)
+        spider = crawler._create_spider("scrapytest.org")
+        mw = HttpCompressionMiddleware.from_crawler(crawler)
+        mw.open_spider(spider)
+
+        response = self._getresponse(f"bomb-{compression_id}")
+        response = mw.process_response(response.request, response, spider)
+        with self.assertRaises(IgnoreRequest):
+            response.body
+
+    def _test_compression_bomb_spider_attr(self, compression_id):
+        class DownloadMaxSizeSpider(Spider):
+            download_maxsize = 10_000_000
+
+        crawler = get_crawler(DownloadMaxSizeSpider, {"COMPRESSION_LAZY": True})
+        spider = crawler._create_spider("scrapytest.org")
+        mw = HttpCompressionMiddleware.from_crawler(crawler)
+        mw.open_spider(spider)
+
+        response = self._getresponse(f"bomb-{compression_id}")
+        response = mw.process_response(response.request, response, spider)
+        with self.assertRaises(IgnoreRequest):
+            response.body
+
+    def _test_compression_bomb_request_meta(self, compression_id):
+        response = self._getresponse(f"bomb-{compression_id}")
+        response.meta["download_maxsize"] = 10_000_000
+        response = self.mw.process_response(response.request, response, self.spider)
+        with self.assertRaises(IgnoreRequest):
+            response.body
+
+
 class HttpCompressionSubclassTest(TestCase):
     def test_init_missing_stats(self):
         class HttpCompressionMiddlewareSubclass(HttpCompressionMiddleware):
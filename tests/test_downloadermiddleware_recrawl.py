@@ -0,0 +1,101 @@
+import shutil
+import tempfile
+from unittest import TestCase
+
+from scrapy.downloadermiddlewares.recrawl import RecrawlMiddleware
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.http import Request, Response
+from scrapy.spiders import Spider
+from scrapy.utils.test import get_crawler
+
+
+class RecrawlMiddlewareTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.headers = {"ETag": "foo", "Last-Modified": "Sat, 01 Jan 2000 00:00:00 GMT"}
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _crawl(self, responses, **settings):
+        """Process a request for each response in a new crawl, and return
+        the crawler and the outcome of each request, the response or
+        ``None`` if it was dropped, and the request headers."""
+        settings = {"RECRAWL_ENABLED": True, "RECRAWL_DIR": self.tmpdir, **settings}
+        crawler = get_crawler(Spider, settings)
+        spider = crawler._create_spider("foo")
+        crawler.stats.open_spider(spider)
+        mw = RecrawlMiddleware.from_crawler(crawler)
+        mw.spider_opened(spider)
+        results = []
+        try:
+            for response in responses:
+                request = Request(response.url)
+                assert mw.process_request(request, spider) is None
+                try:
+                    result = mw.process_response(request, response, spider)
+                except IgnoreRequest:
+                    result = None
+                results.append((result, request.headers))
+        finally:
+            mw.spider_closed(spider)
+        return crawler, results
+
+    def test_not_enabled(self):
+        with self.assertRaises(NotConfigured):
+            RecrawlMiddleware.from_crawler(get_crawler(Spider))
+
+    def test_not_modified(self):
+        response = Response("http://example.com", headers=self.headers, body=b"a")
+        crawler, results = self._crawl([response])
+        self.assertNotIn(b"If-None-Match", results[0][1])
+        self.assertEqual(crawler.stats.get_value("recrawl/new"), 1)
+
+        crawler, results = self._crawl([response.replace(status=304, body=b"")])
+        result, headers = results[0]
+        self.assertIsNone(result)
+        self.assertEqual(headers[b"If-None-Match"], b"foo")
+        self.assertEqual(
+            headers[b"If-Modified-Since"], self.headers["Last-Modified"].encode()
+        )
+        self.assertEqual(crawler.stats.get_value("recrawl/conditional"), 1)
+        self.assertEqual(crawler.stats.get_value("recrawl/not_modified"), 1)
+        self.assertEqual(crawler.stats.get_value("recrawl/unchanged"), 1)
+
+        # The validators of 304 responses are kept
+        crawler, results = self._crawl(
+            [response.replace(status=304, headers={}, body=b"")],
+            RECRAWL_DROP_UNCHANGED=False,
+        )
+        result, headers = results[0]
+        self.assertIn("unchanged", result.flags)
+        self.assertEqual(headers[b"If-None-Match"], b"foo")
+
+    def test_content_hash(self):
+        response = Response("http://example.com", body=b"a")
+        self._crawl([response])
+        crawler, results = self._crawl(
+            [response, response.replace(body=b"b"), response.replace(body=b"b")]
+        )
+        # Unchanged, changed, then unchanged again
+        self.assertIsNone(results[0][0])
+        self.assertIsNotNone(results[1][0])
+        self.assertIsNone(results[2][0])
+        self.assertEqual(crawler.stats.get_value("recrawl/unchanged"), 2)
+        self.assertEqual(crawler.stats.get_value("recrawl/changed"), 1)
+        self.assertIsNone(crawler.stats.get_value("recrawl/conditional"))
+
+    def test_dont_validate(self):
+        response = Response("http://example.com", headers=self.headers)
+        self._crawl([response])
+        settings = {"RECRAWL_ENABLED": True, "RECRAWL_DIR": self.tmpdir}
+        crawler = get_crawler(Spider, settings)
+        spider = crawler._create_spider("foo")
+        mw = RecrawlMiddleware.from_crawler(crawler)
+        mw.spider_opened(spider)
+        try:
+            request = Request(response.url, meta={"dont_validate": True})
+            mw.process_request(request, spider)
+            self.assertNotIn(b"If-None-Match", request.headers)
+        finally:
+            mw.spider_closed(spider)
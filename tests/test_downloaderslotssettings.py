@@ -81,6 +81,7 @@ def test_params():
         "delay": 2,
         "randomize_delay": False,
         "throttle": False,
+        "bandwidth": 1024,
     }
     settings = {
         "DOWNLOAD_SLOTS": {
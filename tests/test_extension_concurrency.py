@@ -0,0 +1,325 @@
+from unittest.mock import Mock
+
+import pytest
+from twisted.internet import defer
+from twisted.trial.unittest import TestCase
+
+from scrapy import Request, Spider
+from scrapy.core.downloader import Slot
+from scrapy.exceptions import NotConfigured
+from scrapy.extensions.concurrency import AdaptiveConcurrency
+from scrapy.http.response import Response
+from scrapy.utils.misc import build_from_crawler
+from scrapy.utils.test import get_crawler as _get_crawler
+from tests.mockserver import MockServer
+
+UNSET = object()
+
+
+class TestSpider(Spider):
+    name = "test"
+
+
+def get_crawler(settings=None, spidercls=None):
+    settings = settings or {}
+    settings["ADAPTIVE_CONCURRENCY_ENABLED"] = True
+    return _get_crawler(settings_dict=settings, spidercls=spidercls)
+
+
+def get_extension(settings=None, concurrency=4, throttle=None):
+    crawler = get_crawler(settings)
+    ac = build_from_crawler(AdaptiveConcurrency, crawler)
+    crawler.stats.open_spider(TestSpider())
+    crawler.engine = Mock()
+    crawler.engine.downloader = Mock()
+    slot = Slot(concurrency, 0.0, False, throttle=throttle)
+    crawler.engine.downloader.slots = {"foo": slot}
+    return crawler, ac, slot
+
+
+def download(ac, status=200, headers=None, latency=0.1, fail=False, meta=None):
+    spider = TestSpider()
+    request = Request(
+        "https://example.com",
+        meta={"download_slot": "foo", "download_latency": latency, **(meta or {})},
+    )
+    if not fail:
+        response = Response(request.url, status=status, headers=headers)
+        ac._response_downloaded(response, request, spider)
+    ac._request_left_downloader(request, spider)
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    (
+        (UNSET, False),
+        (False, False),
+        (True, True),
+    ),
+)
+def test_enabled(value, expected):
+    settings = {}
+    if value is not UNSET:
+        settings["ADAPTIVE_CONCURRENCY_ENABLED"] = value
+    crawler = _get_crawler(settings_dict=settings)
+    if expected:
+        build_from_crawler(AdaptiveConcurrency, crawler)
+    else:
+        with pytest.raises(NotConfigured):
+            build_from_crawler(AdaptiveConcurrency, crawler)
+
+
+@pytest.mark.parametrize(
+    "settings",
+    (
+        {"ADAPTIVE_CONCURRENCY_MIN": 0},
+        {"ADAPTIVE_CONCURRENCY_MIN": 4, "ADAPTIVE_CONCURRENCY_MAX": 2},
+        {"ADAPTIVE_CONCURRENCY_DECREASE_FACTOR": 0.0},
+        {"ADAPTIVE_CONCURRENCY_DECREASE_FACTOR": 1.0},
+    ),
+)
+def test_invalid_settings(settings):
+    crawler = get_crawler(settings)
+    with pytest.raises(NotConfigured):
+        build_from_crawler(AdaptiveConcurrency, crawler)
+
+
+@pytest.mark.parametrize(
+    ("setting", "expected"),
+    (
+        (UNSET, 16),
+        (0, 16),
+        (4, 4),
+    ),
+)
+def test_max_concurrency(setting, expected):
+    settings = {"CONCURRENT_REQUESTS": 16}
+    if setting is not UNSET:
+        settings["ADAPTIVE_CONCURRENCY_MAX"] = setting
+    crawler = get_crawler(settings)
+    ac = build_from_crawler(AdaptiveConcurrency, crawler)
+    assert ac.max_concurrency == expected
+
+
+@pytest.mark.parametrize(
+    ("meta", "slot", "throttle"),
+    (
+        ({}, None, None),
+        ({"download_slot": "foo"}, None, None),
+        ({"download_slot": "foo"}, "foo", False),
+    ),
+)
+def test_skipped(meta, slot, throttle):
+    crawler = get_crawler()
+    ac = build_from_crawler(AdaptiveConcurrency, crawler)
+    spider = TestSpider()
+    request = Request("https://example.com", meta=meta)
+
+    crawler.engine = Mock()
+    crawler.engine.downloader = Mock()
+    crawler.engine.downloader.slots = {}
+    if slot is not None:
+        crawler.engine.downloader.slots[slot] = Slot(8, 0.0, False, throttle=throttle)
+    ac._get_state = None  # Raise exception if called.
+
+    ac._response_downloaded(Response(request.url, status=503), request, spider)
+    ac._request_left_downloader(request, spider)
+    ac._request_left_downloader(request, spider)
+
+
+def test_additive_increase():
+    crawler, ac, slot = get_extension(concurrency=2)
+    download(ac)
+    assert slot.concurrency == 2
+    download(ac)
+    assert slot.concurrency == 3
+    for _ in range(3):
+        download(ac)
+    assert slot.concurrency == 4
+    assert crawler.stats.get_value("adaptive_concurrency/increase") == 2
+    assert crawler.stats.get_value("adaptive_concurrency/foo/concurrency") == 4
+
+
+def test_increase_capped():
+    crawler, ac, slot = get_extension({"ADAPTIVE_CONCURRENCY_MAX": 3}, concurrency=2)
+    for _ in range(10):
+        download(ac)
+    assert slot.concurrency == 3
+
+
+def test_increase_capped_h2_streams():
+    crawler, ac, slot = get_extension(concurrency=2)
+    for _ in range(10):
+        download(ac, meta={"h2_max_concurrent_streams": 3})
+    assert slot.concurrency == 3
+
+
+def test_initial_concurrency_clamped():
+    crawler, ac, slot = get_extension({"ADAPTIVE_CONCURRENCY_MAX": 3}, concurrency=8)
+    download(ac, status=500)
+    assert slot.concurrency == 3
+
+
+@pytest.mark.parametrize(
+    ("kwargs", "reason"),
+    (
+        ({"status": 503}, "http_503"),
+        ({"status": 429}, "http_429"),
+        ({"headers": {"Retry-After": "0"}}, "retry_after"),
+        ({"fail": True}, "error"),
+    ),
+)
+def test_multiplicative_decrease(kwargs, reason):
+    crawler, ac, slot = get_extension(concurrency=8)
+    download(ac, **kwargs)
+    assert slot.concurrency == 4
+    assert crawler.stats.get_value("adaptive_concurrency/decrease") == 1
+    assert crawler.stats.get_value(f"adaptive_concurrency/decrease/{reason}") == 1
+    assert crawler.stats.get_value("adaptive_concurrency/foo/concurrency") == 4
+
+
+def test_decrease_once_per_round_trip():
+    crawler, ac, slot = get_extension(concurrency=8)
+    for _ in range(4):
+        download(ac, status=503)
+    assert slot.concurrency == 4
+    download(ac, status=503)
+    assert slot.concurrency == 2
+    download(ac, status=503)
+    assert slot.concurrency == 2
+
+
+def test_decrease_min():
+    crawler, ac, slot = get_extension({"ADAPTIVE_CONCURRENCY_MIN": 3}, concurrency=4)
+    download(ac, status=503)
+    assert slot.concurrency == 3
+    for _ in range(10):
+        download(ac, status=503)
+    assert slot.concurrency == 3
+
+
+@pytest.mark.parametrize(
+    ("retry_after", "expected"),
+    (
+        ("0", 2),
+        ("3600", 1),
+        ("Wed, 21 Oct 2015 07:28:00 GMT", 2),
+        ("invalid", 2),
+    ),
+)
+def test_retry_after_holds_increase(retry_after, expected):
+    crawler, ac, slot = get_extension(concurrency=2)
+    download(ac, status=200, headers={"Retry-After": retry_after})
+    if retry_after == "invalid":
+        # Not a Retry-After response, counted as a success.
+        assert slot.concurrency == 2
+        download(ac)
+        assert slot.concurrency == 3
+        return
+    assert slot.concurrency == 1
+    download(ac)
+    assert slot.concurrency == expected
+
+
+def test_latency_decrease():
+    crawler, ac, slot = get_extension(
+        {"ADAPTIVE_CONCURRENCY_WINDOW": 10, "ADAPTIVE_CONCURRENCY_MAX": 8},
+        concurrency=8,
+    )
+    for _ in range(10):
+        download(ac, latency=0.1)
+    assert slot.concurrency == 8
+    assert crawler.stats.get_value("adaptive_concurrency/foo/latency_baseline") == 0.1
+    for _ in range(2):
+        download(ac, latency=1.0)
+    assert slot.concurrency == 4
+    assert crawler.stats.get_value("adaptive_concurrency/decrease/latency") == 1
+
+
+class SlotConcurrencySpider(Spider):
+    name = "slot_concurrency"
+
+    def __init__(self, mockserver, path, total, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.url = mockserver.url(path)
+        self.total = total
+        self.concurrency = []
+
+    def start_requests(self):
+        for _ in range(self.total):
+            yield Request(self.url, dont_filter=True)
+
+    def parse(self, response):
+        slot_key = response.meta["download_slot"]
+        slot = self.crawler.engine.downloader.slots[slot_key]
+        self.concurrency.append(slot.concurrency)
+
+
+class SlowDownSpider(SlotConcurrencySpider):
+    """Sends fast requests first, then requests with an injected latency."""
+
+    def start_requests(self):
+        yield from super().start_requests()
+        slow_url = self.url.replace("/status?n=200", "/delay?n=0.5&b=0")
+        for _ in range(self.total):
+            yield Request(slow_url, dont_filter=True, priority=-1)
+
+
+class AdaptiveConcurrencyTest(TestCase):
+    def setUp(self):
+        self.mockserver = MockServer()
+        self.mockserver.__enter__()
+
+    def tearDown(self):
+        self.mockserver.__exit__(None, None, None)
+
+    @defer.inlineCallbacks
+    def test_increase(self):
+        crawler = _get_crawler(
+            SlotConcurrencySpider,
+            {
+                "ADAPTIVE_CONCURRENCY_ENABLED": True,
+                "ADAPTIVE_CONCURRENCY_LATENCY_TOLERANCE": 1000.0,
+                "CONCURRENT_REQUESTS": 8,
+                "CONCURRENT_REQUESTS_PER_DOMAIN": 1,
+            },
+        )
+        yield crawler.crawl(mockserver=self.mockserver, path="/status?n=200", total=30)
+        self.assertEqual(crawler.spider.concurrency[-1], 8)
+        self.assertEqual(crawler.stats.get_value("adaptive_concurrency/increase"), 7)
+
+    @defer.inlineCallbacks
+    def test_decrease(self):
+        crawler = _get_crawler(
+            SlotConcurrencySpider,
+            {
+                "ADAPTIVE_CONCURRENCY_ENABLED": True,
+                "CONCURRENT_REQUESTS": 8,
+                "CONCURRENT_REQUESTS_PER_DOMAIN": 8,
+                "HTTPERROR_ALLOW_ALL": True,
+                "RETRY_ENABLED": False,
+            },
+        )
+        yield crawler.crawl(mockserver=self.mockserver, path="/status?n=503", total=30)
+        self.assertEqual(crawler.spider.concurrency[-1], 1)
+        self.assertEqual(
+            crawler.stats.get_value("adaptive_concurrency/decrease/http_503"), 3
+        )
+
+    @defer.inlineCallbacks
+    def test_latency(self):
+        crawler = _get_crawler(
+            SlowDownSpider,
+            {
+                "ADAPTIVE_CONCURRENCY_ENABLED": True,
+                "ADAPTIVE_CONCURRENCY_LATENCY_TOLERANCE": 20.0,
+                "ADAPTIVE_CONCURRENCY_WINDOW": 5,
+                "CONCURRENT_REQUESTS": 4,
+                "CONCURRENT_REQUESTS_PER_DOMAIN": 4,
+            },
+        )
+        yield crawler.crawl(mockserver=self.mockserver, path="/status?n=200", total=10)
+        self.assertEqual(
+            crawler.stats.get_value("adaptive_concurrency/decrease/latency"), 1
+        )
+        self.assertLess(min(crawler.spider.concurrency), 4)
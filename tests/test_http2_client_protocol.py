@@ -699,3 +699,24 @@ class Https2ClientProtocolTestCase(TestCase):
         d.addErrback(self.fail)
         d.addCallback(assert_request_headers)
         return d
+
+
+@skipIf(not H2_ENABLED, "HTTP/2 support in Twisted is not enabled")
+class StreamFlowControlTestCase(TestCase):
+    def test_close_acknowledges_delayed_data(self):
+        from scrapy.core.http2.stream import Stream, StreamCloseReason
+
+        protocol = mock.Mock(metadata={"ip_address": None})
+        stream = Stream(1, Request("https://example.com"), protocol)
+        stream._deferred_response.addErrback(lambda failure: None)
+        with mock.patch("scrapy.core.http2.stream.transfer_delay", return_value=10):
+            stream.receive_data(b"a" * 100, 100)
+            stream.receive_data(b"b" * 50, 50)
+        protocol.conn.acknowledge_received_data.assert_not_called()
+        ack_calls = list(stream._ack_calls)
+        self.assertEqual(len(ack_calls), 2)
+
+        stream.close(StreamCloseReason.RESET)
+        protocol.conn.acknowledge_received_data.assert_called_once_with(150, 1)
+        protocol._write_to_transport.assert_called_once_with()
+        self.assertFalse(any(call.active() for call in ack_calls))
@@ -102,6 +102,15 @@ class HeadersTest(unittest.TestCase):
         self.assertEqual(h.getlist("Content-Type"), [b"text/html"])
         self.assertEqual(h.getlist("X-Forwarded-For"), [b"ip1", b"ip2"])
 
+    def test_update_headers(self):
+        h1 = Headers({"Content-Type": "text/html", "X-Forwarded-For": "ip1"})
+        h2 = Headers({"x-forwarded-for": ["ip2", "ip3"], "Accept": "*/*"})
+        h1.update(h2)
+        self.assertEqual(h1.getlist("Content-Type"), [b"text/html"])
+        self.assertEqual(h1.getlist("X-Forwarded-For"), [b"ip2", b"ip3"])
+        self.assertEqual(h1.getlist("Accept"), [b"*/*"])
+        assert h1.getlist("X-Forwarded-For") is not h2.getlist("X-Forwarded-For")
+
     def test_copy(self):
         h1 = Headers({"header1": ["value1", "value2"]})
         h2 = copy.copy(h1)
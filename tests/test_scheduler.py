@@ -24,6 +24,10 @@ MockSlot = collections.namedtuple("MockSlot", ["active"])
 class MockDownloader:
     def __init__(self):
         self.slots = {}
+        self.blocked_slots = set()
+
+    def slot_blocked(self, key):
+        return key in self.blocked_slots
 
     def get_slot_key(self, request):
         if Downloader.DOWNLOAD_SLOT in request.meta:
@@ -288,6 +292,32 @@ class DownloaderAwareSchedulerTestMixin:
         )
         self.assertEqual(sum(len(s.active) for s in downloader.slots.values()), 0)
 
+    def test_blocked_slot(self):
+        for url, slot in _URLS_WITH_SLOTS:
+            request = Request(url)
+            request.meta[Downloader.DOWNLOAD_SLOT] = slot
+            self.scheduler.enqueue_request(request)
+
+        if self.reopen:
+            self.close_scheduler()
+            self.create_scheduler()
+
+        downloader = self.mock_crawler.engine.downloader
+        downloader.blocked_slots.add("a")
+        dequeued_slots = []
+        while True:
+            request = self.scheduler.next_request()
+            if request is None:
+                break
+            dequeued_slots.append(downloader.get_slot_key(request))
+        self.assertNotIn("a", dequeued_slots)
+        self.assertTrue(self.scheduler.has_pending_requests())
+
+        downloader.blocked_slots.clear()
+        while self.scheduler.has_pending_requests():
+            request = self.scheduler.next_request()
+            self.assertEqual(downloader.get_slot_key(request), "a")
+
 
 class TestSchedulerWithDownloaderAwareInMemory(
     DownloaderAwareSchedulerTestMixin, BaseSchedulerInMemoryTester, unittest.TestCase
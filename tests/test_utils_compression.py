@@ -0,0 +1,105 @@
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from scrapy.downloadermiddlewares.httpcompression import (
+    ACCEPTED_ENCODINGS,
+    HttpCompressionMiddleware,
+    _split_encodings,
+)
+from scrapy.utils._compression import (
+    _CHUNK_SIZE,
+    _check_max_size,
+    _DecompressionMaxSizeExceeded,
+    _StreamDecompressor,
+)
+from scrapy.utils.gz import gunzip
+from tests import tests_datadir
+
+SAMPLEDIR = Path(tests_datadir, "compressed")
+
+RAW_SIZE = 74837
+
+FORMAT = {
+    "gzip": ("html-gzip.bin", b"gzip"),
+    "rawdeflate": ("html-rawdeflate.bin", b"deflate"),
+    "zlibdeflate": ("html-zlibdeflate.bin", b"deflate"),
+    "gzip-deflate": ("html-gzip-deflate.bin", b"gzip, deflate"),
+    "gzip-deflate-gzip": ("html-gzip-deflate-gzip.bin", b"gzip, deflate, gzip"),
+    "br": ("html-br.bin", b"br"),
+    "zstd": ("html-zstd-streaming-no-content-size.bin", b"zstd"),
+}
+
+
+def _decompress(data, content_encoding, chunk_size=1024, max_size=0):
+    to_decode, to_keep = _split_encodings([content_encoding])
+    assert not to_keep
+    decompressor = _StreamDecompressor(to_decode, max_size=max_size)
+    output = [
+        decompressor.decompress(data[i : i + chunk_size])
+        for i in range(0, len(data), chunk_size)
+    ]
+    output.append(decompressor.flush())
+    return b"".join(output)
+
+
+class StreamDecompressorTest(unittest.TestCase):
+    def _get_sample(self, format_id):
+        samplefile, content_encoding = FORMAT[format_id]
+        for encoding in content_encoding.split(b", "):
+            if encoding not in ACCEPTED_ENCODINGS:
+                raise unittest.SkipTest(f"{encoding!r} is not supported")
+        return (SAMPLEDIR / samplefile).read_bytes(), content_encoding
+
+    def test_formats(self):
+        for format_id in FORMAT:
+            with self.subTest(format_id=format_id):
+                data, content_encoding = self._get_sample(format_id)
+                expected, _ = HttpCompressionMiddleware()._handle_encoding(
+                    data, [content_encoding], 0
+                )
+                for chunk_size in (1, 1000, len(data)):
+                    body = _decompress(data, content_encoding, chunk_size)
+                    self.assertEqual(body, expected)
+
+    def test_gzip_concatenated_members(self):
+        data, content_encoding = self._get_sample("gzip")
+        body = _decompress(data + data, content_encoding)
+        self.assertEqual(body, gunzip(data + data))
+        self.assertEqual(len(body), RAW_SIZE * 2)
+
+    def test_gzip_truncated(self):
+        data = (SAMPLEDIR / "truncated-crc-error.gz").read_bytes()
+        self.assertEqual(_decompress(data, b"gzip"), gunzip(data))
+
+    def test_max_size(self):
+        data, content_encoding = self._get_sample("gzip")
+        with self.assertRaises(_DecompressionMaxSizeExceeded):
+            _decompress(data, content_encoding, max_size=RAW_SIZE - 1)
+        body = _decompress(data, content_encoding, max_size=RAW_SIZE)
+        self.assertEqual(len(body), RAW_SIZE)
+
+    def test_max_size_single_chunk(self):
+        max_size = 1024 * 1024
+        for encoding in (b"gzip", b"deflate", b"br", b"zstd"):
+            if encoding not in ACCEPTED_ENCODINGS:
+                continue
+            with self.subTest(encoding=encoding):
+                name = f"bomb-{encoding.decode()}.bin"
+                data = (SAMPLEDIR / name).read_bytes()
+                decompressor = _StreamDecompressor([encoding], max_size=max_size)
+                sizes = []
+
+                def check_max_size(size, max_size):
+                    sizes.append(size)
+                    _check_max_size(size, max_size)
+
+                with mock.patch(
+                    "scrapy.utils._compression._check_max_size", check_max_size
+                ), self.assertRaises(_DecompressionMaxSizeExceeded):
+                    decompressor.decompress(data)
+                if encoding == b"br":
+                    continue  # see _SlicedDecompressor
+                # The size limit is enforced while a chunk is decompressed,
+                # not once it has been decompressed in full.
+                self.assertLessEqual(sizes[-1], max_size + 2 * _CHUNK_SIZE)
@@ -7,6 +7,7 @@ from twisted.internet import defer, reactor
 from twisted.python.failure import Failure
 from twisted.trial import unittest
 
+from scrapy.signalmanager import SignalManager
 from scrapy.utils.signal import send_catch_log, send_catch_log_deferred
 from scrapy.utils.test import get_from_asyncio_queue
 
@@ -53,6 +54,11 @@ class SendCatchLogTest(unittest.TestCase):
         return "OK"
 
 
+class SignalManagerSendCatchLogTest(SendCatchLogTest):
+    def _get_result(self, signal, *a, **kw):
+        return SignalManager().send_catch_log(signal, *a, **kw)
+
+
 class SendCatchLogDeferredTest(SendCatchLogTest):
     def _get_result(self, signal, *a, **kw):
         return send_catch_log_deferred(signal, *a, **kw)
@@ -97,3 +103,69 @@ class SendCatchLogTest2(unittest.TestCase):
         self.assertEqual(len(log.records), 1)
         self.assertIn("Cannot return deferreds from signal handler", str(log))
         dispatcher.disconnect(test_handler, test_signal)
+
+
+class SignalManagerReceiverCacheTest(unittest.TestCase):
+    def test_connect_disconnect(self):
+        test_signal = object()
+        manager = SignalManager()
+        calls = []
+
+        def handler_a(arg):
+            calls.append(("a", arg))
+
+        def handler_b(**kwargs):
+            calls.append(("b", sorted(kwargs)))
+
+        self.assertEqual(manager.send_catch_log(test_signal, arg=1), [])
+
+        manager.connect(handler_a, test_signal)
+        manager.send_catch_log(test_signal, arg=2)
+        self.assertEqual(calls, [("a", 2)])
+
+        # Receivers connected through pydispatcher directly are also seen.
+        dispatcher.connect(handler_b, test_signal)
+        calls.clear()
+        manager.send_catch_log(test_signal, arg=3)
+        self.assertEqual(calls, [("a", 3), ("b", ["arg", "sender", "signal"])])
+
+        manager.disconnect(handler_a, test_signal)
+        calls.clear()
+        manager.send_catch_log(test_signal, arg=4)
+        self.assertEqual(calls, [("b", ["arg", "sender", "signal"])])
+
+        dispatcher.disconnect(handler_b, test_signal)
+        calls.clear()
+        self.assertEqual(manager.send_catch_log(test_signal, arg=5), [])
+        self.assertEqual(calls, [])
+
+    def test_garbage_collected_receiver(self):
+        test_signal = object()
+        manager = SignalManager()
+        calls = []
+
+        class Receiver:
+            def handler(self, arg):
+                calls.append(arg)
+
+        receiver = Receiver()
+        manager.connect(receiver.handler, test_signal)
+        manager.send_catch_log(test_signal, arg=1)
+        del receiver
+        self.assertEqual(manager.send_catch_log(test_signal, arg=2), [])
+        self.assertEqual(calls, [1])
+
+    def test_other_sender(self):
+        test_signal = object()
+        sender = object()
+        manager = SignalManager()
+        calls = []
+
+        def handler(sender):
+            calls.append(sender)
+
+        manager.connect(handler, test_signal, sender=sender)
+        manager.send_catch_log(test_signal)
+        manager.send_catch_log(test_signal, sender=sender)
+        self.assertEqual(calls, [sender])
+        manager.disconnect(handler, test_signal, sender=sender)